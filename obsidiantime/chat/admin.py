@@ -37,24 +37,15 @@ class PollAdmin(admin.ModelAdmin):
     readonly_fields = ["created_at", "total_votes"]
     inlines = [PollOptionInline]
 
-    def total_votes(self, obj):
-        return obj.total_votes
-
-    total_votes.short_description = "Всего голосов"
-
 
 @admin.register(PollOption)
 class PollOptionAdmin(admin.ModelAdmin):
     list_display = ["text", "poll", "vote_count", "vote_percentage"]
+    list_select_related = ["poll"]
     list_filter = ["poll__is_active", "created_at"]
     search_fields = ["text", "poll__question"]
     readonly_fields = ["created_at", "vote_count", "vote_percentage"]
 
-    def vote_count(self, obj):
-        return obj.vote_count
-
-    vote_count.short_description = "Голосов"
-
     def vote_percentage(self, obj):
         return f"{obj.vote_percentage}%"
 
@@ -0,0 +1,161 @@
+"""
+Рассылка событий чата через Server-Sent Events.
+
+Views публикуют события через PostgreSQL NOTIFY после коммита транзакции.
+В каждом ASGI процессе один слушатель (LISTEN) получает уведомления,
+один раз загружает данные из БД и раздает их всем подписчикам процесса.
+"""
+
+import asyncio
+import json
+import logging
+
+import psycopg
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+# Канал PostgreSQL LISTEN/NOTIFY
+CHAT_EVENTS_CHANNEL = "chat_events"
+
+# Максимум событий в очереди одного подписчика
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# Пауза перед повторным подключением слушателя, в секундах
+LISTENER_RECONNECT_DELAY = 5
+
+
+def is_supported():
+    """Проверяет, поддерживает ли база данных LISTEN/NOTIFY"""
+    return connection.vendor == "postgresql"
+
+
+def _notify(event_type, object_id):
+    if not is_supported():
+        return
+    payload = json.dumps({"type": event_type, "id": object_id})
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, %s)", [CHAT_EVENTS_CHANNEL, payload])
+
+
+def publish_message(message_id):
+    """Публикует событие о новом сообщении после коммита транзакции"""
+    transaction.on_commit(lambda: _notify("message", message_id))
+
+
+def publish_poll(poll_id):
+    """Публикует событие об изменении результатов голосования"""
+    transaction.on_commit(lambda: _notify("poll", poll_id))
+
+
+def format_sse(event, data, event_id=None):
+    """Форматирует событие в формате text/event-stream"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def get_listen_conninfo():
+    """
+    Параметры прямого подключения слушателя к PostgreSQL. В режиме
+    transaction pgbouncer отдает серверное соединение только на время
+    транзакции, и LISTEN через него не получает уведомлений.
+    """
+    db = settings.DATABASES["default"]
+    conninfo = {
+        "dbname": db["NAME"],
+        "user": db.get("USER"),
+        "password": db.get("PASSWORD"),
+        "host": settings.CHAT_LISTEN_DB_HOST,
+        "port": settings.CHAT_LISTEN_DB_PORT,
+    }
+    return {key: value for key, value in conninfo.items() if value}
+
+
+def _load_event(event_type, object_id):
+    # Импорт внутри функции, чтобы избежать циклического импорта с views
+    from .views import build_message_event, build_poll_event  # noqa: PLC0415
+
+    if event_type == "message":
+        return build_message_event(object_id)
+    if event_type == "poll":
+        return build_poll_event(object_id)
+    return None
+
+
+class ChatBroadcaster:
+    """Раздает события чата подписчикам текущего процесса"""
+
+    def __init__(self):
+        self._subscribers = set()
+        self._listener = None
+
+    @property
+    def subscribers_count(self):
+        return len(self._subscribers)
+
+    def subscribe(self):
+        """Регистрирует нового подписчика и возвращает его очередь"""
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        self._ensure_listener()
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, event):
+        """Кладет событие в очереди всех подписчиков"""
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Медленный клиент: отключаем его, после переподключения
+                # он догрузит пропущенное по Last-Event-ID
+                self._subscribers.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    def _ensure_listener(self):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+
+    async def _listen(self):
+        conninfo = get_listen_conninfo()
+
+        while self._subscribers:
+            try:
+                conn = await psycopg.AsyncConnection.connect(
+                    autocommit=True, **conninfo
+                )
+                async with conn:
+                    await conn.execute(f"LISTEN {CHAT_EVENTS_CHANNEL}")
+                    async for notify in conn.notifies():
+                        await self._dispatch(notify.payload)
+                        if not self._subscribers:
+                            break
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ошибка слушателя событий чата")
+                await asyncio.sleep(LISTENER_RECONNECT_DELAY)
+
+    async def _dispatch(self, payload):
+        try:
+            data = json.loads(payload)
+            event = await sync_to_async(_load_event)(data["type"], data["id"])
+        except Exception:
+            logger.exception("Не удалось обработать событие чата: %s", payload)
+            return
+
+        if event is not None:
+            self.publish(event)
+
+
+broadcaster = ChatBroadcaster()
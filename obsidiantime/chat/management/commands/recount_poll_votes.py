@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from obsidiantime.chat.services import PollService
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает счетчики голосов в голосованиях по таблице голосов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--poll",
+            type=int,
+            action="append",
+            dest="poll_ids",
+            help="ID голосования для пересчета (можно указать несколько раз)",
+        )
+
+    def handle(self, *args, **options):
+        poll_ids = options["poll_ids"]
+
+        self.stdout.write("Пересчет счетчиков голосов...")
+        polls_updated, options_updated = PollService.recount_votes(poll_ids)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Готово: обновлено голосований - {polls_updated}, "
+                f"вариантов ответа - {options_updated}."
+            )
+        )
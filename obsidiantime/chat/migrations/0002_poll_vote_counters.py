@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:53
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_vote_counters(apps, schema_editor):
+    Poll = apps.get_model('chat', 'Poll')
+    PollOption = apps.get_model('chat', 'PollOption')
+    PollVote = apps.get_model('chat', 'PollVote')
+
+    option_votes = (
+        PollVote.objects.filter(option=OuterRef('pk'))
+        .values('option')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    PollOption.objects.update(vote_count=Coalesce(Subquery(option_votes), 0))
+
+    poll_votes = (
+        PollOption.objects.filter(poll=OuterRef('pk'))
+        .values('poll')
+        .annotate(total=Sum('vote_count'))
+        .values('total')
+    )
+    Poll.objects.update(total_votes=Coalesce(Subquery(poll_votes), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='poll',
+            name='total_votes',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Всего голосов'),
+        ),
+        migrations.AddField(
+            model_name='polloption',
+            name='vote_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Голосов'),
+        ),
+        migrations.RunPython(fill_vote_counters, migrations.RunPython.noop),
+    ]
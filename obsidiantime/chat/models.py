@@ -22,6 +22,10 @@ class Message(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Ключ keyset пагинации чата
+            models.Index(fields=["created_at", "id"], name="chat_msg_created_id_idx"),
+        ]
         verbose_name = "Сообщение"
         verbose_name_plural = "Сообщения"
 
@@ -40,6 +44,9 @@ class Poll(models.Model):
     multiple_choice = models.BooleanField(
         default=False, verbose_name="Множественный выбор"
     )
+    total_votes = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Всего голосов"
+    )
     created_at = models.DateTimeField(default=timezone.now, verbose_name="Создано")
 
     class Meta:
@@ -49,10 +56,6 @@ class Poll(models.Model):
     def __str__(self):
         return self.question
 
-    @property
-    def total_votes(self):
-        return PollVote.objects.filter(option__poll=self).count()
-
 
 class PollOption(models.Model):
     poll = models.ForeignKey(
@@ -62,6 +65,9 @@ class PollOption(models.Model):
         verbose_name="Голосование",
     )
     text = models.CharField(max_length=200, verbose_name="Вариант ответа")
+    vote_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Голосов"
+    )
     created_at = models.DateTimeField(default=timezone.now, verbose_name="Создано")
 
     class Meta:
@@ -71,12 +77,9 @@ class PollOption(models.Model):
     def __str__(self):
         return self.text
 
-    @property
-    def vote_count(self):
-        return self.votes.count()
-
     @property
     def vote_percentage(self):
+        # poll уже закеширован при prefetch_related("options")
         total = self.poll.total_votes
         if total == 0:
             return 0
@@ -0,0 +1,78 @@
+from django.db.models import Q
+
+from .models import Message
+
+
+class KeysetPage:
+    """Страница keyset-пагинации"""
+
+    def __init__(self, object_list, has_more):
+        self.object_list = object_list
+        self.has_more = has_more
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+class MessageKeysetPaginator:
+    """
+    Пагинация сообщений по ключу (created_at, id) вместо OFFSET.
+
+    Любая страница читается диапазоном по индексу (created_at, id),
+    без COUNT(*) и без пропуска строк, поэтому ее стоимость не зависит
+    от того, насколько глубоко в историю пролистал пользователь.
+    """
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = per_page
+
+    def _anchor_created_at(self, message_id):
+        return (
+            Message.objects.filter(id=message_id)
+            .values_list("created_at", flat=True)
+            .first()
+        )
+
+    def _page(self, queryset):
+        # Берем на одну запись больше, чтобы узнать о следующей странице
+        objects = list(queryset[: self.per_page + 1])
+        return KeysetPage(objects[: self.per_page], len(objects) > self.per_page)
+
+    def latest(self):
+        """Последние сообщения, от новых к старым"""
+        return self._page(self.queryset.order_by("-created_at", "-id"))
+
+    def before(self, message_id):
+        """Сообщения, предшествующие message_id, от новых к старым"""
+        created_at = self._anchor_created_at(message_id)
+        if created_at is None:
+            condition = Q(id__lt=message_id)
+        else:
+            condition = Q(created_at__lt=created_at) | Q(
+                created_at=created_at, id__lt=message_id
+            )
+        return self._page(
+            self.queryset.filter(condition).order_by("-created_at", "-id")
+        )
+
+    def after(self, message_id):
+        """Сообщения, следующие за message_id, от старых к новым"""
+        queryset = self.queryset.order_by("created_at", "id")
+        if not message_id:
+            return self._page(queryset)
+
+        created_at = self._anchor_created_at(message_id)
+        if created_at is None:
+            condition = Q(id__gt=message_id)
+        else:
+            condition = Q(created_at__gt=created_at) | Q(
+                created_at=created_at, id__gt=message_id
+            )
+        return self._page(queryset.filter(condition))
@@ -0,0 +1,92 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Poll, PollOption, PollVote
+
+
+class PollService:
+    """Сервис для работы с голосованиями"""
+
+    @staticmethod
+    @transaction.atomic
+    def toggle_vote(user, poll, option):
+        """
+        Переключает голос пользователя за вариант и обновляет счетчики
+        в той же транзакции. Возвращает True, если голос учтен.
+        """
+        user_votes = PollVote.objects.filter(user=user, option__poll=poll)
+
+        removed_option_ids = []
+        if not poll.multiple_choice:
+            # Одиночный выбор: снимаем голоса за остальные варианты
+            removed_option_ids = list(
+                user_votes.exclude(option=option)
+                .select_for_update()
+                .values_list("option_id", flat=True)
+            )
+            if removed_option_ids:
+                user_votes.filter(option_id__in=removed_option_ids).delete()
+
+        vote, created = PollVote.objects.get_or_create(user=user, option=option)
+
+        if created:
+            voted = True
+            delta = 1
+        elif poll.multiple_choice:
+            # Повторный клик при множественном выборе отменяет голос.
+            # Счетчики уменьшаем на число реально удаленных строк: параллельный
+            # запрос мог уже удалить этот голос
+            deleted, _ = PollVote.objects.filter(pk=vote.pk).delete()
+            voted = False
+            delta = -deleted
+        else:
+            voted = True
+            delta = 0
+
+        if removed_option_ids:
+            PollOption.objects.filter(id__in=removed_option_ids).update(
+                vote_count=F("vote_count") - 1
+            )
+        if delta:
+            PollOption.objects.filter(id=option.id).update(
+                vote_count=F("vote_count") + delta
+            )
+
+        total_delta = delta - len(removed_option_ids)
+        if total_delta:
+            Poll.objects.filter(id=poll.id).update(
+                total_votes=F("total_votes") + total_delta
+            )
+
+        return voted
+
+    @staticmethod
+    def recount_votes(poll_ids=None):
+        """Пересчитывает счетчики голосов по таблице PollVote"""
+        options = PollOption.objects.all()
+        polls = Poll.objects.all()
+        if poll_ids is not None:
+            options = options.filter(poll_id__in=poll_ids)
+            polls = polls.filter(id__in=poll_ids)
+
+        option_votes = (
+            PollVote.objects.filter(option=OuterRef("pk"))
+            .values("option")
+            .annotate(total=Count("pk"))
+            .values("total")
+        )
+        poll_votes = (
+            PollOption.objects.filter(poll=OuterRef("pk"))
+            .values("poll")
+            .annotate(total=Sum("vote_count"))
+            .values("total")
+        )
+
+        with transaction.atomic():
+            options_updated = options.update(
+                vote_count=Coalesce(Subquery(option_votes), 0)
+            )
+            polls_updated = polls.update(total_votes=Coalesce(Subquery(poll_votes), 0))
+
+        return polls_updated, options_updated
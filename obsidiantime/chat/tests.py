@@ -1 +1,356 @@
-# Create your tests here.
+import asyncio
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import events
+from .models import Message, Poll, PollOption, PollVote
+from .pagination import MessageKeysetPaginator
+from .services import PollService
+
+
+class ChatApiMessagesQueriesTests(TestCase):
+    """Количество запросов API сообщений не зависит от числа опросов"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="voter", password="password")
+
+    def create_poll(self, options_count=3):
+        message = Message.objects.create(
+            author=self.user, content="Голосование", message_type="poll"
+        )
+        poll = Poll.objects.create(message=message, question="Вопрос?")
+        options = [
+            PollOption.objects.create(poll=poll, text=f"Вариант {i}")
+            for i in range(options_count)
+        ]
+        PollService.toggle_vote(self.user, poll, options[0])
+        return message
+
+    def count_api_queries(self, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("chat:api_messages"), params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.json()
+
+    def test_constant_queries_for_new_messages(self):
+        self.client.force_login(self.user)
+        self.create_poll()
+        # Первый запрос прогревает сессию и пользователя
+        self.count_api_queries({"last_id": 0})
+        baseline, _ = self.count_api_queries({"last_id": 0})
+
+        for _ in range(10):
+            self.create_poll()
+        queries, data = self.count_api_queries({"last_id": 0})
+
+        self.assertEqual(queries, baseline)
+        polls = [item["poll"] for item in data["messages"] if "poll" in item]
+        self.assertEqual(len(polls), 11)
+        for poll in polls:
+            self.assertEqual(poll["total_votes"], 1)
+            self.assertEqual(poll["options"][0]["vote_percentage"], 100.0)
+            self.assertTrue(poll["options"][0]["voted"])
+
+    def test_constant_queries_for_older_messages(self):
+        self.client.force_login(self.user)
+        self.create_poll()
+        anchor = Message.objects.create(author=self.user, content="Последнее")
+        self.count_api_queries({"before_id": anchor.id})
+        baseline, _ = self.count_api_queries({"before_id": anchor.id})
+
+        Message.objects.filter(id=anchor.id).delete()
+        for _ in range(25):
+            self.create_poll()
+        anchor = Message.objects.create(author=self.user, content="Последнее")
+        queries, data = self.count_api_queries({"before_id": anchor.id})
+
+        self.assertEqual(queries, baseline)
+        self.assertTrue(data["has_more"])
+
+    def test_malformed_ids_return_bad_request(self):
+        for params in ({"last_id": "abc"}, {"before_id": "1.5"}, {"last_id": "-1"}):
+            response = self.client.get(reverse("chat:api_messages"), params)
+            self.assertEqual(response.status_code, 400)
+
+
+class MessageKeysetPaginatorTests(TestCase):
+    """Keyset-пагинация сообщений по (created_at, id)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="writer", password="password")
+        start = timezone.now() - timedelta(hours=1)
+        cls.messages = []
+        # По два сообщения на одно время: порядок внутри пары решает id
+        for i in range(7):
+            message = Message.objects.create(
+                author=cls.user,
+                content=f"Текст {i}",
+                created_at=start + timedelta(minutes=i // 2),
+            )
+            cls.messages.append(message)
+        cls.ids = [message.id for message in cls.messages]
+
+    def setUp(self):
+        self.paginator = MessageKeysetPaginator(Message.objects.all(), per_page=3)
+
+    def page_ids(self, page):
+        return [message.id for message in page]
+
+    def test_latest(self):
+        page = self.paginator.latest()
+        self.assertEqual(self.page_ids(page), self.ids[:-4:-1])
+        self.assertTrue(page.has_more)
+
+    def test_before_walks_back_through_ties(self):
+        page = self.paginator.before(self.ids[5])
+        self.assertEqual(self.page_ids(page), [self.ids[4], self.ids[3], self.ids[2]])
+        self.assertTrue(page.has_more)
+
+        page = self.paginator.before(self.ids[2])
+        self.assertEqual(self.page_ids(page), [self.ids[1], self.ids[0]])
+        self.assertFalse(page.has_more)
+
+        page = self.paginator.before(self.ids[0])
+        self.assertEqual(self.page_ids(page), [])
+        self.assertFalse(page.has_more)
+
+    def test_after_walks_forward_through_ties(self):
+        page = self.paginator.after(0)
+        self.assertEqual(self.page_ids(page), self.ids[:3])
+        self.assertTrue(page.has_more)
+
+        page = self.paginator.after(self.ids[2])
+        self.assertEqual(self.page_ids(page), self.ids[3:6])
+        self.assertTrue(page.has_more)
+
+        page = self.paginator.after(self.ids[5])
+        self.assertEqual(self.page_ids(page), self.ids[6:])
+        self.assertFalse(page.has_more)
+
+        page = self.paginator.after(self.ids[6])
+        self.assertEqual(self.page_ids(page), [])
+        self.assertFalse(page.has_more)
+
+    def test_exact_page_size_has_no_more(self):
+        page = self.paginator.after(self.ids[3])
+        self.assertEqual(len(page), 3)
+        self.assertFalse(page.has_more)
+
+    def test_order_follows_created_at_not_id(self):
+        # Сообщение с меньшим id, но более поздним временем идет последним
+        Message.objects.filter(id=self.ids[0]).update(
+            created_at=timezone.now() - timedelta(minutes=1)
+        )
+        self.assertEqual(self.page_ids(self.paginator.latest())[0], self.ids[0])
+        self.assertEqual(
+            self.page_ids(self.paginator.after(self.ids[6])), [self.ids[0]]
+        )
+
+    def test_missing_anchor_falls_back_to_id(self):
+        Message.objects.filter(id=self.ids[3]).delete()
+        self.assertEqual(self.page_ids(self.paginator.after(self.ids[3])), self.ids[4:])
+        self.assertEqual(
+            self.page_ids(self.paginator.before(self.ids[3])), self.ids[2::-1]
+        )
+
+
+class PollServiceTests(TestCase):
+    """Денормализованные счетчики голосов"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="voter", password="password")
+        message = Message.objects.create(
+            author=cls.user, content="Голосование", message_type="poll"
+        )
+        cls.poll = Poll.objects.create(message=message, question="Вопрос?")
+        cls.first = PollOption.objects.create(poll=cls.poll, text="Первый")
+        cls.second = PollOption.objects.create(poll=cls.poll, text="Второй")
+
+    def assert_counters(self, total, first, second):
+        self.poll.refresh_from_db()
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual(self.poll.total_votes, total)
+        self.assertEqual(self.first.vote_count, first)
+        self.assertEqual(self.second.vote_count, second)
+        self.assertEqual(PollVote.objects.count(), total)
+
+    def test_single_choice_moves_vote(self):
+        self.assertTrue(PollService.toggle_vote(self.user, self.poll, self.first))
+        self.assert_counters(1, 1, 0)
+        self.assertTrue(PollService.toggle_vote(self.user, self.poll, self.second))
+        self.assert_counters(1, 0, 1)
+
+    def test_multiple_choice_toggles_vote(self):
+        self.poll.multiple_choice = True
+        self.poll.save(update_fields=["multiple_choice"])
+        PollService.toggle_vote(self.user, self.poll, self.first)
+        PollService.toggle_vote(self.user, self.poll, self.second)
+        self.assert_counters(2, 1, 1)
+        self.assertFalse(PollService.toggle_vote(self.user, self.poll, self.first))
+        self.assert_counters(1, 0, 1)
+
+    def test_concurrent_unvote_decrements_once(self):
+        self.poll.multiple_choice = True
+        self.poll.save(update_fields=["multiple_choice"])
+        PollService.toggle_vote(self.user, self.poll, self.first)
+        # Второй запрос прочитал голос до того, как первый его удалил
+        stale_vote = PollVote.objects.get(user=self.user, option=self.first)
+        self.assertFalse(PollService.toggle_vote(self.user, self.poll, self.first))
+
+        with mock.patch.object(
+            PollVote.objects, "get_or_create", return_value=(stale_vote, False)
+        ):
+            self.assertFalse(PollService.toggle_vote(self.user, self.poll, self.first))
+        self.assert_counters(0, 0, 0)
+
+    def test_recount_votes(self):
+        PollService.toggle_vote(self.user, self.poll, self.first)
+        Poll.objects.update(total_votes=10)
+        PollOption.objects.update(vote_count=5)
+        PollService.recount_votes()
+        self.assert_counters(1, 1, 0)
+
+
+class ChatEventStreamTests(TestCase):
+    """Поток событий чата (Server-Sent Events)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="reader", password="password")
+        cls.seen = Message.objects.create(author=cls.user, content="Прочитано")
+
+    async def read_stream(self, queue, headers=None):
+        """Читает поток до конца, подставляя очередь подписчика"""
+        with (
+            mock.patch.object(events, "is_supported", return_value=True),
+            mock.patch.object(events.broadcaster, "subscribe", return_value=queue),
+        ):
+            response = await self.async_client.get(
+                reverse("chat:api_stream"), headers=headers
+            )
+            self.assertEqual(response["Content-Type"], "text/event-stream")
+            chunks = [chunk async for chunk in response.streaming_content]
+        return b"".join(chunks).decode()
+
+    @staticmethod
+    def parse_events(body):
+        """События потока: список (id, тип, данные)"""
+        parsed = []
+        for block in body.split("\n\n"):
+            fields = dict(
+                line.split(": ", 1) for line in block.splitlines() if ": " in line
+            )
+            if "event" in fields:
+                parsed.append(
+                    (fields.get("id"), fields["event"], json.loads(fields["data"]))
+                )
+        return parsed
+
+    def test_format_sse(self):
+        self.assertEqual(
+            events.format_sse("messages", {"text": "Привет"}, 7),
+            'id: 7\nevent: messages\ndata: {"text": "Привет"}\n\n',
+        )
+        self.assertEqual(
+            events.format_sse("poll", {"poll_id": 1}),
+            'event: poll\ndata: {"poll_id": 1}\n\n',
+        )
+
+    async def test_broadcaster_fans_out_to_subscribers(self):
+        broadcaster = events.ChatBroadcaster()
+        with mock.patch.object(broadcaster, "_ensure_listener"):
+            first = broadcaster.subscribe()
+            second = broadcaster.subscribe()
+        broadcaster.unsubscribe(second)
+
+        broadcaster.publish({"event": "poll"})
+
+        self.assertEqual(first.get_nowait(), {"event": "poll"})
+        self.assertTrue(second.empty())
+
+    async def test_broadcaster_disconnects_slow_subscriber(self):
+        broadcaster = events.ChatBroadcaster()
+        with mock.patch.object(broadcaster, "_ensure_listener"):
+            queue = broadcaster.subscribe()
+        for _ in range(events.SUBSCRIBER_QUEUE_SIZE + 1):
+            broadcaster.publish({"event": "poll"})
+
+        self.assertEqual(broadcaster.subscribers_count, 0)
+        self.assertIsNone(queue.get_nowait())
+        self.assertTrue(queue.empty())
+
+    def test_polling_fallback_without_asgi(self):
+        response = self.client.get(reverse("chat:api_stream"))
+        self.assertEqual(response.status_code, 204)
+
+    async def test_polling_fallback_without_listen_notify(self):
+        response = await self.async_client.get(reverse("chat:api_stream"))
+        self.assertEqual(response.status_code, 204)
+
+    async def test_malformed_last_event_id(self):
+        for value in ("abc", "-1"):
+            with mock.patch.object(events, "is_supported", return_value=True):
+                response = await self.async_client.get(
+                    reverse("chat:api_stream"), headers={"Last-Event-ID": value}
+                )
+            self.assertEqual(response.status_code, 400)
+
+    async def test_reconnect_replays_all_missed_messages(self):
+        missed = [
+            await Message.objects.acreate(author=self.user, content=f"Пропущено {i}")
+            for i in range(25)
+        ]
+        queue = asyncio.Queue()
+        # Уже догруженное сообщение из живого потока отбрасывается
+        queue.put_nowait({"event": "messages", "id": missed[-1].id, "data": {}})
+        queue.put_nowait(None)
+
+        body = await self.read_stream(
+            queue, headers={"Last-Event-ID": str(self.seen.id)}
+        )
+
+        self.assertTrue(body.startswith("retry: "))
+        replayed = self.parse_events(body)
+        self.assertEqual(
+            [event_id for event_id, _, _ in replayed],
+            [str(missed[19].id), str(missed[-1].id)],
+        )
+        ids = [
+            item["id"]
+            for _, _, data in replayed
+            for item in data["messages"]
+            if item["type"] == "message"
+        ]
+        self.assertEqual(ids, [message.id for message in missed])
+
+    async def test_live_events_after_replay(self):
+        queue = asyncio.Queue()
+        queue.put_nowait({"event": "poll", "id": None, "data": {"poll_id": 1}})
+        queue.put_nowait(
+            {"event": "messages", "id": self.seen.id + 1, "data": {"messages": []}}
+        )
+        queue.put_nowait(None)
+
+        body = await self.read_stream(
+            queue, headers={"Last-Event-ID": str(self.seen.id)}
+        )
+
+        self.assertEqual(
+            self.parse_events(body),
+            [
+                (None, "poll", {"poll_id": 1}),
+                (str(self.seen.id + 1), "messages", {"messages": []}),
+            ],
+        )
@@ -12,4 +12,5 @@ urlpatterns = [
     path("poll/<int:poll_id>/vote/<int:option_id>/", views.vote_poll, name="vote_poll"),
     path("poll/<int:poll_id>/close/", views.close_poll, name="close_poll"),
     path("api/messages/", views.chat_api_messages, name="api_messages"),
+    path("api/stream/", views.chat_api_stream, name="api_stream"),
 ]
@@ -1,17 +1,39 @@
+import asyncio
 from collections import OrderedDict
 from datetime import timedelta
 
+from asgiref.sync import sync_to_async
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.handlers.asgi import ASGIRequest
 from django.db.models import Prefetch
-from django.http import JsonResponse
+from django.http import (
+    HttpResponse,
+    HttpResponseBadRequest,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
 from django.views.decorators.http import require_POST
 
+from obsidiantime.config.db_router import use_replica
+
+from . import events
 from .forms import MessageForm, PollForm
 from .models import Message, Poll, PollOption, PollVote
+from .pagination import MessageKeysetPaginator
+from .services import PollService
+
+# Размер страницы чата и API сообщений
+CHAT_PAGE_SIZE = 50
+API_PAGE_SIZE = 20
+
+# Интервал keep-alive комментариев в потоке событий, в секундах
+SSE_HEARTBEAT_INTERVAL = 15
+
+# Задержка переподключения EventSource, в миллисекундах
+SSE_RETRY_MS = 3000
 
 
 def group_messages_by_date(messages):
@@ -53,6 +75,22 @@ def format_date_readable(date_obj):
         return f"{date_obj.day} {months[date_obj.month - 1]} {date_obj.year}"
 
 
+def get_user_poll_votes(user, messages_list):
+    """ID вариантов, за которые голосовал пользователь в опросах из сообщений"""
+    if not user.is_authenticated:
+        return set()
+
+    poll_ids = [msg.poll.id for msg in messages_list if getattr(msg, "poll", None)]
+    if not poll_ids:
+        return set()
+
+    return set(
+        PollVote.objects.filter(user=user, option__poll_id__in=poll_ids).values_list(
+            "option_id", flat=True
+        )
+    )
+
+
 def create_message_data(message, user_votes):
     """Создание данных сообщения для API"""
     message_data = {
@@ -65,6 +103,8 @@ def create_message_data(message, user_votes):
     }
 
     if message.message_type == "poll" and hasattr(message, "poll"):
+        # Счетчики голосов хранятся в самих записях и уже загружены
+        # через prefetch_related, поэтому здесь нет запросов к голосам
         poll = message.poll
         message_data["poll"] = {
             "id": poll.id,
@@ -145,40 +185,33 @@ def process_messages_with_dates(messages_list, user_votes, is_new_messages=False
 def chat_view(request):
     """Основной чат"""
     # Получаем сообщения с предзагрузкой связанных данных
-    messages_queryset = (
-        Message.objects.select_related("author")
-        .prefetch_related(
-            Prefetch(
-                "poll",
-                queryset=Poll.objects.prefetch_related(
-                    Prefetch(
-                        "options", queryset=PollOption.objects.prefetch_related("votes")
-                    )
-                ),
-            )
+    messages_queryset = Message.objects.select_related("author").prefetch_related(
+        Prefetch(
+            "poll",
+            queryset=Poll.objects.prefetch_related("options"),
         )
-        .order_by("created_at")
     )
 
-    # Пагинация
-    paginator = Paginator(messages_queryset, 50)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    # Keyset пагинация: последние сообщения или сообщения до ?before=<id>
+    paginator = MessageKeysetPaginator(messages_queryset, CHAT_PAGE_SIZE)
+    try:
+        before_id = int(request.GET.get("before", 0))
+    except ValueError:
+        before_id = 0
+    page_obj = paginator.before(before_id) if before_id else paginator.latest()
+
+    # Страница выбрана от новых к старым, показываем в хронологическом порядке
+    chat_messages = page_obj.object_list[::-1]
 
     # Группируем сообщения по дням
-    grouped_messages = group_messages_by_date(page_obj.object_list)
+    grouped_messages = group_messages_by_date(chat_messages)
 
     # Формы для отправки сообщений
     message_form = MessageForm()
     poll_form = PollForm()
 
     # Получаем информацию о голосах пользователя
-    user_votes = {}
-    if request.user.is_authenticated:
-        votes = PollVote.objects.filter(
-            user=request.user, option__poll__message__in=page_obj.object_list
-        ).select_related("option")
-        user_votes = {vote.option_id: True for vote in votes}
+    user_votes = get_user_poll_votes(request.user, chat_messages)
 
     # Получаем сегодня и вчера для шаблона
     today = timezone.now().date()
@@ -187,7 +220,7 @@ def chat_view(request):
     context = {
         "page_obj": page_obj,
         "grouped_messages": grouped_messages,
-        "chat_messages": page_obj.object_list,
+        "chat_messages": chat_messages,
         "message_form": message_form,
         "poll_form": poll_form,
         "user_votes": user_votes,
@@ -210,6 +243,7 @@ def send_message(request):
             message = form.save(commit=False)
             message.author = request.user
             message.save()
+            events.publish_message(message.id)
 
             if is_ajax:
                 return JsonResponse(
@@ -246,6 +280,7 @@ def create_poll(request):
         if form.is_valid():
             try:
                 poll = form.save(request.user)
+                events.publish_message(poll.message_id)
 
                 if is_ajax:
                     return JsonResponse(
@@ -287,22 +322,10 @@ def vote_poll(request, poll_id, option_id):
     poll = get_object_or_404(Poll, id=poll_id, is_active=True)
     option = get_object_or_404(PollOption, id=option_id, poll=poll)
 
-    # Проверяем, голосовал ли уже пользователь
-    existing_votes = PollVote.objects.filter(user=request.user, option__poll=poll)
-
-    if not poll.multiple_choice and existing_votes.exists():
-        # Если не множественный выбор, удаляем предыдущий голос
-        existing_votes.delete()
-
-    # Проверяем, голосовал ли за этот вариант
-    vote, created = PollVote.objects.get_or_create(user=request.user, option=option)
-
-    if not created:
-        # Если уже голосовал за этот вариант, отменяем голос
-        vote.delete()
-        voted = False
-    else:
-        voted = True
+    # Переключаем голос и обновляем счетчики в одной транзакции
+    voted = PollService.toggle_vote(request.user, poll, option)
+    events.publish_poll(poll.id)
+    poll.refresh_from_db(fields=["total_votes"])
 
     # Получаем информацию о том, за какие варианты пользователь проголосовал
     user_voted_options = set(
@@ -361,7 +384,9 @@ def close_poll(request, poll_id):
     # Проверяем права доступа
     if request.user == poll.message.author or request.user.is_staff:
         poll.is_active = False
-        poll.save()
+        # Не перезаписываем счетчики голосов устаревшими значениями
+        poll.save(update_fields=["is_active"])
+        events.publish_poll(poll.id)
         messages.success(request, "Голосование закрыто.")
     else:
         messages.error(request, "У вас нет прав для закрытия этого голосования.")
@@ -369,51 +394,40 @@ def close_poll(request, poll_id):
     return redirect("chat:chat")
 
 
-def chat_api_messages(request):
-    """API для получения сообщений (для AJAX обновления)"""
-    last_message_id = int(request.GET.get("last_id", 0))
-    before_id = request.GET.get("before_id")
+def parse_message_id(value):
+    """
+    Id сообщения из параметра запроса: пустое значение - 0.
+    Нечисловое или отрицательное значение - ValueError.
+    """
+    message_id = int(value or 0)
+    if message_id < 0:
+        raise ValueError(value)
+    return message_id
 
-    # Константы
-    messages_per_page = 20
 
+def get_messages_payload(user, last_message_id=0, before_id=None):
+    """Данные для API сообщений: новые после last_id или старые до before_id"""
     # Получаем базовый QuerySet
     base_queryset = Message.objects.select_related("author").prefetch_related(
         Prefetch("poll", queryset=Poll.objects.prefetch_related("options"))
     )
+    paginator = MessageKeysetPaginator(base_queryset, API_PAGE_SIZE)
 
     # Определяем тип запроса и получаем сообщения
     if before_id:
         # Загрузка старых сообщений
-        messages_queryset = base_queryset.filter(id__lt=before_id).order_by(
-            "-created_at"
-        )[:messages_per_page]
-        has_more = messages_queryset.count() == messages_per_page
+        page = paginator.before(before_id)
+        has_more = page.has_more
         is_new_messages = False
     else:
         # Загрузка новых сообщений
-        messages_queryset = base_queryset.filter(id__gt=last_message_id).order_by(
-            "created_at"
-        )[:messages_per_page]
+        page = paginator.after(last_message_id)
         has_more = False
         is_new_messages = True
+    messages_list = page.object_list
 
-    # Получаем голоса пользователя для опросов
-    user_votes = set()
-    if request.user.is_authenticated:
-        poll_ids = [
-            msg.poll.id
-            for msg in messages_queryset
-            if hasattr(msg, "poll") and msg.poll
-        ]
-        if poll_ids:
-            votes = PollVote.objects.filter(
-                user=request.user, option__poll_id__in=poll_ids
-            ).values_list("option_id", flat=True)
-            user_votes = set(votes)
-
-    # Получаем список сообщений для обработки
-    messages_list = list(messages_queryset)
+    # Получаем голоса пользователя для опросов на странице одним запросом
+    user_votes = get_user_poll_votes(user, messages_list)
 
     # Обрабатываем сообщения с разделителями дат
     messages_data, _ = process_messages_with_dates(
@@ -426,10 +440,129 @@ def chat_api_messages(request):
     else:
         latest_message_id = last_message_id
 
-    return JsonResponse(
-        {
-            "messages": messages_data,
-            "last_id": latest_message_id,
-            "has_more": has_more,
-        }
+    return {
+        "messages": messages_data,
+        "last_id": latest_message_id,
+        "has_more": has_more,
+    }
+
+
+@use_replica
+def chat_api_messages(request):
+    """API для получения сообщений (для AJAX обновления)"""
+    try:
+        last_message_id = parse_message_id(request.GET.get("last_id"))
+        before_id = parse_message_id(request.GET.get("before_id"))
+    except ValueError:
+        return JsonResponse({"error": "Некорректный id сообщения"}, status=400)
+
+    return JsonResponse(get_messages_payload(request.user, last_message_id, before_id))
+
+
+def build_message_event(message_id):
+    """SSE событие о новом сообщении в формате API сообщений"""
+    message = (
+        Message.objects.select_related("author")
+        .prefetch_related(
+            Prefetch("poll", queryset=Poll.objects.prefetch_related("options"))
+        )
+        .filter(id=message_id)
+        .first()
     )
+    if message is None:
+        return None
+
+    # Голоса пользователя в новом сообщении еще не учтены
+    messages_data, _ = process_messages_with_dates([message], set(), True)
+    return {
+        "event": "messages",
+        "id": message.id,
+        "data": {"messages": messages_data, "last_id": message.id, "has_more": False},
+    }
+
+
+def build_poll_event(poll_id):
+    """SSE событие об изменении результатов голосования"""
+    poll = Poll.objects.prefetch_related("options").filter(id=poll_id).first()
+    if poll is None:
+        return None
+
+    return {
+        "event": "poll",
+        "id": None,
+        "data": {
+            "poll_id": poll.id,
+            "is_active": poll.is_active,
+            "total_votes": poll.total_votes,
+            "options": [
+                {
+                    "id": opt.id,
+                    "vote_count": opt.vote_count,
+                    "vote_percentage": opt.vote_percentage,
+                }
+                for opt in poll.options.all()
+            ],
+        },
+    }
+
+
+async def chat_api_stream(request):
+    """Поток событий чата (Server-Sent Events)"""
+    if not isinstance(request, ASGIRequest) or not events.is_supported():
+        # Без ASGI сервера поток занял бы воркер целиком.
+        # Статус 204 останавливает EventSource, и клиент переходит на опрос API
+        return HttpResponse(status=204)
+
+    try:
+        last_id = parse_message_id(
+            request.headers.get("Last-Event-ID") or request.GET.get("last_id")
+        )
+    except ValueError:
+        return HttpResponseBadRequest("Некорректный id сообщения")
+    user = await request.auser()
+
+    response = StreamingHttpResponse(
+        chat_event_stream(user, last_id), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+async def chat_event_stream(user, last_id):
+    """Генератор событий для одного подключенного клиента"""
+    # Подписываемся до догрузки, чтобы не потерять события между запросами
+    queue = events.broadcaster.subscribe()
+    try:
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+
+        # Догружаем пропущенное по контракту last_id постранично,
+        # пока не дойдем до последнего сообщения
+        while True:
+            payload = await sync_to_async(get_messages_payload)(user, last_id)
+            if not payload["messages"]:
+                break
+            last_id = payload["last_id"]
+            yield events.format_sse("messages", payload, last_id)
+
+        while True:
+            try:
+                event = await asyncio.wait_for(
+                    queue.get(), timeout=SSE_HEARTBEAT_INTERVAL
+                )
+            except TimeoutError:
+                yield ": ping\n\n"
+                continue
+
+            if event is None:
+                # Клиент не успевает читать: закрываем, он переподключится
+                break
+            if event["event"] == "messages":
+                if event["id"] <= last_id:
+                    continue
+                last_id = event["id"]
+                yield events.format_sse("messages", event["data"], last_id)
+            else:
+                yield events.format_sse(event["event"], event["data"])
+    finally:
+        events.broadcaster.unsubscribe(queue)
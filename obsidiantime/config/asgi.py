@@ -11,6 +11,24 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from obsidiantime.config.lifespan import LifespanMiddleware
+
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "obsidiantime.config.settings")
+# Настройки отключают постоянные соединения с БД под ASGI (см. DB_POOL_MODE)
+os.environ.setdefault("DJANGO_ASGI", "true")
+
+django_application = get_asgi_application()
+
+# Прогреваем кеш настроек сайта до первого запроса
+from obsidiantime.main.cache import warm_singletons  # noqa: E402
+from obsidiantime.main.view_counts import view_counter  # noqa: E402
+
+warm_singletons()
+
+# Периодическая запись накопленных просмотров в БД
+view_counter.start_flusher()
 
-application = get_asgi_application()
+# При остановке воркера остаток просмотров записывается в БД
+application = LifespanMiddleware(
+    django_application, on_shutdown=[view_counter.drain_on_exit]
+)
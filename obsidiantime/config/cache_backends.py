@@ -0,0 +1,156 @@
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from prometheus_client import Counter
+
+# Значение-маркер отсутствия ключа (None может быть закешированным значением)
+_MISSING = object()
+
+cache_tier_requests = Counter(
+    "obsidiantime_cache_tier_requests_total",
+    "Cache lookups served by the in-process (l1) or shared (l2) tier",
+    ["tier", "result"],
+)
+
+
+class TwoTierCache(BaseCache):
+    """
+    Двухуровневый кеш: L1 в памяти процесса с коротким TTL перед общим L2.
+
+    Чтения сначала идут в L1, промахи - в общий кеш (Redis или БД),
+    найденное значение кладется в L1. Запись и удаление идут в оба уровня,
+    поэтому другие воркеры видят изменения не позже чем через L1_TIMEOUT.
+
+    Параметры OPTIONS:
+        L2_ALIAS - алиас общего кеша в CACHES (по умолчанию "shared")
+        L1_TIMEOUT - время жизни записей в L1, в секундах
+        L1_MAX_ENTRIES - максимум записей в L1
+    """
+
+    def __init__(self, location, params):
+        options = params.get("OPTIONS", {})
+        self._l2_alias = options.get("L2_ALIAS", "shared")
+        self._l1_timeout = options.get("L1_TIMEOUT", 5)
+        super().__init__(params)
+
+        # Ключи уже содержат префикс и версию, L1 и L2 их не меняют повторно
+        self._l1 = LocMemCache(
+            f"two-tier-{location or self._l2_alias}",
+            {
+                "TIMEOUT": self._l1_timeout,
+                "OPTIONS": {"MAX_ENTRIES": options.get("L1_MAX_ENTRIES", 1000)},
+                "KEY_FUNCTION": _raw_key,
+            },
+        )
+
+    @property
+    def _l2(self):
+        return caches[self._l2_alias]
+
+    def _l1_timeout_for(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self._l1_timeout
+        return min(timeout, self._l1_timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        added = self._l2.add(key, value, self._timeout(timeout), version=1)
+        if added:
+            self._l1.set(key, value, self._l1_timeout_for(timeout))
+        return added
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+
+        value = self._l1.get(key, _MISSING)
+        if value is not _MISSING:
+            cache_tier_requests.labels(tier="l1", result="hit").inc()
+            return value
+        cache_tier_requests.labels(tier="l1", result="miss").inc()
+
+        value = self._l2.get(key, _MISSING, version=1)
+        if value is _MISSING:
+            cache_tier_requests.labels(tier="l2", result="miss").inc()
+            return default
+        cache_tier_requests.labels(tier="l2", result="hit").inc()
+
+        self._l1.set(key, value, self._l1_timeout)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = {self.make_and_validate_key(key, version=version): key for key in keys}
+
+        found = {}
+        missing = []
+        for key, original in keys.items():
+            value = self._l1.get(key, _MISSING)
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[original] = value
+        cache_tier_requests.labels(tier="l1", result="hit").inc(len(found))
+        cache_tier_requests.labels(tier="l1", result="miss").inc(len(missing))
+        if not missing:
+            return found
+
+        # Промахи L1 читаются из общего кеша одним запросом
+        shared = self._l2.get_many(missing, version=1)
+        cache_tier_requests.labels(tier="l2", result="hit").inc(len(shared))
+        cache_tier_requests.labels(tier="l2", result="miss").inc(
+            len(missing) - len(shared)
+        )
+        for key, value in shared.items():
+            self._l1.set(key, value, self._l1_timeout)
+            found[keys[key]] = value
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        data = {
+            self.make_and_validate_key(key, version=version): value
+            for key, value in data.items()
+        }
+        failed = self._l2.set_many(data, self._timeout(timeout), version=1)
+        l1_timeout = self._l1_timeout_for(timeout)
+        for key, value in data.items():
+            self._l1.set(key, value, l1_timeout)
+        return failed
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._l2.set(key, value, self._timeout(timeout), version=1)
+        self._l1.set(key, value, self._l1_timeout_for(timeout))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._l2.touch(key, self._timeout(timeout), version=1)
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._l1.delete(key)
+        return self._l2.delete(key, version=1)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        # Атомарность обеспечивает общий кеш, в L1 значение не держим
+        self._l1.delete(key)
+        return self._l2.incr(key, delta, version=1)
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version=version) is not _MISSING
+
+    def clear(self):
+        self._l1.clear()
+        self._l2.clear()
+
+    def close(self, **kwargs):
+        self._l2.close(**kwargs)
+
+    def _timeout(self, timeout):
+        # Явный таймаут по умолчанию этого кеша, а не общего
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+
+def _raw_key(key, key_prefix, version):
+    return key
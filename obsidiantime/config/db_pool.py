@@ -0,0 +1,86 @@
+"""
+Метрики пула соединений с PostgreSQL (DB_POOL_MODE=pool).
+
+Статистика пула psycopg читается при опросе /metrics, запросы к
+приложению метрики не замедляют. Насыщение - доля занятых соединений
+от максимального размера пула: если оно держится около 1 и растет время
+ожидания соединения, пул пора увеличивать (DB_POOL_MAX_SIZE) или
+разгружать БД.
+"""
+
+from django.db import connections
+from prometheus_client.core import REGISTRY, CounterMetricFamily, GaugeMetricFamily
+
+# Показатели пула: имя метрики, описание и ключ статистики psycopg_pool
+POOL_GAUGES = {
+    "size": ("Connections currently managed by the pool", "pool_size"),
+    "available": ("Idle connections ready to be used", "pool_available"),
+    "max": ("Maximum pool size", "pool_max"),
+    "waiting": ("Requests currently waiting for a connection", "requests_waiting"),
+}
+POOL_COUNTERS = {
+    "requests": ("Connections requested from the pool", "requests_num"),
+    "requests_queued": ("Requests that waited for a connection", "requests_queued"),
+    "errors": ("Requests that failed to get a connection", "requests_errors"),
+    "connections_lost": ("Broken connections found by checks", "connections_lost"),
+}
+
+
+def iter_pool_stats():
+    """Статистика пулов соединений: пары (алиас БД, словарь psycopg_pool)"""
+    for alias in connections:
+        connection = connections[alias]
+        if connection.vendor != "postgresql":
+            continue
+        if not connection.settings_dict["OPTIONS"].get("pool"):
+            continue
+        yield alias, connection.pool.get_stats()
+
+
+def _metric(family, name, doc):
+    return family(f"obsidiantime_db_pool_{name}", doc, labels=["alias"])
+
+
+class DatabasePoolCollector:
+    """Prometheus коллектор: размер, насыщение и ожидание пула соединений"""
+
+    def _families(self):
+        stats_metrics = [
+            (_metric(GaugeMetricFamily, name, doc), key)
+            for name, (doc, key) in POOL_GAUGES.items()
+        ] + [
+            (_metric(CounterMetricFamily, name, doc), key)
+            for name, (doc, key) in POOL_COUNTERS.items()
+        ]
+        saturation = _metric(
+            GaugeMetricFamily,
+            "saturation",
+            "Share of the maximum pool size checked out by requests",
+        )
+        wait = _metric(
+            CounterMetricFamily,
+            "wait_seconds",
+            "Total time requests spent waiting for a connection",
+        )
+        return stats_metrics, saturation, wait
+
+    def describe(self):
+        # Регистрация коллектора не должна создавать пулы соединений
+        stats_metrics, saturation, wait = self._families()
+        return [metric for metric, _ in stats_metrics] + [saturation, wait]
+
+    def collect(self):
+        stats_metrics, saturation, wait = self._families()
+
+        for alias, stats in iter_pool_stats():
+            # Счетчики psycopg_pool появляются в статистике после первого события
+            for metric, key in stats_metrics:
+                metric.add_metric([alias], stats.get(key, 0))
+            in_use = stats.get("pool_size", 0) - stats.get("pool_available", 0)
+            saturation.add_metric([alias], in_use / (stats.get("pool_max") or 1))
+            wait.add_metric([alias], stats.get("requests_wait_ms", 0) / 1000)
+
+        return [metric for metric, _ in stats_metrics] + [saturation, wait]
+
+
+REGISTRY.register(DatabasePoolCollector())
@@ -0,0 +1,168 @@
+"""
+Чтение с реплик PostgreSQL.
+
+Представления только для чтения помечаются декоратором use_replica, а
+отдельные запросы вне представлений оборачиваются в replica_reads(): в
+этих блоках ReplicaRouter отправляет SELECT на одну из реплик
+(DATABASE_REPLICAS), запись всегда идет на основную БД.
+
+Реплика выбирается один раз на блок среди тех, чье отставание не больше
+DB_REPLICA_MAX_LAG секунд. Отставание проверяется запросом к реплике
+и кешируется на LAG_CHECK_INTERVAL секунд, недоступная реплика считается
+отставшей. Если подходящих реплик нет, чтения идут на основную БД.
+
+После успешного изменяющего запроса (POST и т.п.) посетитель получает
+cookie на DB_REPLICA_STICKY_SECONDS секунд, и его чтения идут на основную
+БД: он сразу видит свое сообщение или лайк, даже если реплика отстает.
+"""
+
+import logging
+import math
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from http import HTTPStatus
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+# Cookie, пока которая есть, чтения посетителя идут на основную БД
+STICKY_COOKIE = "db_primary"
+
+# Как часто проверять отставание реплики, в секундах
+LAG_CHECK_INTERVAL = 5
+
+# Приложения, которые всегда читаются с основной БД (сессии меняются
+# почти каждым запросом)
+PRIMARY_ONLY_APPS = {"sessions"}
+
+# Отставание реплики в секундах (0, если все полученные изменения применены)
+LAG_SQL = """
+    SELECT COALESCE(
+        CASE
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+        END,
+        0
+    )
+"""
+
+# Реплика текущего блока чтения (None - основная БД)
+_replica_alias = ContextVar("replica_alias", default=None)
+
+
+def measure_replica_lag(alias):
+    """Отставание реплики в секундах; недоступная реплика - бесконечность"""
+    connection = connections[alias]
+    if connection.vendor != "postgresql":
+        return 0.0
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(LAG_SQL)
+            return float(cursor.fetchone()[0])
+    except DatabaseError:
+        logger.warning("Реплика %s недоступна", alias, exc_info=True)
+        return math.inf
+
+
+def get_replica_lag(alias):
+    key = f"db_replica_lag:{alias}"
+    lag = cache.get(key)
+    if lag is None:
+        lag = measure_replica_lag(alias)
+        cache.set(key, lag, LAG_CHECK_INTERVAL)
+    return lag
+
+
+def pick_replica():
+    """Случайная реплика с допустимым отставанием или None"""
+    replicas = [
+        alias
+        for alias in settings.DATABASE_REPLICAS
+        if get_replica_lag(alias) <= settings.DB_REPLICA_MAX_LAG
+    ]
+    return random.choice(replicas) if replicas else None
+
+
+@contextmanager
+def replica_reads():
+    """Блок, чтения в котором идут на реплику"""
+    token = _replica_alias.set(pick_replica() if settings.DATABASE_REPLICAS else None)
+    try:
+        yield
+    finally:
+        _replica_alias.reset(token)
+
+
+def use_replica(view):
+    """
+    Декоратор представления только для чтения: запросы GET читают с реплики,
+    если посетитель недавно ничего не менял.
+    """
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD") or STICKY_COOKIE in request.COOKIES:
+            return view(request, *args, **kwargs)
+
+        with replica_reads():
+            response = view(request, *args, **kwargs)
+            # Ленивые шаблоны тоже должны читать с реплики
+            if hasattr(response, "render") and not response.is_rendered:
+                response.render()
+        return response
+
+    return wrapper
+
+
+class ReplicaRouter:
+    """Роутер: чтения в блоках replica_reads() - с реплики, запись - в основную БД"""
+
+    def db_for_read(self, model, **hints):
+        alias = _replica_alias.get()
+        if alias is None or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return None
+        # Внутри транзакции читаем то же, что пишем
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и в основной БД
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class PrimaryStickinessMiddleware:
+    """После успешного изменения данных чтения посетителя идут на основную БД"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            settings.DATABASE_REPLICAS
+            and request.method not in ("GET", "HEAD", "OPTIONS")
+            and response.status_code < HTTPStatus.BAD_REQUEST
+        ):
+            response.set_cookie(
+                STICKY_COOKIE,
+                "1",
+                max_age=settings.DB_REPLICA_STICKY_SECONDS,
+                secure=request.is_secure(),
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
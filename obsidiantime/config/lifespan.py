@@ -0,0 +1,41 @@
+"""
+Протокол ASGI lifespan.
+
+Django обслуживает только HTTP и WebSocket и не отвечает на события
+lifespan, поэтому сервер (uvicorn) не сообщает приложению об остановке
+воркера. LifespanMiddleware отвечает на эти события сам и при остановке
+воркера, в том числе при перезапуске gunicorn по max_requests, вызывает
+обработчики on_shutdown до выхода процесса.
+"""
+
+import logging
+
+from asgiref.sync import sync_to_async
+
+logger = logging.getLogger(__name__)
+
+
+class LifespanMiddleware:
+    """ASGI приложение с обработчиками остановки воркера"""
+
+    def __init__(self, app, on_shutdown=()):
+        self.app = app
+        self.on_shutdown = list(on_shutdown)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "lifespan":
+            await self.app(scope, receive, send)
+            return
+
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for handler in self.on_shutdown:
+                    try:
+                        await sync_to_async(handler)()
+                    except Exception:
+                        logger.exception("Ошибка обработчика остановки воркера")
+                await send({"type": "lifespan.shutdown.complete"})
+                return
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -47,6 +48,7 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "django.contrib.sites",
+    "django.contrib.postgres",
     "crispy_forms",
     "crispy_bootstrap4",
     "tinymce",
@@ -68,6 +70,7 @@ MIDDLEWARE = [
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
+    "obsidiantime.config.db_router.PrimaryStickinessMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "django_prometheus.middleware.PrometheusAfterMiddleware",
     # Кастомные middleware для метрик
@@ -115,6 +118,96 @@ DATABASES = {
     }
 }
 
+# Под ASGI (config/asgi.py выставляет DJANGO_ASGI=true) синхронный код
+# запросов выполняется в разных потоках, и постоянные соединения не
+# переиспользуются, а копятся до закрытия: Django требует CONN_MAX_AGE=0.
+# Переиспользование соединений под ASGI дают режимы pool и pgbouncer
+DJANGO_ASGI = os.getenv("DJANGO_ASGI", "false").lower() == "true"
+
+# Соединения с PostgreSQL
+# DB_POOL_MODE выбирает, как воркеры держат соединения:
+#   persistent - соединение процесса живет DB_CONN_MAX_AGE секунд и
+#                проверяется перед повторным использованием (по умолчанию
+#                под WSGI и в management-командах, под ASGI запрещен)
+#   pool       - пул соединений psycopg в каждом процессе (пакет
+#                psycopg-pool), от DB_POOL_MIN_SIZE до DB_POOL_MAX_SIZE
+#                (по умолчанию под ASGI)
+#   pgbouncer  - внешний пул pgbouncer в режиме transaction
+#                (профиль pgbouncer в docker-compose.yml)
+#   none       - новое соединение на каждый запрос
+# Метрики пула - obsidiantime_db_pool_* (см. config/db_pool.py)
+DB_POOL_MODE = os.getenv(
+    "DB_POOL_MODE", "pool" if DJANGO_ASGI else "persistent"
+).lower()
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "60"))
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+if DJANGO_ASGI:
+    if DB_POOL_MODE == "persistent":
+        raise ImproperlyConfigured(
+            "DB_POOL_MODE=persistent не работает под ASGI: каждый запрос "
+            "открывал бы новое соединение. Используйте pool или pgbouncer"
+        )
+    DB_CONN_MAX_AGE = 0
+
+if DB_POOL_MODE == "pool":
+    # Пул сам переиспользует соединения, CONN_MAX_AGE должен быть 0
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": DB_POOL_MIN_SIZE,
+            "max_size": DB_POOL_MAX_SIZE,
+            "timeout": DB_POOL_TIMEOUT,
+        },
+    }
+elif DB_POOL_MODE == "pgbouncer":
+    # В режиме transaction соседние транзакции идут через разные серверные
+    # соединения: без серверных курсоров и подготовленных выражений.
+    # LISTEN так не работает, слушатель чата подключается к PostgreSQL
+    # напрямую (CHAT_LISTEN_DB_HOST ниже)
+    DATABASES["default"]["CONN_MAX_AGE"] = DB_CONN_MAX_AGE
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+    DATABASES["default"]["DISABLE_SERVER_SIDE_CURSORS"] = True
+    DATABASES["default"]["OPTIONS"] = {"prepare_threshold": None}
+elif DB_POOL_MODE == "persistent":
+    DATABASES["default"]["CONN_MAX_AGE"] = DB_CONN_MAX_AGE
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+
+# Слушатель событий чата (chat/events.py) держит LISTEN на своем соединении
+# все время работы процесса, поэтому подключается к PostgreSQL напрямую, а не
+# через pgbouncer: CHAT_LISTEN_DB_HOST и CHAT_LISTEN_DB_PORT (по умолчанию
+# DB_HOST и DB_PORT). БД и учетные данные те же, что у основной
+CHAT_LISTEN_DB_HOST = os.getenv("CHAT_LISTEN_DB_HOST", DATABASES["default"]["HOST"])
+CHAT_LISTEN_DB_PORT = os.getenv("CHAT_LISTEN_DB_PORT", DATABASES["default"]["PORT"])
+
+# Реплики для чтения: DB_REPLICA_HOSTS - хосты через запятую, БД и учетные
+# данные те же, что у основной. Представления с @use_replica читают
+# с реплики, отстающей не больше DB_REPLICA_MAX_LAG секунд, а посетитель
+# после изменения данных DB_REPLICA_STICKY_SECONDS секунд читает с основной
+# БД (см. config/db_router.py)
+DB_REPLICA_HOSTS = [
+    host.strip()
+    for host in os.getenv("DB_REPLICA_HOSTS", "").split(",")
+    if host.strip()
+]
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))
+DB_REPLICA_STICKY_SECONDS = int(os.getenv("DB_REPLICA_STICKY_SECONDS", "10"))
+
+DATABASE_REPLICAS = []
+for number, host in enumerate(DB_REPLICA_HOSTS, start=1):
+    alias = f"replica_{number}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": host,
+        # В тестах реплика - та же БД, что и основная
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["obsidiantime.config.db_router.ReplicaRouter"]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -387,6 +480,10 @@ ROBOTS_SETTINGS = {
     "CRAWL_DELAY": 1,
 }
 
+# Каталог собранного robots.txt: файл пересобирается при изменении правил,
+# nginx отдает его с диска
+SEO_FILES_ROOT = Path(os.getenv("SEO_FILES_ROOT", BASE_DIR / "seo_files"))
+
 # Настройки для производительности (Core Web Vitals)
 PERFORMANCE_SETTINGS = {
     "ENABLE_COMPRESSION": True,
@@ -516,21 +613,68 @@ LOGGING = {
 }
 
 # Настройки кеширования
-CACHES = {
-    "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-        "LOCATION": "unique-snowflake",
-    }
+# CACHE_BACKEND выбирает общий кеш для всех воркеров:
+#   locmem   - кеш в памяти каждого процесса (по умолчанию, для разработки)
+#   redis    - Redis или совместимый сервер по CACHE_URL (нужен пакет redis)
+#   database - таблица в PostgreSQL (python manage.py createcachetable)
+# Для redis и database перед общим кешем ставится L1 кеш процесса
+# с коротким TTL (CACHE_L1_TIMEOUT), см. config/cache_backends.py
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "locmem").lower()
+CACHE_URL = os.getenv("CACHE_URL", "redis://localhost:6379/1")
+CACHE_L1_TIMEOUT = int(os.getenv("CACHE_L1_TIMEOUT", "5"))
+CACHE_DEFAULT_TIMEOUT = int(os.getenv("CACHE_DEFAULT_TIMEOUT", "300"))
+
+SHARED_CACHE_BACKENDS = {
+    "redis": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": CACHE_URL,
+    },
+    "database": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "django_cache",
+    },
 }
 
+if CACHE_BACKEND in SHARED_CACHE_BACKENDS:
+    CACHES = {
+        "default": {
+            "BACKEND": "obsidiantime.config.cache_backends.TwoTierCache",
+            "KEY_PREFIX": "obsidiantime",
+            "TIMEOUT": CACHE_DEFAULT_TIMEOUT,
+            "OPTIONS": {
+                "L2_ALIAS": "shared",
+                "L1_TIMEOUT": CACHE_L1_TIMEOUT,
+            },
+        },
+        "shared": {
+            **SHARED_CACHE_BACKENDS[CACHE_BACKEND],
+            "TIMEOUT": CACHE_DEFAULT_TIMEOUT,
+        },
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "unique-snowflake",
+            "TIMEOUT": CACHE_DEFAULT_TIMEOUT,
+        }
+    }
+
 # Настройки для файлов
-FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
+# Загрузки больше 2.5MB сохраняются во временный файл, а не в память воркера
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 
 # Настройки для медиа файлов
 MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 10MB
 ALLOWED_IMAGE_TYPES = ["image/jpeg", "image/png", "image/gif", "image/webp"]
 ALLOWED_VIDEO_TYPES = ["video/mp4", "video/webm", "video/ogg"]
+# Максимум пикселей в загружаемом изображении (проверяется до декодирования)
+MAX_IMAGE_PIXELS = 24 * 1000 * 1000
+
+# Фоновая оптимизация изображений мемов: число потоков в каждом процессе.
+# 0 - обработка только командой process_meme_images
+GALLERY_IMAGE_WORKERS = int(os.getenv("GALLERY_IMAGE_WORKERS", "2"))
 
 # Настройки для сообщений
 MESSAGE_STORAGE = "django.contrib.messages.storage.session.SessionStorage"
@@ -21,7 +21,12 @@ from django.contrib import admin
 from django.urls import include, path
 from django.views.static import serve
 
-from obsidiantime.seo.views import RobotsTxtView, SitemapView, StructuredDataView
+from obsidiantime.seo.views import (
+    RobotsTxtView,
+    SitemapView,
+    StructuredDataView,
+    sitemap_shard,
+)
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -34,6 +39,11 @@ urlpatterns = [
     # SEO файлы - доступны напрямую
     path("robots.txt", RobotsTxtView.as_view(), name="robots_txt"),
     path("sitemap.xml", SitemapView.as_view(), name="sitemap_xml"),
+    path(
+        "sitemaps/<slug:section>-<int:number>.xml.gz",
+        sitemap_shard,
+        name="sitemap_shard",
+    ),
     path("structured-data.json", StructuredDataView.as_view(), name="structured_data"),
     # Favicon - доступен в корне
     path(
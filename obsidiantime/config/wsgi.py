@@ -14,3 +14,12 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "obsidiantime.config.settings")
 
 application = get_wsgi_application()
+
+# Прогреваем кеш настроек сайта до первого запроса
+from obsidiantime.main.cache import warm_singletons  # noqa: E402
+from obsidiantime.main.view_counts import view_counter  # noqa: E402
+
+warm_singletons()
+
+# Периодическая запись накопленных просмотров в БД
+view_counter.start_flusher()
@@ -15,36 +15,37 @@ class MemeAdmin(admin.ModelAdmin):
         "image_preview",
         "likes_count",
         "dislikes_count",
-        "get_rating",
+        "rating",
         "views",
         "is_approved",
         "created_at",
     ]
-    list_filter = ["is_approved", "created_at", "author"]
+    list_filter = ["is_approved", "processing_status", "created_at", "author"]
     search_fields = ["title", "description", "author__username"]
-    readonly_fields = ["created_at", "updated_at", "views", "image_preview"]
+    readonly_fields = [
+        "created_at",
+        "updated_at",
+        "views",
+        "likes_count",
+        "dislikes_count",
+        "comments_count",
+        "rating",
+        "hot_score",
+        "processing_status",
+        "image_preview",
+    ]
     list_editable = ["is_approved"]
 
     def image_preview(self, obj):
         if obj.image:
             return format_html(
                 '<img src="{}" style="max-height: 100px; max-width: 150px;" />',
-                obj.image.url,
+                obj.rendition_url("admin", "webp"),
             )
         return "Нет изображения"
 
     image_preview.short_description = "Превью"
 
-    def likes_count(self, obj):
-        return obj.likes_count
-
-    likes_count.short_description = "Лайки"
-
-    def dislikes_count(self, obj):
-        return obj.dislikes_count
-
-    dislikes_count.short_description = "Дизлайки"
-
 
 @admin.register(Like)
 class LikeAdmin(admin.ModelAdmin):
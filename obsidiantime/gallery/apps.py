@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class GalleryConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "obsidiantime.gallery"
+
+    def ready(self):
+        """Импортируем сигналы при запуске приложения"""
+        import obsidiantime.gallery.signals  # noqa
@@ -0,0 +1,209 @@
+"""
+Поиск похожих мемов по перцептивному хешу (dHash).
+
+Хеш - 64 бита: изображение уменьшается до 9x8 в оттенках серого, и каждый
+бит показывает, светлее ли пиксель своего правого соседа. Пересжатие,
+масштабирование и водяные знаки меняют лишь несколько бит, поэтому
+похожесть - это расстояние Хэмминга между хешами.
+
+Хеши всех мемов лежат в BK-дереве в памяти процесса: поиск в радиусе
+нескольких бит обходит лишь малую часть дерева, а не всю таблицу.
+Дерево дополняется новыми мемами по возрастанию id и периодически
+перестраивается целиком, чтобы учесть пересчитанные хеши. Удаленный мем
+убирается из дерева процесса, где его удалили (gallery/signals.py), а
+в деревьях других процессов его отсекает запрос к БД при поиске до
+следующего перестроения. Ищет только
+фоновая обработка изображений (tasks.py), поэтому ни хеширование, ни
+перестроение дерева не выполняются в запросах.
+"""
+
+import threading
+import time
+
+from PIL import Image
+
+from .images import open_image
+from .models import Meme
+
+# Размер уменьшенного изображения: 9x8 дает 8x8 = 64 бита сравнений
+HASH_WIDTH = 9
+HASH_HEIGHT = 8
+
+# До какого размера декодировать JPEG перед уменьшением (draft)
+HASH_DRAFT_SIZE = (64, 64)
+
+HASH_MASK = (1 << 64) - 1
+HASH_SIGN_BIT = 1 << 63
+
+# Максимальное расстояние Хэмминга, при котором мемы считаются похожими
+DUPLICATE_MAX_DISTANCE = 8
+
+# Через сколько секунд индекс перестраивается из БД целиком
+INDEX_REBUILD_INTERVAL = 600
+
+
+def image_hash(img):
+    """dHash открытого изображения в виде беззнакового 64-битного числа"""
+    small = img.convert("L").resize(
+        (HASH_WIDTH, HASH_HEIGHT), Image.Resampling.BILINEAR
+    )
+    pixels = list(small.getdata())
+
+    value = 0
+    for row in range(HASH_HEIGHT):
+        offset = row * HASH_WIDTH
+        for col in range(HASH_WIDTH - 1):
+            left = pixels[offset + col]
+            right = pixels[offset + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def compute_image_hash(image_file):
+    """Хеш изображения из файла хранилища (FieldFile)"""
+    with open_image(image_file, HASH_DRAFT_SIZE) as img:
+        return image_hash(img)
+
+
+def hash_to_db(value):
+    """Беззнаковый хеш в значение для BigIntegerField (со знаком)"""
+    return value - (1 << 64) if value & HASH_SIGN_BIT else value
+
+
+def hash_from_db(value):
+    return value & HASH_MASK
+
+
+def hamming_distance(a, b):
+    return ((a ^ b) & HASH_MASK).bit_count()
+
+
+class BKTree:
+    """
+    BK-дерево по расстоянию Хэмминга. Узел - (хеш, id мемов, потомки),
+    потомки разложены по расстоянию до хеша узла. По неравенству
+    треугольника при поиске в радиусе r от узла на расстоянии d
+    достаточно обойти потомков с ключами от d - r до d + r.
+    """
+
+    def __init__(self):
+        self._root = None
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, value, item_id):
+        self._size += 1
+        if self._root is None:
+            self._root = (value, [item_id], {})
+            return
+
+        node = self._root
+        while True:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                node[1].append(item_id)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = (value, [item_id], {})
+                return
+            node = child
+
+    def remove(self, value, item_id):
+        """
+        Удаляет id из узла с хешем value. Узел остается в дереве:
+        через него идет поиск его потомков.
+        """
+        node = self._root
+        while node is not None:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                if item_id in node[1]:
+                    node[1].remove(item_id)
+                    self._size -= 1
+                return
+            node = node[2].get(distance)
+
+    def search(self, value, max_distance):
+        """Список (расстояние, id) в радиусе max_distance, ближайшие первыми"""
+        results = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node_value, item_ids, children = stack.pop()
+            distance = hamming_distance(value, node_value)
+            if distance <= max_distance:
+                results.extend((distance, item_id) for item_id in item_ids)
+            for key, child in children.items():
+                if distance - max_distance <= key <= distance + max_distance:
+                    stack.append(child)
+        results.sort()
+        return results
+
+
+class MemeHashIndex:
+    """BK-дерево хешей мемов, синхронизируемое с БД перед каждым поиском"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tree = None
+        self._last_id = 0
+        self._built_at = 0.0
+
+    def reset(self):
+        with self._lock:
+            self._tree = None
+
+    def _sync(self):
+        now = time.monotonic()
+        if self._tree is None or now - self._built_at > INDEX_REBUILD_INTERVAL:
+            self._tree = BKTree()
+            self._last_id = 0
+            self._built_at = now
+
+        # Дочитываем только мемы, появившиеся после последней синхронизации
+        rows = (
+            Meme.objects.filter(pk__gt=self._last_id, phash__isnull=False)
+            .order_by("pk")
+            .values_list("pk", "phash")
+        )
+        for pk, phash in rows.iterator():
+            self._tree.add(hash_from_db(phash), pk)
+            self._last_id = pk
+
+    def discard(self, meme_id, value):
+        """Убирает удаленный мем с хешем value из дерева"""
+        with self._lock:
+            if self._tree is not None:
+                self._tree.remove(value, meme_id)
+
+    def search(self, value, max_distance=DUPLICATE_MAX_DISTANCE):
+        with self._lock:
+            self._sync()
+            return self._tree.search(value, max_distance)
+
+
+meme_hash_index = MemeHashIndex()
+
+
+def find_similar_memes(
+    value, exclude_id=None, max_distance=DUPLICATE_MAX_DISTANCE, limit=5
+):
+    """
+    Одобренные мемы, похожие на изображение с хешем value, ближайшие
+    первыми. У каждого мема заполнен атрибут hash_distance.
+    """
+    distances = {}
+    for distance, meme_id in meme_hash_index.search(value, max_distance):
+        if meme_id != exclude_id:
+            distances.setdefault(meme_id, distance)
+    if not distances:
+        return []
+
+    # Индекс может хранить удаленные мемы - берем только существующие
+    memes = list(Meme.objects.filter(pk__in=list(distances), is_approved=True))
+    for meme in memes:
+        meme.hash_distance = distances[meme.pk]
+    memes.sort(key=lambda meme: (meme.hash_distance, meme.pk))
+    return memes[:limit]
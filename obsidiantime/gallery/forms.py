@@ -1,7 +1,9 @@
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Div, Field, Layout, Submit
 from django import forms
+from django.conf import settings
 
+from .images import ImageTooLargeError, check_image_pixels
 from .models import Comment, Meme
 
 
@@ -51,6 +53,17 @@ class MemeUploadForm(forms.ModelForm):
                     "Поддерживаемые форматы: JPEG, PNG, GIF, WebP"
                 )
 
+            # Проверяем размер в пикселях по заголовку, до декодирования
+            # (ImageField уже открыл файл и сохранил его в image.image)
+            try:
+                if getattr(image, "image", None) is not None:
+                    check_image_pixels(image.image)
+            except ImageTooLargeError as e:
+                raise forms.ValidationError(
+                    "Изображение слишком большое: не более "
+                    f"{settings.MAX_IMAGE_PIXELS // 1_000_000} мегапикселей"
+                ) from e
+
         return image
 
 
@@ -0,0 +1,87 @@
+"""
+Обработка изображений мемов (выполняется в фоне, см. tasks.py).
+
+Память на одно изображение ограничена: размер в пикселях проверяется
+по заголовку до декодирования, JPEG декодируется сразу уменьшенным
+(draft), а результат пишется во временный файл (SpooledTemporaryFile),
+а не в буфер в памяти.
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files import File
+from PIL import Image
+
+# Максимальный размер оптимизированного изображения
+OPTIMIZED_MAX_SIZE = (800, 600)
+JPEG_QUALITY = 85
+
+# Сколько байт результата держать в памяти до сброса на диск (кодеры
+# Pillow, использующие fileno(), сразу пишут на диск)
+SPOOL_MAX_SIZE = 1024 * 1024
+
+
+class ImageTooLargeError(ValueError):
+    """Изображение больше допустимого числа пикселей"""
+
+
+def check_image_pixels(img):
+    """Проверяет размер изображения по заголовку, до декодирования пикселей"""
+    if img.width * img.height > settings.MAX_IMAGE_PIXELS:
+        raise ImageTooLargeError(
+            f"Изображение {img.width}x{img.height} больше допустимого размера"
+        )
+
+
+@contextmanager
+def open_image(image_file, target_size=None):
+    """
+    Открывает изображение из файла хранилища с проверкой размера.
+    Для JPEG с target_size включает draft(): декодер сразу уменьшает
+    изображение в 2-8 раз, не опускаясь ниже target_size.
+    """
+    image_file.open("rb")
+    try:
+        with Image.open(image_file) as img:
+            check_image_pixels(img)
+            if target_size and img.format == "JPEG":
+                # Квадратная рамка: после поворота по EXIF стороны меняются
+                side = max(target_size)
+                img.draft(None, (side, side))
+            yield img
+    finally:
+        image_file.close()
+
+
+def spooled_file(name):
+    """Временный файл для результата кодирования"""
+    return File(tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE), name=name)
+
+
+def save_image(img, name, pil_format, **options):
+    """Кодирует изображение во временный файл и возвращает его"""
+    output = spooled_file(name)
+    img.save(output, format=pil_format, **options)
+    output.seek(0)
+    return output
+
+
+def optimize_image(image_file):
+    """
+    Уменьшает изображение до OPTIMIZED_MAX_SIZE и пережимает его
+    в исходном формате. Возвращает File с именем исходного файла,
+    который нужно закрыть после сохранения.
+    """
+    name = os.path.basename(image_file.name)
+    with open_image(image_file, OPTIMIZED_MAX_SIZE) as img:
+        img_format = img.format or "JPEG"
+        # Для анимаций декодируется и сохраняется только первый кадр
+        if img.width > OPTIMIZED_MAX_SIZE[0] or img.height > OPTIMIZED_MAX_SIZE[1]:
+            img.thumbnail(OPTIMIZED_MAX_SIZE, Image.Resampling.LANCZOS)
+
+        if img_format == "JPEG":
+            return save_image(img, name, "JPEG", optimize=True, quality=JPEG_QUALITY)
+        return save_image(img, name, img_format, optimize=True)
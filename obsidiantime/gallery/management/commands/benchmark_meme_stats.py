@@ -0,0 +1,105 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from obsidiantime.gallery.models import Comment, Dislike, Like, Meme
+from obsidiantime.gallery.services import MemeRatingService
+
+# Размер пачки bulk_create при создании тестовых данных
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает время запроса статистики мемов: Count() по JOIN, "
+        "подзапросы и денормализованные счетчики. Данные создаются "
+        "в транзакции и откатываются"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--likes", type=int, default=10000, help="Лайков у тестового мема"
+        )
+        parser.add_argument(
+            "--dislikes", type=int, default=0, help="Дизлайков у тестового мема"
+        )
+        parser.add_argument(
+            "--comments", type=int, default=1000, help="Комментариев у тестового мема"
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=3, help="Сколько раз выполнить запрос"
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            meme = self._create_data(options)
+            memes = Meme.objects.filter(pk=meme.pk)
+
+            strategies = [
+                (
+                    "Count() по JOIN",
+                    lambda: memes.annotate(
+                        total_likes=Count("likes"),
+                        total_dislikes=Count("dislikes"),
+                        total_comments=Count("comments"),
+                    ),
+                ),
+                ("with_counted_stats()", memes.with_counted_stats),
+                ("with_stats()", memes.with_stats),
+            ]
+            for title, build in strategies:
+                elapsed, row = self._measure(build, options["repeat"])
+                self.stdout.write(
+                    f"{title:<24} {elapsed * 1000:10.1f} мс  "
+                    f"лайки={row.total_likes} дизлайки={row.total_dislikes} "
+                    f"комментарии={row.total_comments}"
+                )
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS("Готово: тестовые данные удалены."))
+
+    def _measure(self, build, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            row = build().get()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, row
+
+    def _create_data(self, options):
+        likes, dislikes = options["likes"], options["dislikes"]
+        users_count = max(likes + dislikes, options["comments"], 1)
+        self.stdout.write(f"Создание тестовых данных ({users_count} пользователей)...")
+
+        users = User.objects.bulk_create(
+            [User(username=f"benchmark-{i}") for i in range(users_count)],
+            batch_size=BATCH_SIZE,
+        )
+        author = users[0]
+        meme = Meme.objects.bulk_create(
+            [Meme(title="Benchmark", image="memes/benchmark.jpg", author=author)]
+        )[0]
+
+        # Лайки и дизлайки от разных пользователей (одна реакция на человека)
+        Like.objects.bulk_create(
+            [Like(user=user, meme=meme) for user in users[:likes]],
+            batch_size=BATCH_SIZE,
+        )
+        Dislike.objects.bulk_create(
+            [Dislike(user=user, meme=meme) for user in users[likes : likes + dislikes]],
+            batch_size=BATCH_SIZE,
+        )
+        Comment.objects.bulk_create(
+            [
+                Comment(author=users[i], meme=meme, content="Комментарий")
+                for i in range(options["comments"])
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        MemeRatingService.recount([meme.pk])
+        return meme
@@ -0,0 +1,73 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from obsidiantime.gallery.duplicates import compute_image_hash, hash_to_db
+from obsidiantime.gallery.models import Meme
+
+
+def _compute(meme):
+    try:
+        return meme, hash_to_db(compute_image_hash(meme.image)), None
+    except Exception as e:
+        return meme, None, e
+    finally:
+        # Потоки пула не должны держать соединения с БД
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = "Вычисляет перцептивные хеши изображений мемов для поиска похожих"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Количество параллельных потоков",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Сколько мемов обрабатывать и сохранять за раз",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Пересчитать хеши, даже если они уже есть",
+        )
+
+    def handle(self, *args, **options):
+        memes = Meme.objects.exclude(image="").only("pk", "image").order_by("pk")
+        if not options["force"]:
+            memes = memes.filter(phash__isnull=True)
+
+        computed = failed = 0
+        last_pk = 0
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            while True:
+                # Пачки по pk: прерванный запуск продолжается с места остановки
+                batch = list(memes.filter(pk__gt=last_pk)[: options["batch_size"]])
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+
+                hashed = []
+                for meme, phash, error in executor.map(_compute, batch):
+                    if error is not None:
+                        failed += 1
+                        self.stdout.write(self.style.ERROR(f"Мем {meme.pk}: {error}"))
+                        continue
+                    meme.phash = phash
+                    hashed.append(meme)
+
+                Meme.objects.bulk_update(hashed, ["phash"])
+                computed += len(hashed)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Готово: хешей вычислено - {computed}, ошибок - {failed}."
+            )
+        )
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from obsidiantime.gallery.models import Meme
+from obsidiantime.gallery.renditions import delete_renditions, generate_renditions
+
+
+class Command(BaseCommand):
+    help = "Создает варианты изображений (WebP/AVIF, превью, OG) для мемов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--meme",
+            type=int,
+            action="append",
+            dest="meme_ids",
+            help="ID мема (можно указать несколько раз)",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Пересоздать варианты, даже если они уже есть",
+        )
+
+    def handle(self, *args, **options):
+        memes = Meme.objects.exclude(image="").order_by("pk")
+        if options["meme_ids"]:
+            memes = memes.filter(pk__in=options["meme_ids"])
+        if not options["force"]:
+            memes = memes.filter(renditions={})
+
+        created = 0
+        for meme in memes.iterator():
+            try:
+                renditions = generate_renditions(meme.image)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"Мем {meme.pk}: {e}"))
+                continue
+            # Старые файлы удаляем только после успешного создания новых
+            delete_renditions(meme)
+            meme.renditions = renditions
+            meme.save(update_fields=["renditions", "updated_at"])
+            created += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Готово: обработано мемов - {created}."))
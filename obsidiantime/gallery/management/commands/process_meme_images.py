@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from obsidiantime.gallery.tasks import process_pending_memes
+
+
+class Command(BaseCommand):
+    help = "Обрабатывает изображения мемов, ожидающие оптимизации"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=None,
+            help="Максимум мемов за один проход",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Работать постоянно, проверяя очередь каждые --interval секунд",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=5,
+            help="Пауза между проходами в режиме --loop, в секундах",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_pending_memes(options["limit"])
+            if processed or not options["loop"]:
+                self.stdout.write(
+                    self.style.SUCCESS(f"Обработано изображений мемов: {processed}")
+                )
+            if not options["loop"]:
+                return
+            if not processed:
+                time.sleep(options["interval"])
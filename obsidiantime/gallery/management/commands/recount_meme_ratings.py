@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from obsidiantime.gallery.services import MemeRatingService
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает счетчики реакций, комментариев и рейтинги мемов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--meme",
+            type=int,
+            action="append",
+            dest="meme_ids",
+            help="ID мема для пересчета (можно указать несколько раз)",
+        )
+
+    def handle(self, *args, **options):
+        meme_ids = options["meme_ids"]
+
+        self.stdout.write("Пересчет рейтингов мемов...")
+        memes_updated = MemeRatingService.recount(meme_ids)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Готово: обновлено мемов - {memes_updated}.")
+        )
@@ -0,0 +1,91 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:06
+
+import math
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+HOT_EPOCH = 1704067200
+HOT_DECAY_SECONDS = 45000
+
+
+def hot_score(rating, created_at):
+    order = math.log10(max(abs(rating), 1))
+    sign = (rating > 0) - (rating < 0)
+    age = created_at.timestamp() - HOT_EPOCH
+    return round(sign * order + age / HOT_DECAY_SECONDS, 7)
+
+
+def fill_rating_counters(apps, schema_editor):
+    Meme = apps.get_model('gallery', 'Meme')
+
+    def count_subquery(model_name):
+        model = apps.get_model('gallery', model_name)
+        return Coalesce(
+            Subquery(
+                model.objects.filter(meme=OuterRef('pk'))
+                .values('meme')
+                .annotate(total=Count('pk'))
+                .values('total')
+            ),
+            0,
+        )
+
+    Meme.objects.update(
+        likes_count=count_subquery('Like'),
+        dislikes_count=count_subquery('Dislike'),
+        comments_count=count_subquery('Comment'),
+    )
+    Meme.objects.update(rating=F('likes_count') - F('dislikes_count'))
+
+    memes = list(Meme.objects.only('id', 'rating', 'created_at'))
+    for meme in memes:
+        meme.hot_score = hot_score(meme.rating, meme.created_at)
+    Meme.objects.bulk_update(memes, ['hot_score'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meme',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментарии'),
+        ),
+        migrations.AddField(
+            model_name='meme',
+            name='dislikes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Дизлайки'),
+        ),
+        migrations.AddField(
+            model_name='meme',
+            name='hot_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Горячий рейтинг'),
+        ),
+        migrations.AddField(
+            model_name='meme',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Лайки'),
+        ),
+        migrations.AddField(
+            model_name='meme',
+            name='rating',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Рейтинг'),
+        ),
+        migrations.AddIndex(
+            model_name='meme',
+            index=models.Index(fields=['-rating', '-views', '-id'], name='gallery_meme_top_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='meme',
+            index=models.Index(fields=['-hot_score', '-id'], name='gallery_meme_hot_idx'),
+        ),
+        migrations.RunPython(fill_rating_counters, migrations.RunPython.noop),
+    ]
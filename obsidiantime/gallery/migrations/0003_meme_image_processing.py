@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:07
+
+from django.db import migrations, models
+
+
+def mark_existing_ready(apps, schema_editor):
+    # Изображения существующих мемов уже оптимизированы при загрузке
+    Meme = apps.get_model('gallery', 'Meme')
+    Meme.objects.update(processing_status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0002_meme_rating_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meme',
+            name='optimized_image',
+            field=models.ImageField(blank=True, editable=False, upload_to='memes/optimized/%Y/%m/%d/', verbose_name='Оптимизированное изображение'),
+        ),
+        migrations.AddField(
+            model_name='meme',
+            name='processing_started_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Обработка начата'),
+        ),
+        migrations.AddField(
+            model_name='meme',
+            name='processing_status',
+            field=models.CharField(choices=[('pending', 'В очереди'), ('processing', 'Обрабатывается'), ('ready', 'Готово'), ('failed', 'Ошибка')], db_index=True, default='pending', editable=False, max_length=20, verbose_name='Обработка изображения'),
+        ),
+        migrations.RunPython(mark_existing_ready, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0003_meme_image_processing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meme',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Варианты изображения'),
+        ),
+    ]
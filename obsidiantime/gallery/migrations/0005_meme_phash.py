@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0004_meme_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meme',
+            name='phash',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='Перцептивный хеш'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:20
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+CREATE_SEARCH_SQL = [
+    """
+    CREATE FUNCTION gallery_meme_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('russian', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER gallery_meme_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, description, search_vector ON gallery_meme
+    FOR EACH ROW EXECUTE FUNCTION gallery_meme_search_vector_update()
+    """,
+    # Заполняем вектор для существующих мемов через триггер
+    "UPDATE gallery_meme SET search_vector = NULL",
+    "CREATE INDEX gallery_meme_search_idx ON gallery_meme USING gin (search_vector)",
+    # Фильтр мемов по автору ищет по имени пользователя: индексы для
+    # сходства имен (%) и для icontains (UPPER(...) LIKE)
+    """
+    CREATE INDEX IF NOT EXISTS gallery_user_username_trgm_idx
+    ON auth_user USING gin (username gin_trgm_ops)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS gallery_user_username_upper_trgm_idx
+    ON auth_user USING gin (UPPER(username) gin_trgm_ops)
+    """,
+]
+
+DROP_SEARCH_SQL = [
+    "DROP INDEX IF EXISTS gallery_user_username_upper_trgm_idx",
+    "DROP INDEX IF EXISTS gallery_user_username_trgm_idx",
+    "DROP INDEX IF EXISTS gallery_meme_search_idx",
+    "DROP TRIGGER IF EXISTS gallery_meme_search_vector_trigger ON gallery_meme",
+    "DROP FUNCTION IF EXISTS gallery_meme_search_vector_update()",
+]
+
+
+def run_sql(statements):
+    def operation(apps, schema_editor):
+        # Триггер и индексы нужны только на PostgreSQL
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0005_meme_phash'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='meme',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(run_sql(CREATE_SEARCH_SQL), run_sql(DROP_SEARCH_SQL)),
+    ]
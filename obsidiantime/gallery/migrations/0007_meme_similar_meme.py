@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0006_meme_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meme',
+            name='similar_meme',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='gallery.meme', verbose_name='Похож на мем'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-17 13:10
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_created_at(apps, schema_editor):
+    # updated_at старых мемов сдвигали счетчики - берем дату создания
+    Meme = apps.get_model('gallery', 'Meme')
+    Meme.objects.update(content_updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0007_meme_similar_meme'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meme',
+            name='content_updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Содержимое изменено'),
+        ),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+    ]
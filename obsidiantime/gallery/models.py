@@ -1,86 +1,238 @@
-import io
-import logging
+import math
 
 from django.contrib.auth.models import User
-from django.core.files.base import ContentFile
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
-from PIL import Image
 
 # Constants
 COMMENT_PREVIEW_LENGTH = 50
 
-# Получаем логгер для этого модуля
-logger = logging.getLogger(__name__)
+# Параметры "горячего" рейтинга: каждые HOT_DECAY_SECONDS новизны весят
+# как десятикратный рост рейтинга, отсчет от HOT_EPOCH (2024-01-01 UTC)
+HOT_EPOCH = 1704067200
+HOT_DECAY_SECONDS = 45000
+
+
+def count_subquery(model, field="meme"):
+    """Коррелированный подзапрос: число строк model, ссылающихся на мем"""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef("pk")})
+            .values(field)
+            .annotate(total=Count("pk"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+class MemeQuerySet(models.QuerySet):
+    def with_stats(self):
+        """
+        Статистика реакций каждого мема из денормализованных счетчиков:
+        без JOIN с таблицами реакций, стоимость растет только с числом мемов
+        """
+        return self.select_related("author").annotate(
+            total_likes=F("likes_count"),
+            total_dislikes=F("dislikes_count"),
+            total_comments=F("comments_count"),
+        )
+
+    def with_counted_stats(self):
+        """
+        Та же статистика, посчитанная по таблицам реакций отдельными
+        подзапросами на каждый мем (для проверки счетчиков). В отличие от
+        нескольких Count() в одном запросе, JOIN не перемножает строки
+        """
+        return self.select_related("author").annotate(
+            total_likes=count_subquery(Like),
+            total_dislikes=count_subquery(Dislike),
+            total_comments=count_subquery(Comment),
+        )
+
+    def stats_totals(self):
+        """Суммарные лайки, просмотры и комментарии мемов выборки"""
+        totals = self.aggregate(
+            total_likes=Sum("likes_count"),
+            total_views=Sum("views"),
+            total_comments=Sum("comments_count"),
+        )
+        return {key: value or 0 for key, value in totals.items()}
 
 
 class Meme(models.Model):
+    PROCESSING_PENDING = "pending"
+    PROCESSING_RUNNING = "processing"
+    PROCESSING_READY = "ready"
+    PROCESSING_FAILED = "failed"
+
+    PROCESSING_STATUS_CHOICES = [
+        (PROCESSING_PENDING, "В очереди"),
+        (PROCESSING_RUNNING, "Обрабатывается"),
+        (PROCESSING_READY, "Готово"),
+        (PROCESSING_FAILED, "Ошибка"),
+    ]
+
     title = models.CharField(max_length=200, verbose_name="Название")
     description = models.TextField(blank=True, verbose_name="Описание")
     image = models.ImageField(upload_to="memes/%Y/%m/%d/", verbose_name="Изображение")
+    optimized_image = models.ImageField(
+        upload_to="memes/optimized/%Y/%m/%d/",
+        blank=True,
+        editable=False,
+        verbose_name="Оптимизированное изображение",
+    )
+    processing_status = models.CharField(
+        max_length=20,
+        choices=PROCESSING_STATUS_CHOICES,
+        default=PROCESSING_PENDING,
+        db_index=True,
+        editable=False,
+        verbose_name="Обработка изображения",
+    )
+    processing_started_at = models.DateTimeField(
+        null=True, blank=True, editable=False, verbose_name="Обработка начата"
+    )
+    renditions = models.JSONField(
+        default=dict, blank=True, editable=False, verbose_name="Варианты изображения"
+    )
+    # Заполняется триггером БД (см. main/search.py)
+    search_vector = SearchVectorField(null=True, editable=False)
+    phash = models.BigIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Перцептивный хеш",
+    )
+    # Ближайший похожий мем на момент обработки изображения
+    similar_meme = models.ForeignKey(
+        "self",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+        editable=False,
+        verbose_name="Похож на мем",
+    )
     author = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Автор")
     created_at = models.DateTimeField(default=timezone.now, verbose_name="Создано")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлено")
+    # Меняется только при правке содержимого (CONTENT_FIELDS), а не счетчиков
+    # и фоновой обработки, как updated_at: по нему считается lastmod в sitemap
+    content_updated_at = models.DateTimeField(
+        default=timezone.now, editable=False, verbose_name="Содержимое изменено"
+    )
     is_approved = models.BooleanField(default=True, verbose_name="Одобрено")
     views = models.PositiveIntegerField(default=0, verbose_name="Просмотры")
+    likes_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Лайки"
+    )
+    dislikes_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Дизлайки"
+    )
+    comments_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Комментарии"
+    )
+    rating = models.IntegerField(default=0, editable=False, verbose_name="Рейтинг")
+    hot_score = models.FloatField(
+        default=0, editable=False, verbose_name="Горячий рейтинг"
+    )
+
+    # Поля, правка которых меняет content_updated_at
+    CONTENT_FIELDS = frozenset({"title", "description", "image"})
+
+    # Счетчики, которые сервисы меняют атомарными UPDATE в обход объекта:
+    # полное сохранение (админка, формы) их не перезаписывает
+    COUNTER_FIELDS = frozenset(
+        {
+            "views",
+            "likes_count",
+            "dislikes_count",
+            "comments_count",
+            "rating",
+            "hot_score",
+        }
+    )
+
+    objects = MemeQuerySet.as_manager()
 
     class Meta:
         ordering = ["-created_at"]
         verbose_name = "Мем"
         verbose_name_plural = "Мемы"
+        indexes = [
+            models.Index(
+                fields=["-rating", "-views", "-id"], name="gallery_meme_top_idx"
+            ),
+            models.Index(fields=["-hot_score", "-id"], name="gallery_meme_hot_idx"),
+        ]
 
     def __str__(self):
         return self.title
 
     def save(self, *args, **kwargs):
-        # Сначала сохраняем объект
-        is_new = self.pk is None
+        if self.pk is None:
+            self.hot_score = calculate_hot_score(self.rating, self.created_at)
+        else:
+            update_fields = kwargs.get("update_fields")
+            if update_fields is None:
+                self.content_updated_at = timezone.now()
+                if not self._state.adding:
+                    # Значения счетчиков в объекте могли устареть
+                    kwargs["update_fields"] = [
+                        field.name
+                        for field in self._meta.concrete_fields
+                        if not field.primary_key
+                        and field.name not in self.COUNTER_FIELDS
+                    ]
+            elif self.CONTENT_FIELDS.intersection(update_fields):
+                self.content_updated_at = timezone.now()
+                kwargs["update_fields"] = {*update_fields, "content_updated_at"}
+        # Оптимизация изображения выполняется в фоне (см. tasks.py)
         super().save(*args, **kwargs)
 
-        # Оптимизируем изображение только для новых объектов
-        if is_new and self.image:
-            try:
-                self.image.seek(0)
-                img = Image.open(self.image)
-
-                img_format = img.format or "JPEG"
-                max_size = (800, 600)
-                needs_resize = img.width > max_size[0] or img.height > max_size[1]
-                if needs_resize:
-                    img.thumbnail(max_size, Image.Resampling.LANCZOS)
-
-                output = io.BytesIO()
-                if img_format == "JPEG":
-                    img.save(output, format="JPEG", optimize=True, quality=85)
-                elif img_format == "PNG":
-                    img.save(output, format="PNG", optimize=True)
-                else:
-                    img.save(output, format=img_format, optimize=True)
-
-                output.seek(0)
-
-                new_image = ContentFile(output.getvalue())
-
-                self.image.save(self.image.name, new_image, save=False)
-
-                super().save(update_fields=["image"])
+    @property
+    def display_image(self):
+        """Оптимизированное изображение, а до конца обработки - оригинал"""
+        return self.optimized_image or self.image
 
-            except Exception as e:
-                logger.error(
-                    f"Ошибка при оптимизации изображения для мема '{self.title}': {e}",
-                    exc_info=True,
-                )
+    def rendition_srcset(self, name, fmt):
+        """srcset варианта изображения (см. renditions.py) или пустая строка"""
+        variants = self.renditions.get(name, {}).get(fmt, [])
+        storage = self.image.storage
+        return ", ".join(f"{storage.url(path)} {width}w" for width, path in variants)
 
-    @property
-    def likes_count(self):
-        return self.likes.count()
+    def rendition_url(self, name, fmt):
+        """URL самого большого варианта, а без вариантов - основного изображения"""
+        variants = self.renditions.get(name, {}).get(fmt)
+        if not variants:
+            return self.display_image.url
+        return self.image.storage.url(variants[-1][1])
 
     @property
-    def dislikes_count(self):
-        return self.dislikes.count()
+    def is_processing(self):
+        return self.processing_status in (
+            self.PROCESSING_PENDING,
+            self.PROCESSING_RUNNING,
+        )
 
     def get_rating(self):
-        return self.likes_count - self.dislikes_count
+        return self.rating
+
+
+def calculate_hot_score(rating, created_at):
+    """
+    Горячий рейтинг: логарифм рейтинга плюс бонус за новизну.
+    Бонус зависит только от даты создания, поэтому счет меняется лишь
+    при голосовании, а старые мемы опускаются сами относительно новых.
+    """
+    order = math.log10(max(abs(rating), 1))
+    sign = (rating > 0) - (rating < 0)
+    age = created_at.timestamp() - HOT_EPOCH
+    return round(sign * order + age / HOT_DECAY_SECONDS, 7)
 
 
 class Like(models.Model):
@@ -0,0 +1,147 @@
+"""
+Варианты (renditions) изображений мемов.
+
+Реестр RENDITIONS задает именованные размеры. Для каждого размера из
+оригинала один раз создаются файлы в современных форматах (WebP, AVIF -
+по PERFORMANCE_SETTINGS) рядом с оригиналом в хранилище медиа, а в
+Meme.renditions записываются их пути для srcset.
+"""
+
+import os
+
+from django.conf import settings
+from PIL import Image, ImageOps, features
+
+from .images import open_image, save_image
+
+# Именованные размеры: size - рамка при плотности 1x, densities - плотности
+# для srcset, crop - обрезать до пропорций рамки, formats - фиксированные
+# форматы (иначе - современные форматы из настроек)
+RENDITIONS = {
+    "grid": {"size": (400, 300), "densities": (1, 2), "crop": False},
+    "detail": {"size": (800, 600), "densities": (1, 2), "crop": False},
+    "admin": {"size": (150, 100), "densities": (1, 2), "crop": False},
+    # Для соцсетей нужен JPEG фиксированного размера
+    "og": {"size": (1200, 630), "densities": (1,), "crop": True, "formats": ("jpeg",)},
+}
+
+# Параметры кодирования: формат Pillow, MIME тип и опции сохранения
+RENDITION_FORMATS = {
+    "avif": ("AVIF", "image/avif", {"quality": 50}),
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "image/jpeg", {"quality": 85, "optimize": True}),
+}
+
+# Порядок <source> в <picture>: браузер берет первый поддерживаемый
+SOURCE_FORMATS_ORDER = ("avif", "webp")
+
+
+def get_modern_formats():
+    """Современные форматы, включенные в настройках и доступные в Pillow"""
+    performance = getattr(settings, "PERFORMANCE_SETTINGS", {})
+    formats = []
+    if performance.get("ENABLE_AVIF_SUPPORT") and features.check("avif"):
+        formats.append("avif")
+    if performance.get("ENABLE_WEBP_SUPPORT") and features.check("webp"):
+        formats.append("webp")
+    return formats
+
+
+def _resize(img, box, crop):
+    if crop:
+        return ImageOps.fit(img, box, Image.Resampling.LANCZOS)
+    resized = img.copy()
+    resized.thumbnail(box, Image.Resampling.LANCZOS)
+    return resized
+
+
+def _encode(img, fmt, name):
+    pil_format, _, options = RENDITION_FORMATS[fmt]
+    if pil_format == "JPEG" and img.mode != "RGB":
+        img = img.convert("RGB")
+    return save_image(img, name, pil_format, **options)
+
+
+def _max_box(names):
+    """Наибольшая рамка среди вариантов - до нее можно уменьшать при декодировании"""
+    width = height = 0
+    for name in names:
+        spec = RENDITIONS[name]
+        density = max(spec["densities"])
+        width = max(width, spec["size"][0] * density)
+        height = max(height, spec["size"][1] * density)
+    return width, height
+
+
+def generate_renditions(image_file, names=None):
+    """
+    Создает варианты изображения и сохраняет их рядом с оригиналом.
+    Возвращает словарь {имя: {формат: [[ширина, путь], ...]}}.
+    """
+    storage = image_file.storage
+    base_name = os.path.splitext(image_file.name)[0]
+    modern_formats = get_modern_formats()
+    names = names or list(RENDITIONS)
+
+    with open_image(image_file, _max_box(names)) as img:
+        source = ImageOps.exif_transpose(img)
+        if source.mode not in ("RGB", "RGBA"):
+            source = source.convert("RGBA" if "A" in source.getbands() else "RGB")
+
+        renditions = {}
+        for name in names:
+            spec = RENDITIONS[name]
+            formats = spec.get("formats") or modern_formats
+            if not formats:
+                continue
+
+            variants = {fmt: [] for fmt in formats}
+            for box in _boxes(spec, source.size):
+                resized = _resize(source, box, spec["crop"])
+                for fmt in formats:
+                    path = f"{base_name}.{name}-{resized.width}.{fmt}"
+                    with _encode(resized, fmt, path) as content:
+                        path = storage.save(path, content)
+                    variants[fmt].append([resized.width, path])
+            renditions[name] = variants
+
+    return renditions
+
+
+def _boxes(spec, source_size):
+    """Рамки для плотностей без увеличения сверх размера оригинала"""
+    width, height = spec["size"]
+    boxes = []
+    for density in spec["densities"]:
+        box = (width * density, height * density)
+        if spec["crop"]:
+            # Обрезка растянула бы маленький оригинал: уменьшаем рамку
+            # с сохранением пропорций, пока она не поместится в оригинал
+            scale = min(1, source_size[0] / box[0], source_size[1] / box[1])
+            box = (max(1, round(box[0] * scale)), max(1, round(box[1] * scale)))
+            if boxes and box == boxes[-1]:
+                break
+        boxes.append(box)
+        if not spec["crop"] and box[0] >= source_size[0] and box[1] >= source_size[1]:
+            # Оригинал уже помещается в рамку: большие рамки дадут тот же файл
+            break
+    return boxes
+
+
+def delete_renditions(meme):
+    """Удаляет файлы вариантов мема из хранилища"""
+    storage = meme.image.storage
+    for variants in meme.renditions.values():
+        for paths in variants.values():
+            for _, path in paths:
+                storage.delete(path)
+
+
+def get_sources(meme, name):
+    """Источники для <picture>: [{"type": MIME, "srcset": "..."}]"""
+    sources = []
+    for fmt in SOURCE_FORMATS_ORDER:
+        srcset = meme.rendition_srcset(name, fmt)
+        if srcset:
+            sources.append({"type": RENDITION_FORMATS[fmt][1], "srcset": srcset})
+    return sources
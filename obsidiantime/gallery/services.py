@@ -0,0 +1,113 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from obsidiantime.main.page_cache import gallery_pages
+from obsidiantime.main.reactions import lock_for_update, toggle_reaction
+
+from .models import (
+    Comment,
+    Dislike,
+    Like,
+    Meme,
+    calculate_hot_score,
+    count_subquery,
+)
+
+# Размер пачки при пересчете горячего рейтинга
+HOT_SCORE_BATCH_SIZE = 500
+
+# Поля мема, которые читаются при переключении реакций
+COUNTER_FIELDS = ("likes_count", "dislikes_count", "rating", "created_at")
+
+
+class MemeRatingService:
+    """Сервис для счетчиков реакций и рейтингов мемов"""
+
+    @staticmethod
+    @transaction.atomic
+    def toggle_like(user, meme_id):
+        """
+        Переключает лайк пользователя, снимая его дизлайк, и обновляет
+        счетчики мема. Возвращает мем с новыми счетчиками и True, если
+        лайк поставлен. Если мема нет, выбрасывает Meme.DoesNotExist.
+        """
+        meme = lock_for_update(Meme, meme_id, COUNTER_FIELDS)
+        liked, removed_dislikes = toggle_reaction(user, meme, Like, Dislike)
+        MemeRatingService._update_counters(
+            meme, likes_delta=1 if liked else -1, dislikes_delta=-removed_dislikes
+        )
+        return meme, liked
+
+    @staticmethod
+    @transaction.atomic
+    def toggle_dislike(user, meme_id):
+        """
+        Переключает дизлайк пользователя, снимая его лайк, и обновляет
+        счетчики мема. Возвращает мем с новыми счетчиками и True, если
+        дизлайк поставлен. Если мема нет, выбрасывает Meme.DoesNotExist.
+        """
+        meme = lock_for_update(Meme, meme_id, COUNTER_FIELDS)
+        disliked, removed_likes = toggle_reaction(user, meme, Dislike, Like)
+        MemeRatingService._update_counters(
+            meme, likes_delta=-removed_likes, dislikes_delta=1 if disliked else -1
+        )
+        return meme, disliked
+
+    @staticmethod
+    def add_comment(meme, comment):
+        """Сохраняет комментарий и увеличивает счетчик комментариев мема"""
+        with transaction.atomic():
+            comment.meme = meme
+            comment.save()
+            Meme.objects.filter(pk=meme.pk).update(
+                comments_count=F("comments_count") + 1, updated_at=timezone.now()
+            )
+        return comment
+
+    @staticmethod
+    def _update_counters(meme, likes_delta, dislikes_delta):
+        # Строка мема заблокирована (lock_for_update), поэтому новые
+        # значения считаются от прочитанных и пишутся одним UPDATE
+        meme.likes_count += likes_delta
+        meme.dislikes_count += dislikes_delta
+        meme.rating = meme.likes_count - meme.dislikes_count
+        meme.hot_score = calculate_hot_score(meme.rating, meme.created_at)
+        Meme.objects.filter(pk=meme.pk).update(
+            likes_count=meme.likes_count,
+            dislikes_count=meme.dislikes_count,
+            rating=meme.rating,
+            hot_score=meme.hot_score,
+            updated_at=timezone.now(),
+        )
+        # UPDATE не вызывает сигналов: страницы со счетчиками сбрасываем сами
+        transaction.on_commit(gallery_pages.invalidate)
+
+    @staticmethod
+    def recount(meme_ids=None):
+        """Пересчитывает счетчики и рейтинги мемов по таблицам реакций"""
+        memes = Meme.objects.all()
+        if meme_ids is not None:
+            memes = memes.filter(id__in=meme_ids)
+
+        with transaction.atomic():
+            updated = memes.update(
+                likes_count=count_subquery(Like),
+                dislikes_count=count_subquery(Dislike),
+                comments_count=count_subquery(Comment),
+                updated_at=timezone.now(),
+            )
+            memes.update(rating=F("likes_count") - F("dislikes_count"))
+
+            batch = []
+            for meme in memes.only("id", "rating", "created_at").iterator():
+                meme.hot_score = calculate_hot_score(meme.rating, meme.created_at)
+                batch.append(meme)
+                if len(batch) >= HOT_SCORE_BATCH_SIZE:
+                    Meme.objects.bulk_update(batch, ["hot_score"])
+                    batch = []
+            if batch:
+                Meme.objects.bulk_update(batch, ["hot_score"])
+            transaction.on_commit(gallery_pages.invalidate)
+
+        return updated
@@ -0,0 +1,69 @@
+"""
+Сигналы галереи
+"""
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from obsidiantime.main.page_cache import gallery_pages
+from obsidiantime.main.random_pool import random_memes, should_invalidate
+
+from .duplicates import hash_from_db, meme_hash_index
+from .models import Comment, Meme
+from .tasks import delete_processed_files, enqueue_meme_processing
+
+
+@receiver(post_save, sender=Meme)
+def queue_image_processing(sender, instance, created, **kwargs):
+    """Ставит изображение нового мема в очередь на оптимизацию"""
+    if created and instance.processing_status == Meme.PROCESSING_PENDING:
+        enqueue_meme_processing(instance.pk)
+
+
+@receiver(post_save, sender=Meme)
+def invalidate_random_memes_on_save(sender, created, update_fields, **kwargs):
+    """Сбрасывает пул случайных мемов при изменении набора одобренных"""
+    if should_invalidate(created, update_fields):
+        transaction.on_commit(random_memes.invalidate)
+
+
+@receiver(post_delete, sender=Meme)
+def invalidate_random_memes_on_delete(sender, **kwargs):
+    transaction.on_commit(random_memes.invalidate)
+
+
+@receiver(post_delete, sender=Meme)
+def cleanup_deleted_meme(sender, instance, **kwargs):
+    """
+    После коммита удаляет файлы, созданные обработкой изображения, и
+    убирает хеш мема из индекса похожих мемов
+    """
+    # После удаления Django обнуляет pk объекта
+    meme_id = instance.pk
+    transaction.on_commit(lambda: delete_processed_files(instance))
+    if instance.phash is not None:
+        phash = hash_from_db(instance.phash)
+        transaction.on_commit(lambda: meme_hash_index.discard(meme_id, phash))
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comments_count(sender, instance, **kwargs):
+    """
+    Уменьшает счетчик комментариев мема при любом удалении комментария:
+    из админки, пачкой или каскадом при удалении автора
+    """
+    Meme.objects.filter(pk=instance.meme_id, comments_count__gt=0).update(
+        comments_count=F("comments_count") - 1, updated_at=timezone.now()
+    )
+
+
+@receiver(post_save, sender=Meme)
+@receiver(post_delete, sender=Meme)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_gallery_pages(sender, **kwargs):
+    """Сбрасывает закешированные для анонимов страницы галереи"""
+    transaction.on_commit(gallery_pages.invalidate)
@@ -0,0 +1,150 @@
+"""
+Фоновая обработка изображений мемов.
+
+Очередью служит поле Meme.processing_status: загрузка сохраняет оригинал
+и ставит мем в статус pending. После коммита задача уходит в пул потоков
+процесса (GALLERY_IMAGE_WORKERS), а команда process_meme_images
+подбирает то, что пул не успел обработать (перезапуск, ошибка, пул
+отключен). Внешний брокер не нужен.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .duplicates import (
+    compute_image_hash,
+    find_similar_memes,
+    hash_from_db,
+    hash_to_db,
+)
+from .images import optimize_image
+from .models import Meme
+from .renditions import delete_renditions, generate_renditions
+
+logger = logging.getLogger(__name__)
+
+# Через сколько обработка считается зависшей и возвращается в очередь
+STALE_PROCESSING_TIMEOUT = timedelta(minutes=10)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor  # noqa: PLW0603
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.GALLERY_IMAGE_WORKERS,
+                thread_name_prefix="meme-images",
+            )
+        return _executor
+
+
+def enqueue_meme_processing(meme_id):
+    """Ставит обработку изображения мема в пул после коммита транзакции"""
+    if settings.GALLERY_IMAGE_WORKERS <= 0:
+        # Пул отключен: мем обработает команда process_meme_images
+        return
+    transaction.on_commit(lambda: _get_executor().submit(_run_job, meme_id))
+
+
+def _run_job(meme_id):
+    try:
+        process_meme_image(meme_id)
+    except Exception:
+        logger.exception("Ошибка фоновой обработки мема %s", meme_id)
+    finally:
+        # Потоки пула держат свои соединения с БД
+        close_old_connections()
+
+
+def process_meme_image(meme_id):
+    """
+    Обрабатывает изображение мема, если он еще в очереди.
+    Возвращает True, если обработку выполнил этот вызов.
+    """
+    # Захват задачи: только один исполнитель переведет мем из pending
+    claimed = Meme.objects.filter(
+        pk=meme_id, processing_status=Meme.PROCESSING_PENDING
+    ).update(
+        processing_status=Meme.PROCESSING_RUNNING,
+        processing_started_at=timezone.now(),
+    )
+    if not claimed:
+        return False
+
+    meme = Meme.objects.get(pk=meme_id)
+    try:
+        with optimize_image(meme.image) as optimized:
+            meme.optimized_image.save(optimized.name, optimized, save=False)
+        meme.renditions = generate_renditions(meme.image)
+        if meme.phash is None:
+            meme.phash = hash_to_db(compute_image_hash(meme.image))
+        # Повтор ищем среди более ранних мемов; автор увидит предупреждение
+        # на странице мема
+        similar = [
+            other
+            for other in find_similar_memes(
+                hash_from_db(meme.phash), exclude_id=meme.pk
+            )
+            if other.pk < meme.pk
+        ]
+        meme.similar_meme = similar[0] if similar else None
+        meme.processing_status = Meme.PROCESSING_READY
+    except Exception:
+        logger.exception("Не удалось оптимизировать изображение мема %s", meme_id)
+        meme.processing_status = Meme.PROCESSING_FAILED
+
+    # updated_at меняет ключ кешированной карточки мема
+    meme.save(
+        update_fields=[
+            "optimized_image",
+            "renditions",
+            "phash",
+            "similar_meme",
+            "processing_status",
+            "updated_at",
+        ]
+    )
+    return True
+
+
+def delete_processed_files(meme):
+    """Удаляет из хранилища оптимизированное изображение и варианты мема"""
+    try:
+        if meme.optimized_image:
+            meme.optimized_image.delete(save=False)
+        delete_renditions(meme)
+    except Exception:
+        logger.exception("Не удалось удалить файлы мема %s", meme.image.name)
+
+
+def requeue_stale_processing():
+    """Возвращает в очередь мемы, обработка которых зависла"""
+    return Meme.objects.filter(
+        processing_status=Meme.PROCESSING_RUNNING,
+        processing_started_at__lt=timezone.now() - STALE_PROCESSING_TIMEOUT,
+    ).update(processing_status=Meme.PROCESSING_PENDING)
+
+
+def process_pending_memes(limit=None):
+    """Обрабатывает мемы из очереди. Возвращает число обработанных"""
+    requeue_stale_processing()
+
+    # Старые мемы первыми: повтор сравнивается с уже обработанными
+    meme_ids = (
+        Meme.objects.filter(processing_status=Meme.PROCESSING_PENDING)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    if limit:
+        meme_ids = meme_ids[:limit]
+
+    return sum(process_meme_image(meme_id) for meme_id in list(meme_ids))
@@ -0,0 +1,32 @@
+from django import template
+from django.conf import settings
+
+from ..renditions import get_sources
+
+register = template.Library()
+
+
+@register.inclusion_tag("gallery/includes/meme_picture.html")
+def meme_picture(meme, rendition, **attrs):
+    """
+    <picture> с вариантами изображения мема и запасным <img>.
+    Атрибуты: css_class, style, sizes (по умолчанию 100vw), lazy.
+    """
+    performance = getattr(settings, "PERFORMANCE_SETTINGS", {})
+    return {
+        "meme": meme,
+        "sources": get_sources(meme, rendition),
+        "css_class": attrs.get("css_class", ""),
+        "style": attrs.get("style", ""),
+        "sizes": attrs.get("sizes", "100vw"),
+        "lazy": attrs.get("lazy", True)
+        and performance.get("ENABLE_LAZY_LOADING", False),
+    }
+
+
+@register.simple_tag(takes_context=True)
+def meme_image_url(context, meme, rendition, fmt="jpeg"):
+    """Абсолютный URL варианта изображения мема, например для og:image"""
+    url = meme.rendition_url(rendition, fmt)
+    request = context.get("request")
+    return request.build_absolute_uri(url) if request else url
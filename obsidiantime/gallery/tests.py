@@ -1 +1,427 @@
-# Create your tests here.
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from obsidiantime.main.page_cache import gallery_pages
+
+from .duplicates import (
+    DUPLICATE_MAX_DISTANCE,
+    BKTree,
+    find_similar_memes,
+    hamming_distance,
+    hash_from_db,
+    image_hash,
+    meme_hash_index,
+)
+from .forms import MemeUploadForm
+from .images import OPTIMIZED_MAX_SIZE, open_image
+from .models import Comment, Like, Meme
+from .services import MemeRatingService
+from .tasks import process_pending_memes
+
+
+class MemeRatingServiceTests(TestCase):
+    """Денормализованные счетчики реакций и рейтинги мемов"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="critic", password="password")
+        cls.other = User.objects.create_user(username="fan", password="password")
+        # bulk_create: без обработки изображения в Meme.save()
+        cls.old, cls.new = Meme.objects.bulk_create(
+            [
+                Meme(
+                    title="Старый",
+                    image="memes/old.jpg",
+                    author=cls.user,
+                    created_at=timezone.now() - timedelta(days=7),
+                ),
+                Meme(title="Новый", image="memes/new.jpg", author=cls.user),
+            ]
+        )
+
+    def assert_counters(self, meme, likes, dislikes):
+        meme.refresh_from_db()
+        self.assertEqual(meme.likes_count, likes)
+        self.assertEqual(meme.dislikes_count, dislikes)
+        self.assertEqual(meme.rating, likes - dislikes)
+
+    def test_like_and_dislike_toggle(self):
+        meme, liked = MemeRatingService.toggle_like(self.user, self.old.pk)
+        self.assertTrue(liked)
+        self.assertEqual((meme.likes_count, meme.dislikes_count), (1, 0))
+        self.assert_counters(self.old, 1, 0)
+
+        meme, disliked = MemeRatingService.toggle_dislike(self.user, self.old.pk)
+        self.assertTrue(disliked)
+        self.assertEqual((meme.likes_count, meme.dislikes_count), (0, 1))
+        self.assert_counters(self.old, 0, 1)
+
+        meme, disliked = MemeRatingService.toggle_dislike(self.user, self.old.pk)
+        self.assertFalse(disliked)
+        self.assert_counters(self.old, 0, 0)
+        self.assertFalse(Like.objects.exists())
+
+    def test_reaction_resets_gallery_pages(self):
+        version = gallery_pages.get_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            MemeRatingService.toggle_like(self.user, self.old.pk)
+
+        self.assertNotEqual(gallery_pages.get_version(), version)
+
+    def test_full_save_keeps_counters(self):
+        stale = Meme.objects.get(pk=self.old.pk)
+        MemeRatingService.toggle_like(self.user, self.old.pk)
+        MemeRatingService.add_comment(
+            self.old, Comment(author=self.other, content="Смешно")
+        )
+
+        stale.title = "Старый (исправлено)"
+        stale.save()
+
+        self.assert_counters(self.old, 1, 0)
+        self.assertEqual(self.old.title, "Старый (исправлено)")
+        self.assertEqual(self.old.comments_count, 1)
+
+    def test_comment_delete_decrements_count(self):
+        comments = [
+            MemeRatingService.add_comment(
+                self.old, Comment(author=author, content="Комментарий")
+            )
+            for author in (self.user, self.other, self.other)
+        ]
+
+        comments[0].delete()
+        self.old.refresh_from_db()
+        self.assertEqual(self.old.comments_count, 2)
+
+        # Каскад при удалении автора
+        self.other.delete()
+        self.old.refresh_from_db()
+        self.assertEqual(self.old.comments_count, 0)
+
+    def test_toggle_view_does_not_recount(self):
+        self.client.login(username="critic", password="password")
+        url = reverse("gallery:toggle_like", args=[self.old.pk])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url)
+        reactions = [
+            query["sql"]
+            for query in queries.captured_queries
+            if "gallery_like" in query["sql"] or "gallery_dislike" in query["sql"]
+        ]
+        self.assertFalse(any("COUNT(" in sql for sql in reactions))
+        self.assertEqual(
+            response.json(),
+            {
+                "liked": True,
+                "disliked": False,
+                "likes_count": 1,
+                "dislikes_count": 0,
+                "rating": 1,
+            },
+        )
+        self.assertEqual(self.client.post(url).json()["likes_count"], 0)
+
+    def test_with_stats_matches_reaction_tables(self):
+        MemeRatingService.toggle_like(self.user, self.old.pk)
+        MemeRatingService.toggle_dislike(self.other, self.old.pk)
+        for author in (self.user, self.other):
+            MemeRatingService.add_comment(
+                self.old, Comment(author=author, content="Ха")
+            )
+
+        expected = {"total_likes": 1, "total_dislikes": 1, "total_comments": 2}
+        fields = list(expected)
+        for memes in (
+            Meme.objects.with_stats(),
+            Meme.objects.with_counted_stats(),
+        ):
+            self.assertEqual(memes.values(*fields).get(pk=self.old.pk), expected)
+        self.assertEqual(
+            Meme.objects.filter(author=self.user).stats_totals(),
+            {"total_likes": 1, "total_views": 0, "total_comments": 2},
+        )
+
+    def test_cards_are_rendered_from_fragment_cache(self):
+        cache.clear()
+        # Анонимам страница отдается из кеша страниц целиком
+        self.client.force_login(self.other)
+        url = reverse("gallery:gallery_list")
+        card_template = "gallery/includes/meme_card.html"
+
+        def rendered_cards():
+            response = self.client.get(url)
+            return [t.name for t in response.templates].count(card_template)
+
+        self.assertEqual(rendered_cards(), 2)
+        self.assertEqual(rendered_cards(), 0)
+
+        # Реакция меняет счетчики и updated_at - перерисовывается одна карточка
+        MemeRatingService.toggle_like(self.user, self.old.pk)
+        self.assertEqual(rendered_cards(), 1)
+
+    def test_top_and_hot_ordering(self):
+        MemeRatingService.toggle_like(self.user, self.old.pk)
+        MemeRatingService.toggle_like(self.other, self.old.pk)
+        MemeRatingService.toggle_like(self.user, self.new.pk)
+
+        response = self.client.get(reverse("gallery:top_memes"))
+        self.assertEqual(
+            [meme.pk for meme in response.context["memes"]],
+            [self.old.pk, self.new.pk],
+        )
+
+        # Недельная давность весит больше, чем разница в один лайк
+        response = self.client.get(reverse("gallery:top_memes"), {"mode": "hot"})
+        self.assertEqual(
+            [meme.pk for meme in response.context["memes"]],
+            [self.new.pk, self.old.pk],
+        )
+
+    def test_recount(self):
+        Like.objects.create(user=self.user, meme=self.old)
+        Comment.objects.create(author=self.other, meme=self.old, content="Ха")
+
+        self.assertEqual(MemeRatingService.recount(), 2)
+
+        self.assert_counters(self.old, 1, 0)
+        self.assertEqual(self.old.comments_count, 1)
+        self.assertGreater(self.old.hot_score, 0)
+
+
+class MemeImageProcessingTests(TestCase):
+    """Оптимизация изображений вынесена из запроса в очередь"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_upload_is_processed_by_command(self):
+        user = User.objects.create_user(username="author", password="password")
+        content = io.BytesIO()
+        Image.new("RGB", (2000, 1500), "red").save(content, format="JPEG")
+        meme = Meme.objects.create(
+            title="Большой",
+            image=SimpleUploadedFile("big.jpg", content.getvalue()),
+            author=user,
+        )
+        self.assertTrue(meme.is_processing)
+        self.assertEqual(meme.display_image, meme.image)
+
+        call_command("process_meme_images", stdout=StringIO())
+
+        meme.refresh_from_db()
+        self.assertEqual(meme.processing_status, Meme.PROCESSING_READY)
+        with Image.open(meme.optimized_image.path) as optimized:
+            self.assertLessEqual(optimized.width, OPTIMIZED_MAX_SIZE[0])
+            self.assertLessEqual(optimized.height, OPTIMIZED_MAX_SIZE[1])
+
+        # Варианты для srcset и og:image
+        self.assertEqual(
+            [width for width, _ in meme.renditions["grid"]["webp"]], [400, 800]
+        )
+        self.assertIn(" 800w", meme.rendition_srcset("grid", "webp"))
+        self.assertTrue(meme.rendition_url("og", "jpeg").endswith(".og-1200.jpeg"))
+
+    def test_og_crop_does_not_upscale_small_original(self):
+        user = User.objects.create_user(username="author", password="password")
+        content = io.BytesIO()
+        Image.new("RGB", (600, 400), "red").save(content, format="JPEG")
+        meme = Meme.objects.create(
+            title="Маленький",
+            image=SimpleUploadedFile("small.jpg", content.getvalue()),
+            author=user,
+        )
+
+        call_command("process_meme_images", stdout=StringIO())
+
+        meme.refresh_from_db()
+        # Пропорции 1200x630 в пределах оригинала
+        path = meme.renditions["og"]["jpeg"][0][1]
+        with meme.image.storage.open(path) as og, Image.open(og) as img:
+            self.assertEqual(img.size, (600, 315))
+
+    @override_settings(MAX_IMAGE_PIXELS=1000 * 1000)
+    def test_pixel_limit_checked_before_decode(self):
+        content = io.BytesIO()
+        Image.new("RGB", (2000, 1000), "red").save(content, format="PNG")
+        form = MemeUploadForm(
+            {"title": "Огромный"},
+            {"image": SimpleUploadedFile("huge.png", content.getvalue())},
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn("image", form.errors)
+
+    def test_jpeg_is_decoded_in_draft_mode(self):
+        user = User.objects.create_user(username="author", password="password")
+        content = io.BytesIO()
+        Image.new("RGB", (4000, 3000), "blue").save(content, format="JPEG")
+        meme = Meme.objects.create(
+            title="Фото",
+            image=SimpleUploadedFile("photo.jpg", content.getvalue()),
+            author=user,
+        )
+
+        with open_image(meme.image, OPTIMIZED_MAX_SIZE) as img:
+            img.load()
+            # Декодер сразу уменьшил изображение, не опускаясь ниже рамки
+            self.assertEqual(img.size, (2000, 1500))
+
+
+def _fractal_image(size, extent=(-2.0, -1.5, 1.0, 1.5)):
+    return Image.effect_mandelbrot(size, extent, 100).convert("RGB")
+
+
+class MemeDuplicatesTests(TestCase):
+    """Поиск похожих мемов по перцептивному хешу"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="author", password="password")
+        meme_hash_index.reset()
+
+    def _upload(self, img, name="meme.jpg", fmt="JPEG"):
+        content = io.BytesIO()
+        img.save(content, format=fmt)
+        return SimpleUploadedFile(name, content.getvalue(), "image/jpeg")
+
+    def test_bk_tree_matches_linear_scan(self):
+        # Псевдослучайные 64-битные хеши
+        values = [hash_from_db(v * 0x9E3779B97F4A7C15) for v in range(300)]
+        tree = BKTree()
+        for item_id, value in enumerate(values):
+            tree.add(value, item_id)
+
+        query = values[7] ^ 0b1011
+        expected = sorted(
+            (hamming_distance(query, value), item_id)
+            for item_id, value in enumerate(values)
+            if hamming_distance(query, value) <= DUPLICATE_MAX_DISTANCE
+        )
+        self.assertEqual(tree.search(query, DUPLICATE_MAX_DISTANCE), expected)
+        self.assertEqual(expected[0], (3, 7))
+
+    def test_bk_tree_remove(self):
+        tree = BKTree()
+        for item_id, value in enumerate([0b0000, 0b0001, 0b0011, 0b0001]):
+            tree.add(value, item_id)
+
+        tree.remove(0b0001, 1)
+        tree.remove(0b0111, 2)
+
+        self.assertEqual(len(tree), 3)
+        self.assertEqual(tree.search(0b0001, 1), [(0, 3), (1, 0), (1, 2)])
+
+    def test_delete_removes_processed_files_and_hash(self):
+        meme = Meme.objects.create(
+            title="Удаляемый",
+            image=self._upload(_fractal_image((800, 600))),
+            author=self.user,
+        )
+        process_pending_memes()
+        meme.refresh_from_db()
+        value = hash_from_db(meme.phash)
+        self.assertEqual([m.pk for m in find_similar_memes(value)], [meme.pk])
+
+        storage = meme.image.storage
+        processed = [meme.optimized_image.name] + [
+            path
+            for variants in meme.renditions.values()
+            for paths in variants.values()
+            for _, path in paths
+        ]
+        self.assertTrue(all(storage.exists(name) for name in processed))
+
+        meme_id = meme.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            meme.delete()
+
+        self.assertFalse(any(storage.exists(name) for name in processed))
+        self.assertNotIn(
+            meme_id, [item_id for _, item_id in meme_hash_index.search(value)]
+        )
+
+    def test_processing_finds_similar_meme(self):
+        self.client.login(username="author", password="password")
+        self.client.post(
+            reverse("gallery:upload_meme"),
+            {"title": "Оригинал", "image": self._upload(_fractal_image((800, 600)))},
+        )
+        # Уменьшенная и пересжатая копия
+        self.client.post(
+            reverse("gallery:upload_meme"),
+            {"title": "Репост", "image": self._upload(_fractal_image((400, 300)))},
+        )
+        original = Meme.objects.get(title="Оригинал")
+        repost = Meme.objects.get(title="Репост")
+        # Загрузка не хеширует изображение в запросе
+        self.assertIsNone(repost.phash)
+
+        self.assertEqual(process_pending_memes(), 2)
+        original.refresh_from_db()
+        repost.refresh_from_db()
+        self.assertIsNone(original.similar_meme)
+        self.assertEqual(repost.similar_meme, original)
+
+        response = self.client.get(reverse("gallery:meme_detail", args=[repost.pk]))
+        self.assertContains(response, f"мем #{original.pk} «Оригинал»")
+
+        # Другое изображение не считается похожим
+        other_hash = image_hash(_fractal_image((800, 600), (-0.8, 0.0, -0.5, 0.3)))
+        self.assertEqual(find_similar_memes(other_hash), [])
+        self.assertEqual(
+            [m.pk for m in find_similar_memes(hash_from_db(repost.phash))],
+            [original.pk, repost.pk],
+        )
+
+    def test_command_backfills_hashes(self):
+        meme = Meme.objects.create(
+            title="Старый",
+            image=self._upload(_fractal_image((800, 600))),
+            author=self.user,
+        )
+        self.assertIsNone(meme.phash)
+
+        call_command("compute_meme_hashes", "--workers", "2", stdout=StringIO())
+
+        meme.refresh_from_db()
+        self.assertIsNotNone(meme.phash)
+        self.assertEqual(
+            [m.pk for m in find_similar_memes(hash_from_db(meme.phash))], [meme.pk]
+        )
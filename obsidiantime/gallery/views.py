@@ -3,29 +3,54 @@ import logging
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from django.db.models import Count, Q, Sum
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views.decorators.http import require_POST
 
+from obsidiantime.config.db_router import use_replica
+from obsidiantime.main.cache import gallery_cache
+from obsidiantime.main.fragments import FragmentCache
+from obsidiantime.main.page_cache import FILTER_PAGE_PARAMS, gallery_pages
+from obsidiantime.main.random_pool import random_memes
+from obsidiantime.main.search import filter_by_name, full_text_search
+from obsidiantime.main.view_counts import record_view
+
 from .forms import CommentForm, MemeFilterForm, MemeUploadForm
 from .models import Dislike, Like, Meme
+from .services import MemeRatingService
 
 logger = logging.getLogger(__name__)
 
-
+# Сортировки страницы топа мемов: по рейтингу и по "горячему" рейтингу
+TOP_MEMES_ORDERING = {
+    "top": ("-rating", "-views", "-id"),
+    "hot": ("-hot_score", "-id"),
+}
+TOP_MEMES_DEFAULT_MODE = "top"
+
+# Кешированные общие части карточек мемов (см. main/fragments.py)
+MEME_CARD = FragmentCache(
+    "meme_card", "gallery/includes/meme_card.html", gallery_cache, "meme"
+)
+TOP_MEME_CARD = FragmentCache(
+    "top_meme_card", "gallery/includes/top_meme_card.html", gallery_cache, "meme"
+)
+PODIUM_MEME_CARD = FragmentCache(
+    "podium_meme_card",
+    "gallery/includes/podium_meme_card.html",
+    gallery_cache,
+    "meme",
+)
+# Сколько первых мемов страницы топа показываются на подиуме
+PODIUM_SIZE = 3
+
+
+@gallery_pages.cache_anonymous(params=FILTER_PAGE_PARAMS)
+@use_replica
 def gallery_list(request):
     """Список мемов с фильтрацией"""
     form = MemeFilterForm(request.GET)
-    memes = (
-        Meme.objects.filter(is_approved=True)
-        .select_related("author")
-        .annotate(
-            total_likes=Count("likes"),
-            total_dislikes=Count("dislikes"),
-            total_comments=Count("comments"),
-        )
-    )
+    memes = Meme.objects.filter(is_approved=True).with_stats()
 
     if form.is_valid():
         search = form.cleaned_data.get("search")
@@ -33,12 +58,10 @@ def gallery_list(request):
         author = form.cleaned_data.get("author")
 
         if search:
-            memes = memes.filter(
-                Q(title__icontains=search) | Q(description__icontains=search)
-            )
+            memes = full_text_search(memes, search, ["title", "description"])
 
         if author:
-            memes = memes.filter(author__username__icontains=author)
+            memes = filter_by_name(memes, "author__username", author)
 
         if sort:
             if sort == "-views":
@@ -47,6 +70,9 @@ def gallery_list(request):
                 memes = memes.order_by("title")
             else:
                 memes = memes.order_by(sort)
+        elif search:
+            # Без явной сортировки результаты поиска идут по релевантности
+            memes = memes.order_by("-search_rank", "-created_at")
         else:
             # Сортировка по умолчанию - сначала новые
             memes = memes.order_by("-created_at")
@@ -58,27 +84,28 @@ def gallery_list(request):
     paginator = Paginator(memes, 12)  # 12 мемов на страницу для красивой сетки
     page_number = request.GET.get("page")
     page_obj = paginator.get_page(page_number)
+    page_memes = MEME_CARD.attach(page_obj.object_list)
 
     # Получаем информацию о лайках пользователя
     user_likes = set()
     user_dislikes = set()
     if request.user.is_authenticated:
         user_likes = set(
-            Like.objects.filter(
-                user=request.user, meme__in=page_obj.object_list
-            ).values_list("meme_id", flat=True)
+            Like.objects.filter(user=request.user, meme__in=page_memes).values_list(
+                "meme_id", flat=True
+            )
         )
 
         user_dislikes = set(
-            Dislike.objects.filter(
-                user=request.user, meme__in=page_obj.object_list
-            ).values_list("meme_id", flat=True)
+            Dislike.objects.filter(user=request.user, meme__in=page_memes).values_list(
+                "meme_id", flat=True
+            )
         )
 
     context = {
         "form": form,
         "page_obj": page_obj,
-        "memes": page_obj.object_list,
+        "memes": page_memes,
         "user_likes": user_likes,
         "user_dislikes": user_dislikes,
     }
@@ -93,6 +120,7 @@ def upload_meme(request):
         if form.is_valid():
             meme = form.save(commit=False)
             meme.author = request.user
+            # Хеш и поиск похожих мемов выполняет фоновая обработка изображения
             meme.save()
             messages.success(request, "Мем успешно загружен!")
             return redirect("gallery:meme_detail", pk=meme.pk)
@@ -102,13 +130,20 @@ def upload_meme(request):
     return render(request, "gallery/upload_meme.html", {"form": form})
 
 
+def _record_cached_view(request, pk):
+    """Учитывает просмотр страницы мема, отданной из кеша"""
+    record_view(Meme(pk=pk))
+
+
+@gallery_pages.cache_anonymous(on_hit=_record_cached_view)
 def meme_detail(request, pk):
     """Детальный просмотр мема"""
     meme = get_object_or_404(Meme, pk=pk, is_approved=True)
 
-    # Увеличиваем счетчик просмотров
+    # Просмотр записывается в БД пачкой (см. main/view_counts.py),
+    # на странице сразу показываем счетчик с учетом текущего просмотра
+    record_view(meme)
     meme.views += 1
-    meme.save(update_fields=["views"])
 
     # Получаем комментарии
     comments = meme.comments.select_related("author").order_by("-created_at")
@@ -137,19 +172,11 @@ def meme_detail(request, pk):
 @require_POST
 def toggle_like(request, pk):
     """AJAX переключение лайка"""
-    meme = get_object_or_404(Meme, pk=pk)
-
-    # Удаляем дизлайк если есть
-    Dislike.objects.filter(user=request.user, meme=meme).delete()
-
-    # Переключаем лайк
-    like, created = Like.objects.get_or_create(user=request.user, meme=meme)
-
-    if not created:
-        like.delete()
-        liked = False
-    else:
-        liked = True
+    # Переключаем лайк (дизлайк снимается) и обновляем счетчики мема
+    try:
+        meme, liked = MemeRatingService.toggle_like(request.user, pk)
+    except Meme.DoesNotExist:
+        raise Http404 from None
 
     return JsonResponse(
         {
@@ -157,7 +184,7 @@ def toggle_like(request, pk):
             "disliked": False,
             "likes_count": meme.likes_count,
             "dislikes_count": meme.dislikes_count,
-            "rating": meme.get_rating(),
+            "rating": meme.rating,
         }
     )
 
@@ -166,19 +193,11 @@ def toggle_like(request, pk):
 @require_POST
 def toggle_dislike(request, pk):
     """AJAX переключение дизлайка"""
-    meme = get_object_or_404(Meme, pk=pk)
-
-    # Удаляем лайк если есть
-    Like.objects.filter(user=request.user, meme=meme).delete()
-
-    # Переключаем дизлайк
-    dislike, created = Dislike.objects.get_or_create(user=request.user, meme=meme)
-
-    if not created:
-        dislike.delete()
-        disliked = False
-    else:
-        disliked = True
+    # Переключаем дизлайк (лайк снимается) и обновляем счетчики мема
+    try:
+        meme, disliked = MemeRatingService.toggle_dislike(request.user, pk)
+    except Meme.DoesNotExist:
+        raise Http404 from None
 
     return JsonResponse(
         {
@@ -186,7 +205,7 @@ def toggle_dislike(request, pk):
             "disliked": disliked,
             "likes_count": meme.likes_count,
             "dislikes_count": meme.dislikes_count,
-            "rating": meme.get_rating(),
+            "rating": meme.rating,
         }
     )
 
@@ -201,8 +220,7 @@ def add_comment(request, pk):
         if form.is_valid():
             comment = form.save(commit=False)
             comment.author = request.user
-            comment.meme = meme
-            comment.save()
+            MemeRatingService.add_comment(meme, comment)
             messages.success(request, "Комментарий добавлен!")
         else:
             messages.error(request, "Ошибка при добавлении комментария.")
@@ -210,46 +228,51 @@ def add_comment(request, pk):
     return redirect("gallery:meme_detail", pk=pk)
 
 
+@use_replica
 def top_memes(request):
-    """Топ мемов по рейтингу"""
+    """Топ мемов по рейтингу или по "горячему" рейтингу"""
+    mode = request.GET.get("mode")
+    if mode not in TOP_MEMES_ORDERING:
+        mode = TOP_MEMES_DEFAULT_MODE
+
+    # Рейтинги хранятся в полях мема и читаются диапазоном по индексу
     memes = (
         Meme.objects.filter(is_approved=True)
         .select_related("author")
-        .annotate(
-            total_likes=Count("likes"),
-            total_dislikes=Count("dislikes"),
-            rating=Count("likes") - Count("dislikes"),
-        )
-        .order_by("-rating", "-views")
+        .order_by(*TOP_MEMES_ORDERING[mode])
     )
 
     # Пагинация
     paginator = Paginator(memes, 15)  # 15 мемов на страницу
     page_number = request.GET.get("page")
     page_obj = paginator.get_page(page_number)
+    page_memes = list(page_obj.object_list)
+    PODIUM_MEME_CARD.attach(page_memes[:PODIUM_SIZE])
+    TOP_MEME_CARD.attach(page_memes[PODIUM_SIZE:])
 
     # Получаем информацию о лайках пользователя
     user_likes = set()
     user_dislikes = set()
     if request.user.is_authenticated:
         user_likes = set(
-            Like.objects.filter(
-                user=request.user, meme__in=page_obj.object_list
-            ).values_list("meme_id", flat=True)
+            Like.objects.filter(user=request.user, meme__in=page_memes).values_list(
+                "meme_id", flat=True
+            )
         )
 
         user_dislikes = set(
-            Dislike.objects.filter(
-                user=request.user, meme__in=page_obj.object_list
-            ).values_list("meme_id", flat=True)
+            Dislike.objects.filter(user=request.user, meme__in=page_memes).values_list(
+                "meme_id", flat=True
+            )
         )
 
     context = {
-        "memes": page_obj.object_list,
+        "memes": page_memes,
         "page_obj": page_obj,
         "user_likes": user_likes,
         "user_dislikes": user_dislikes,
         "title": "Топ мемов",
+        "mode": mode,
     }
     return render(request, "gallery/top_memes.html", context)
 
@@ -257,22 +280,11 @@ def top_memes(request):
 @login_required
 def my_memes(request):
     """Мемы пользователя"""
-    memes = (
-        Meme.objects.filter(author=request.user)
-        .annotate(
-            total_likes=Count("likes"),
-            total_dislikes=Count("dislikes"),
-            total_comments=Count("comments"),
-        )
-        .order_by("-created_at")
-    )
+    user_memes = Meme.objects.filter(author=request.user)
+    memes = user_memes.with_stats().order_by("-created_at")
 
-    # Подсчитываем общую статистику через агрегацию
-    user_memes_stats = Meme.objects.filter(author=request.user).aggregate(
-        total_likes=Count("likes"),
-        total_views=Sum("views"),
-        total_comments=Count("comments"),
-    )
+    # Общая статистика суммируется по счетчикам мемов
+    user_memes_stats = user_memes.stats_totals()
 
     # Пагинация
     paginator = Paginator(memes, 12)
@@ -283,19 +295,22 @@ def my_memes(request):
         "page_obj": page_obj,
         "memes": page_obj.object_list,
         "title": "Мои мемы",
-        "total_likes": user_memes_stats["total_likes"] or 0,
-        "total_views": user_memes_stats["total_views"] or 0,
-        "total_comments": user_memes_stats["total_comments"] or 0,
+        "total_likes": user_memes_stats["total_likes"],
+        "total_views": user_memes_stats["total_views"],
+        "total_comments": user_memes_stats["total_comments"],
     }
     return render(request, "gallery/my_memes.html", context)
 
 
 def random_meme(request):
     """Случайный мем"""
-    meme = Meme.objects.filter(is_approved=True).order_by("?").first()
+    recent = random_memes.get_recent(request)
+    meme_id = random_memes.pick(recent)
 
-    if meme:
-        return redirect("gallery:meme_detail", pk=meme.pk)
+    if meme_id:
+        response = redirect("gallery:meme_detail", pk=meme_id)
+        random_memes.remember(request, response, recent, meme_id)
+        return response
     else:
         messages.info(request, "Мемы не найдены.")
         return redirect("gallery:gallery_list")
@@ -6,5 +6,6 @@ class MainConfig(AppConfig):
     name = "obsidiantime.main"
 
     def ready(self):
-        """Импортируем сигналы при запуске приложения"""
+        """Импортируем сигналы и метрики пула БД при запуске приложения"""
+        import obsidiantime.config.db_pool  # noqa
         import obsidiantime.main.signals  # noqa
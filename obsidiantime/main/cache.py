@@ -0,0 +1,192 @@
+"""
+Кеш с пространствами имен приложений.
+
+Каждое приложение (main, chat, gallery, seo) пишет в кеш под своим
+префиксом и с собственной версией ключей. Вызов invalidate() увеличивает
+версию, и все старые записи приложения перестают читаться во всех
+воркерах сразу, без перебора ключей.
+"""
+
+import logging
+
+from django.apps import apps
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import DatabaseError, transaction
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+# Приложения, для которых ведутся версии ключей
+CACHE_APPS = ("main", "chat", "gallery", "seo")
+
+# Значение-маркер отсутствия ключа (None может быть закешированным значением)
+_MISSING = object()
+
+# Время жизни синглтонов в кеше: с кешем в памяти процесса (locmem) другие
+# воркеры не получают сброс и видят изменения настроек не позже этого срока
+SINGLETON_TIMEOUT = 60
+
+app_cache_requests = Counter(
+    "obsidiantime_app_cache_requests_total",
+    "Application cache lookups by app and result",
+    ["app", "result"],
+)
+
+
+class AppCache:
+    """Кеш приложения с версионированием ключей"""
+
+    def __init__(self, app, alias="default"):
+        if app not in CACHE_APPS:
+            raise ValueError(f"Неизвестное приложение для кеша: {app}")
+        self.app = app
+        self.alias = alias
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    @property
+    def version_key(self):
+        return f"cache_version:{self.app}"
+
+    def get_version(self):
+        """Текущая версия ключей приложения"""
+        return self.backend.get_or_set(self.version_key, 1, timeout=None)
+
+    def make_key(self, key):
+        return f"{self.app}:{key}"
+
+    def get(self, key, default=None):
+        value = self.backend.get(
+            self.make_key(key), _MISSING, version=self.get_version()
+        )
+        if value is _MISSING:
+            app_cache_requests.labels(app=self.app, result="miss").inc()
+            return default
+        app_cache_requests.labels(app=self.app, result="hit").inc()
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        self.backend.set(self.make_key(key), value, timeout, version=self.get_version())
+
+    def get_many(self, keys):
+        """Словарь найденных значений по ключам, одним запросом к кешу"""
+        prefixed = {self.make_key(key): key for key in keys}
+        found = self.backend.get_many(prefixed, version=self.get_version())
+        hits = len(found)
+        app_cache_requests.labels(app=self.app, result="hit").inc(hits)
+        app_cache_requests.labels(app=self.app, result="miss").inc(len(prefixed) - hits)
+        return {prefixed[key]: value for key, value in found.items()}
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT):
+        self.backend.set_many(
+            {self.make_key(key): value for key, value in data.items()},
+            timeout,
+            version=self.get_version(),
+        )
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT):
+        """Возвращает значение из кеша или вычисляет и сохраняет его"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = default() if callable(default) else default
+            self.set(key, value, timeout)
+        return value
+
+    def delete(self, key):
+        self.backend.delete(self.make_key(key), version=self.get_version())
+
+    def invalidate(self):
+        """Сбрасывает все записи приложения увеличением версии ключей"""
+        try:
+            self.backend.incr(self.version_key)
+        except ValueError:
+            # Версии еще нет в кеше - старых записей тоже нет
+            self.backend.set(self.version_key, 2, timeout=None)
+
+
+main_cache = AppCache("main")
+chat_cache = AppCache("chat")
+gallery_cache = AppCache("gallery")
+seo_cache = AppCache("seo")
+
+
+class CachedSingletonMixin:
+    """
+    Модель-синглтон настроек (одна запись с pk=1), читаемая через кеш.
+
+    get_settings() берет запись из кеша, а при промахе делает только SELECT:
+    запись создается после migrate (ensure_singletons), поэтому на горячем
+    пути нет запросов с INSERT. Кеш сбрасывается после коммита save/delete,
+    прогревается при старте процесса (warm_singletons) и в любом случае
+    устаревает через SINGLETON_TIMEOUT секунд.
+    """
+
+    SINGLETON_PK = 1
+
+    # Кеш приложения, в котором хранится запись
+    singleton_cache = main_cache
+
+    @classmethod
+    def singleton_cache_key(cls):
+        return f"singleton:{cls._meta.label_lower}"
+
+    @classmethod
+    def get_settings(cls):
+        """Возвращает настройки из кеша"""
+        key = cls.singleton_cache_key()
+        obj = cls.singleton_cache.get(key)
+        if obj is not None:
+            return obj
+
+        obj = cls._default_manager.filter(pk=cls.SINGLETON_PK).first()
+        if obj is None:
+            # Миграции еще не выполнены: значения по умолчанию без записи в БД
+            obj = cls(pk=cls.SINGLETON_PK)
+            obj.prepare_cached()
+            return obj
+
+        obj.prepare_cached()
+        cls.singleton_cache.set(key, obj, timeout=SINGLETON_TIMEOUT)
+        return obj
+
+    @classmethod
+    def invalidate_settings(cls):
+        cls.singleton_cache.delete(cls.singleton_cache_key())
+
+    def prepare_cached(self):
+        """Вычисляет производные значения перед сохранением в кеш"""
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        transaction.on_commit(self.invalidate_settings)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        transaction.on_commit(self.invalidate_settings)
+        return result
+
+
+def get_singleton_models(app_config=None):
+    """Модели-синглтоны проекта или указанного приложения"""
+    models = app_config.get_models() if app_config else apps.get_models()
+    return [model for model in models if issubclass(model, CachedSingletonMixin)]
+
+
+def ensure_singletons(app_config=None, using="default"):
+    """Создает отсутствующие записи синглтонов"""
+    for model in get_singleton_models(app_config):
+        model._default_manager.using(using).get_or_create(pk=model.SINGLETON_PK)
+
+
+def warm_singletons():
+    """Загружает синглтоны в кеш при старте процесса"""
+    for model in get_singleton_models():
+        try:
+            model.get_settings()
+        except DatabaseError:
+            logger.warning(
+                "Не удалось прогреть кеш %s", model._meta.label, exc_info=True
+            )
@@ -1,8 +1,40 @@
+from .cache import main_cache
 from .models import SocialLink
 
+# Ключ снимка активных социальных ссылок в кеше main
+SOCIAL_LINKS_CACHE_KEY = "social_links"
+
+# Время жизни снимка: без общего кеша другие воркеры видят изменения
+# ссылок не позже этого срока
+SOCIAL_LINKS_TIMEOUT = 5 * 60
+
+
+def _build_social_links():
+    return [
+        {
+            "url": link.url,
+            "title": link.title,
+            "description": link.description,
+            "platform": link.platform,
+            "icon_class": link.icon_class,
+        }
+        for link in SocialLink.objects.filter(is_active=True)
+    ]
+
+
+def get_social_links():
+    """
+    Возвращает снимок активных социальных ссылок из кеша.
+    Снимок сбрасывается сигналами после коммита изменений SocialLink
+    (см. signals.py) и устаревает через SOCIAL_LINKS_TIMEOUT.
+    """
+    return main_cache.get_or_set(
+        SOCIAL_LINKS_CACHE_KEY, _build_social_links, timeout=SOCIAL_LINKS_TIMEOUT
+    )
+
 
 def social_links(request):
     """
     Context processor для добавления социальных ссылок во все шаблоны
     """
-    return {"social_links": SocialLink.objects.filter(is_active=True)}
+    return {"social_links": get_social_links()}
@@ -0,0 +1,52 @@
+"""
+Кеш HTML фрагментов карточек мемов и цитат.
+
+Общая для всех пользователей часть карточки рендерится один раз и
+хранится в кеше приложения под ключом (id, updated_at): изменение
+объекта, в том числе счетчиков реакций и комментариев, обновляет
+updated_at, и карточка получает новый ключ. Персональная часть (кнопки
+реакций, просмотры) рендерится шаблоном страницы поверх фрагмента.
+Фрагменты всей страницы читаются из кеша одним get_many.
+"""
+
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+# Время жизни фрагмента, в секундах (устаревшие ключи просто истекают)
+FRAGMENT_TIMEOUT = 60 * 60
+
+
+class FragmentCache:
+    """Кеш фрагмента карточки, отрендеренного шаблоном template_name"""
+
+    def __init__(self, name, template_name, cache, context_name):
+        self.name = name
+        self.template_name = template_name
+        self.cache = cache
+        self.context_name = context_name
+
+    def make_key(self, obj):
+        return f"fragment:{self.name}:{obj.pk}:{obj.updated_at.timestamp()}"
+
+    def render(self, obj):
+        return render_to_string(self.template_name, {self.context_name: obj})
+
+    def attach(self, objects, attr="card_html"):
+        """
+        Записывает HTML фрагмента в атрибут attr каждого объекта, рендеря
+        только отсутствующие в кеше. Возвращает список объектов.
+        """
+        objects = list(objects)
+        keys = {self.make_key(obj): obj for obj in objects}
+        cached = self.cache.get_many(keys)
+
+        rendered = {}
+        for key, obj in keys.items():
+            html = cached.get(key)
+            if html is None:
+                html = rendered[key] = self.render(obj)
+            setattr(obj, attr, mark_safe(html))
+
+        if rendered:
+            self.cache.set_many(rendered, FRAGMENT_TIMEOUT)
+        return objects
@@ -1,14 +1,53 @@
 import os
+import posixpath
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
 
 from django.apps import apps
 from django.conf import settings
-from django.core.files.base import ContentFile
+from django.core.files import File
 from django.core.files.storage import default_storage
 from django.core.management.base import BaseCommand
+from django.db import models
+
+# Размер пачки строк при чтении моделей из БД
+ITERATOR_CHUNK_SIZE = 1000
+
+# Файл с уже перенесенными файлами (по имени на строку) в MEDIA_ROOT
+DEFAULT_CHECKPOINT = ".s3_migration_checkpoint"
+
+
+def get_file_fields(model):
+    return [
+        field
+        for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField)
+    ]
+
+
+def read_checkpoint(path):
+    if not path.exists():
+        return set()
+    with path.open(encoding="utf-8") as checkpoint:
+        return {line.rstrip("\n") for line in checkpoint if line.strip()}
+
+
+def get_rendition_names(renditions):
+    """Пути файлов вариантов мема из Meme.renditions"""
+    return [
+        path
+        for variants in renditions.values()
+        for paths in variants.values()
+        for _, path in paths
+    ]
 
 
 class Command(BaseCommand):
-    help = "Migrate local media files to S3 storage"
+    help = (
+        "Migrate local media files to S3 storage: parallel streaming uploads, "
+        "resumable via a checkpoint file"
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -16,95 +55,193 @@ class Command(BaseCommand):
             action="store_true",
             help="Show what would be migrated without actually doing it",
         )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Number of concurrent uploads",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            default=None,
+            help=f"Checkpoint file (default: MEDIA_ROOT/{DEFAULT_CHECKPOINT})",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore the checkpoint and check every file again",
+        )
 
-    def handle(self, *args, **options):  # noqa: PLR0912
-        dry_run = options["dry_run"]
-
+    def handle(self, *args, **options):
         if not getattr(settings, "USE_S3", False):
             self.stdout.write(
                 self.style.ERROR("S3 is not enabled. Set USE_S3=true in environment.")
             )
             return
 
+        checkpoint_path = Path(
+            options["checkpoint"] or Path(settings.MEDIA_ROOT) / DEFAULT_CHECKPOINT
+        )
+        if options["restart"]:
+            checkpoint_path.unlink(missing_ok=True)
+        done = read_checkpoint(checkpoint_path)
+        if done:
+            self.stdout.write(
+                f"Resuming: {len(done)} files already migrated "
+                f"according to {checkpoint_path}"
+            )
+
         self.stdout.write("Starting media files migration to S3...")
+        files = self.collect_files(done)
+
+        existing = self.list_existing([name for name, _, _ in files])
+        pending = [item for item in files if item[0] not in existing]
+        skipped = len(files) - len(pending)
+        if skipped:
+            self.stdout.write(self.style.WARNING(f"Already exist in S3: {skipped}"))
+
+        if options["dry_run"]:
+            for name, _, _ in pending:
+                self.stdout.write(f"  Would migrate: {name}")
+            size = sum(item[2] for item in pending)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Dry run completed. Would migrate {len(pending)} files "
+                    f"({size / 1024 / 1024:.1f} MB)."
+                )
+            )
+            return
 
-        migrated_count = 0
-        error_count = 0
+        with checkpoint_path.open("a", encoding="utf-8") as checkpoint:
+            # Существующие в S3 файлы тоже отмечаем, чтобы не листать их снова
+            for name, _, _ in files:
+                if name in existing:
+                    checkpoint.write(f"{name}\n")
+            started = time.monotonic()
+            migrated, migrated_bytes, error_count = self.upload(
+                pending, options["workers"], checkpoint
+            )
+            elapsed = max(time.monotonic() - started, 1e-6)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Migration completed. Migrated {migrated} files "
+                f"({migrated_bytes / 1024 / 1024:.1f} MB) with {error_count} errors "
+                f"in {elapsed:.1f}s: {migrated / elapsed:.1f} files/s, "
+                f"{migrated_bytes / 1024 / 1024 / elapsed:.2f} MB/s."
+            )
+        )
 
-        # Получаем все модели с FileField/ImageField
-        for model in apps.get_models():
-            file_fields = []
-            for field in model._meta.get_fields():
-                if hasattr(field, "upload_to") and hasattr(field, "storage"):
-                    file_fields.append(field)
+        if error_count == 0:
+            checkpoint_path.unlink(missing_ok=True)
+            self.stdout.write(
+                "\nYou can now safely remove local media files after "
+                "verifying the migration."
+            )
+        else:
+            self.stdout.write(
+                f"Run the command again to retry failed files "
+                f"(checkpoint: {checkpoint_path})."
+            )
 
-            if not file_fields:
+    def collect_files(self, done):
+        """Локальные файлы медиа: (имя, путь, размер)"""
+        files = []
+        seen = set(done)
+        for name in self.iter_names():
+            if not name or name in seen:
                 continue
+            seen.add(name)
 
-            self.stdout.write(f"Processing model: {model.__name__}")
-
-            for obj in model.objects.all():
-                for field in file_fields:
-                    field_file = getattr(obj, field.name)
-
-                    if not field_file:
-                        continue
-
-                    # Проверяем, существует ли файл локально
-                    local_path = os.path.join(settings.MEDIA_ROOT, field_file.name)
-
-                    if not os.path.exists(local_path):
-                        continue
-
-                    if dry_run:
-                        self.stdout.write(f"  Would migrate: {field_file.name}")
-                        migrated_count += 1
-                        continue
+            local_path = os.path.join(settings.MEDIA_ROOT, name)
+            try:
+                size = os.path.getsize(local_path)
+            except OSError:
+                continue
+            files.append((name, local_path, size))
+        return files
+
+    def iter_names(self):
+        """
+        Имена файлов из FileField/ImageField всех моделей, а также пути,
+        которые хранятся не в файловых полях: варианты изображений мемов
+        (Meme.renditions) и шарды sitemap (SitemapShard.file)
+        """
+        for model in apps.get_models():
+            fields = [field.name for field in get_file_fields(model)]
+            if not fields:
+                continue
 
-                    try:
-                        # Читаем локальный файл
-                        with open(local_path, "rb") as local_file:
-                            content = local_file.read()
-
-                        # Проверяем, не существует ли уже файл в S3
-                        if not default_storage.exists(field_file.name):
-                            # Сохраняем в S3
-                            default_storage.save(field_file.name, ContentFile(content))
-                            self.stdout.write(
-                                self.style.SUCCESS(f"  Migrated: {field_file.name}")
-                            )
-                            migrated_count += 1
-                        else:
-                            self.stdout.write(
-                                self.style.WARNING(
-                                    f"  Already exists: {field_file.name}"
-                                )
-                            )
-
-                    except Exception as e:
+            self.stdout.write(f"Processing model: {model.__name__}")
+            # Читаем только имена файлов, без создания объектов моделей
+            rows = model._default_manager.values_list(*fields).order_by()
+            for row in rows.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+                yield from row
+
+        self.stdout.write("Processing meme renditions")
+        meme_model = apps.get_model("gallery", "Meme")
+        rows = meme_model._default_manager.values_list("renditions", flat=True)
+        for renditions in rows.order_by().iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+            yield from get_rendition_names(renditions or {})
+
+        self.stdout.write("Processing sitemap shards")
+        shard_model = apps.get_model("seo", "SitemapShard")
+        yield from shard_model._default_manager.values_list(
+            "file", flat=True
+        ).order_by()
+
+    def list_existing(self, names):
+        """Имена файлов, уже лежащих в хранилище, по одному листингу на каталог"""
+        existing = set()
+        for directory in sorted({posixpath.dirname(name) for name in names}):
+            try:
+                _, directory_files = default_storage.listdir(directory)
+            except FileNotFoundError:
+                continue
+            existing.update(
+                posixpath.join(directory, file_name) for file_name in directory_files
+            )
+        return existing
+
+    def upload(self, files, workers, checkpoint):
+        def transfer(item):
+            name, local_path, _ = item
+            # Хранилище само выбирает ключ, параметры объекта и загрузку
+            # частями для больших файлов; файл читается с диска потоком
+            with open(local_path, "rb") as content:
+                saved_name = default_storage.save(name, File(content, name=name))
+            if saved_name != name:
+                default_storage.delete(saved_name)
+                raise RuntimeError(f"storage renamed the file to {saved_name}")
+
+        migrated = migrated_bytes = error_count = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            running = {}
+            queue = iter(files)
+            while True:
+                # Держим в очереди пула ограниченное число файлов
+                for item in queue:
+                    running[executor.submit(transfer, item)] = item
+                    if len(running) >= workers * 2:
+                        break
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name, _, size = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        error_count += 1
                         self.stdout.write(
-                            self.style.ERROR(
-                                f"  Error migrating {field_file.name}: {e}"
-                            )
+                            self.style.ERROR(f"  Error migrating {name}: {error}")
                         )
-                        error_count += 1
+                        continue
 
-        if dry_run:
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f"Dry run completed. Would migrate {migrated_count} files."
-                )
-            )
-        else:
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f"Migration completed. Migrated {migrated_count} files with "
-                    f"{error_count} errors."
-                )
-            )
+                    checkpoint.write(f"{name}\n")
+                    checkpoint.flush()
+                    migrated += 1
+                    migrated_bytes += size
+                    self.stdout.write(self.style.SUCCESS(f"  Migrated: {name}"))
 
-            if error_count == 0:
-                self.stdout.write(
-                    "\nYou can now safely remove local media files after "
-                    "verifying the migration."
-                )
+        return migrated, migrated_bytes, error_count
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from obsidiantime.main.services import QuoteLikeService
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает счетчики лайков цитат по таблице лайков"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--quote",
+            type=int,
+            action="append",
+            dest="quote_ids",
+            help="ID цитаты для пересчета (можно указать несколько раз)",
+        )
+
+    def handle(self, *args, **options):
+        quote_ids = options["quote_ids"]
+
+        self.stdout.write("Пересчет лайков цитат...")
+        quotes_updated = QuoteLikeService.recount_likes(quote_ids)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Готово: обновлено цитат - {quotes_updated}.")
+        )
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:20
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+CREATE_SEARCH_SQL = [
+    """
+    CREATE FUNCTION main_quote_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('russian', coalesce(NEW.text, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(NEW.author, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER main_quote_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF text, author, search_vector ON main_quote
+    FOR EACH ROW EXECUTE FUNCTION main_quote_search_vector_update()
+    """,
+    # Заполняем вектор для существующих цитат через триггер
+    "UPDATE main_quote SET search_vector = NULL",
+    "CREATE INDEX main_quote_search_idx ON main_quote USING gin (search_vector)",
+    # Индексы для сходства имен (%) и для icontains (UPPER(...) LIKE)
+    """
+    CREATE INDEX main_quote_author_trgm_idx
+    ON main_quote USING gin (author gin_trgm_ops)
+    """,
+    """
+    CREATE INDEX main_quote_author_upper_trgm_idx
+    ON main_quote USING gin (UPPER(author) gin_trgm_ops)
+    """,
+]
+
+DROP_SEARCH_SQL = [
+    "DROP INDEX IF EXISTS main_quote_author_upper_trgm_idx",
+    "DROP INDEX IF EXISTS main_quote_author_trgm_idx",
+    "DROP INDEX IF EXISTS main_quote_search_idx",
+    "DROP TRIGGER IF EXISTS main_quote_search_vector_trigger ON main_quote",
+    "DROP FUNCTION IF EXISTS main_quote_search_vector_update()",
+]
+
+
+def run_sql(statements):
+    def operation(apps, schema_editor):
+        # Триггер и индексы нужны только на PostgreSQL
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_alter_sociallink_platform'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='quote',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(run_sql(CREATE_SEARCH_SQL), run_sql(DROP_SEARCH_SQL)),
+    ]
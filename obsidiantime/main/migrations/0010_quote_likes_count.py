@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:21
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_likes_count(apps, schema_editor):
+    Quote = apps.get_model('main', 'Quote')
+    QuoteLike = apps.get_model('main', 'QuoteLike')
+    quote_likes = (
+        QuoteLike.objects.filter(quote=OuterRef('pk'))
+        .values('quote')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    Quote.objects.update(likes_count=Coalesce(Subquery(quote_likes), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_quote_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quote',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Лайки'),
+        ),
+        migrations.RunPython(fill_likes_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_quote_likes_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quote',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Обновлено'),
+            preserve_default=False,
+        ),
+    ]
@@ -1,7 +1,10 @@
 from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.utils import timezone
 
+from .cache import CachedSingletonMixin
+
 # Constants
 QUOTE_PREVIEW_LENGTH = 50
 
@@ -11,8 +14,14 @@ class Quote(models.Model):
     author = models.CharField(max_length=200, verbose_name="Автор цитаты")
     added_by = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Добавил")
     created_at = models.DateTimeField(default=timezone.now, verbose_name="Создано")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлено")
     is_approved = models.BooleanField(default=True, verbose_name="Одобрено")
     views = models.PositiveIntegerField(default=0, verbose_name="Просмотры")
+    likes_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Лайки"
+    )
+    # Заполняется триггером БД (см. search.py)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         ordering = ["-created_at"]
@@ -22,10 +31,6 @@ class Quote(models.Model):
     def __str__(self):
         return f'"{self.text[:QUOTE_PREVIEW_LENGTH]}..." - {self.author}'
 
-    @property
-    def likes_count(self):
-        return self.quote_likes.count()
-
 
 class QuoteLike(models.Model):
     user = models.ForeignKey(
@@ -91,7 +96,7 @@ class SocialLink(models.Model):
         return icons.get(self.platform, "fas fa-link")
 
 
-class SiteSettings(models.Model):
+class SiteSettings(CachedSingletonMixin, models.Model):
     site_title = models.CharField(
         max_length=100, default="ObsidianTime", verbose_name="Название сайта"
     )
@@ -118,10 +123,9 @@ class SiteSettings(models.Model):
             raise ValueError("Настройки сайта уже существуют")
         super().save(*args, **kwargs)
 
-    @classmethod
-    def get_settings(cls):
-        settings, created = cls.objects.get_or_create(pk=1)
-        return settings
+    def prepare_cached(self):
+        # URL видео из хранилища (S3) вычисляется один раз и кешируется
+        self.rickroll_video_url = self.rickroll_video.url if self.rickroll_video else ""
 
 
 class Feedback(models.Model):
@@ -0,0 +1,154 @@
+"""
+Кеш целых страниц для анонимных посетителей.
+
+Большая часть просмотров главной, галереи, цитат и страницы мема - от
+анонимных посетителей, которым все страницы показываются одинаково.
+Для них готовый HTML берется из кеша приложения по пути и нормализованным
+параметрам запроса (page, sort, search). Авторизованные пользователи,
+запросы с неизвестными параметрами и запросы с непоказанными сообщениями
+(messages) всегда обрабатываются представлением.
+
+Страница не кешируется, если при рендере понадобился CSRF токен: он
+привязан к cookie посетителя. Поэтому формы с {% csrf_token %} на этих
+страницах выводятся только авторизованным.
+
+Записи группы страниц сбрасываются сигналами при изменении контента
+(новая версия ключей группы), остальное устаревает по PAGE_TIMEOUT.
+Заголовки Cache-Control (s-maxage) и Vary: Cookie позволяют nginx
+держать страницы в микрокеше еще MICROCACHE_TIMEOUT секунд.
+"""
+
+import hashlib
+import uuid
+from functools import wraps
+from http import HTTPStatus
+
+from django.contrib.messages import get_messages
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import urlencode
+
+from .cache import gallery_cache, main_cache
+
+# Время жизни страницы в кеше приложения, в секундах
+PAGE_TIMEOUT = 60
+
+# Сколько секунд страницу может отдавать микрокеш nginx (s-maxage)
+MICROCACHE_TIMEOUT = 5
+
+# Параметры запроса, от которых зависит страница
+PAGE_PARAMS = ("page", "sort", "search")
+
+# Параметры списков с фильтром по автору
+FILTER_PAGE_PARAMS = (*PAGE_PARAMS, "author")
+
+
+class PageCache:
+    """Группа страниц, кешируемых для анонимных посетителей"""
+
+    def __init__(self, name, cache):
+        self.name = name
+        self.cache = cache
+
+    @property
+    def version_key(self):
+        return f"page_version:{self.name}"
+
+    def get_version(self):
+        return self.cache.get_or_set(self.version_key, uuid.uuid4().hex, None)
+
+    def invalidate(self):
+        """Сбрасывает все страницы группы"""
+        self.cache.set(self.version_key, uuid.uuid4().hex, None)
+
+    def make_key(self, request, params):
+        """
+        Ключ страницы или None, если запрос с посторонними или
+        повторяющимися параметрами не кешируется.
+        """
+        if any(key not in params for key in request.GET):
+            return None
+        if any(len(request.GET.getlist(key)) > 1 for key in request.GET):
+            return None
+
+        query = {}
+        for key in sorted(request.GET):
+            value = request.GET[key].strip()
+            if value and not (key == "page" and value == "1"):
+                query[key] = value
+
+        url = f"{request.get_host()}{request.path}?{urlencode(query)}"
+        digest = hashlib.md5(url.encode(), usedforsecurity=False).hexdigest()
+        return f"page:{self.name}:{self.get_version()}:{digest}"
+
+    def cache_anonymous(self, params=PAGE_PARAMS, on_hit=None):
+        """
+        Декоратор представления: кеширует ответ для анонимных посетителей.
+        on_hit(request, *args, **kwargs) вызывается при отдаче из кеша,
+        например, чтобы учесть просмотр.
+        """
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(request, *args, **kwargs):
+                if not _is_cacheable_request(request):
+                    response = view(request, *args, **kwargs)
+                    if request.user.is_authenticated:
+                        patch_cache_control(response, private=True)
+                    return response
+
+                key = self.make_key(request, params)
+                if key is None:
+                    return view(request, *args, **kwargs)
+
+                cached = self.cache.get(key)
+                if cached is not None:
+                    content, content_type = cached
+                    if on_hit is not None:
+                        on_hit(request, *args, **kwargs)
+                    response = HttpResponse(content, content_type=content_type)
+                    return _mark_shared(response)
+
+                response = view(request, *args, **kwargs)
+                if _is_cacheable_response(request, response):
+                    self.cache.set(
+                        key, (response.content, response["Content-Type"]), PAGE_TIMEOUT
+                    )
+                    _mark_shared(response)
+                return response
+
+            return wrapper
+
+        return decorator
+
+
+def _is_cacheable_request(request):
+    if request.method != "GET" or request.user.is_authenticated:
+        return False
+    # Непоказанные сообщения выводятся на странице один раз
+    return not len(get_messages(request))
+
+
+def _is_cacheable_response(request, response):
+    return (
+        response.status_code == HTTPStatus.OK
+        and not response.streaming
+        and not response.cookies
+        # Токен попал в страницу - такой HTML годится только этому посетителю
+        and not request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+    )
+
+
+def _mark_shared(response):
+    """Разрешает общим кешам (nginx) хранить ответ для анонимных посетителей"""
+    patch_cache_control(response, public=True, max_age=0, s_maxage=MICROCACHE_TIMEOUT)
+    patch_vary_headers(response, ("Cookie",))
+    return response
+
+
+# Главная: последние сообщения чата и настройки сайта
+home_pages = PageCache("home", main_cache)
+# "О проекте": настройки сайта, статистика устаревает по PAGE_TIMEOUT
+site_pages = PageCache("site", main_cache)
+quote_pages = PageCache("quotes", main_cache)
+gallery_pages = PageCache("gallery", gallery_cache)
@@ -0,0 +1,178 @@
+"""
+Выбор случайного объекта без ORDER BY RANDOM().
+
+Список id одобренных объектов хранится в кеше приложения частями по
+CHUNK_SIZE id и описанием пула (сборка и число id). Выбор - случайная
+позиция в пуле: читаются описание и одна часть с этой позицией, поэтому
+выбор равномерный, без запросов к БД и без чтения всего списка. Список
+строится одним запросом по индексу при промахе кеша и сбрасывается
+сигналами при добавлении, удалении или смене статуса одобрения, а также
+по TTL.
+
+Недавно показанные id хранятся в подписанной куке посетителя, чтобы
+случайный выбор не повторял их подряд. Сессия не нужна: анонимный
+посетитель не получает сессионную куку и не выпадает из микрокеша nginx.
+"""
+
+import random
+import secrets
+from array import array
+
+from django.apps import apps
+
+from .cache import gallery_cache, main_cache
+
+# Время жизни списка id в кеше, в секундах
+POOL_TIMEOUT = 10 * 60
+
+# Сколько id хранится в одной записи кеша
+CHUNK_SIZE = 1000
+
+# Сколько последних показанных id не повторять
+RECENT_SIZE = 20
+
+# Время жизни куки с недавно показанными id, в секундах
+RECENT_COOKIE_MAX_AGE = 24 * 60 * 60
+
+# Сколько раз пытаться выбрать id не из недавних
+PICK_ATTEMPTS = 10
+
+_random = random.SystemRandom()
+
+
+class RandomPool:
+    """Пул id одобренных объектов модели для случайного выбора"""
+
+    def __init__(self, name, model_label, cache):
+        self.name = name
+        self.model_label = model_label
+        self.cache = cache
+
+    @property
+    def cache_key(self):
+        return f"random_pool:{self.name}"
+
+    @property
+    def cookie_name(self):
+        return f"random_recent_{self.name}"
+
+    def chunk_key(self, build, number):
+        return f"random_pool:{self.name}:{build}:{number}"
+
+    def _build(self):
+        """Строит пул из БД, сохраняет его в кеш и возвращает все id"""
+        model = apps.get_model(self.model_label)
+        ids = array(
+            "q",
+            model._default_manager.filter(is_approved=True)
+            .values_list("pk", flat=True)
+            .order_by(),
+        )
+
+        build = secrets.token_hex(4)
+        self.cache.set_many(
+            {
+                self.chunk_key(build, number): ids[start : start + CHUNK_SIZE]
+                for number, start in enumerate(range(0, len(ids), CHUNK_SIZE))
+            },
+            POOL_TIMEOUT,
+        )
+        # Описание пишется после частей и ссылается только на свою сборку
+        self.cache.set(self.cache_key, (build, len(ids)), POOL_TIMEOUT)
+        return ids
+
+    def _get_chunks(self, build, numbers):
+        """Части пула {номер: id} или None, если какой-то части нет в кеше"""
+        keys = {self.chunk_key(build, number): number for number in numbers}
+        found = self.cache.get_many(keys)
+        if len(found) < len(keys):
+            return None
+        return {keys[key]: chunk for key, chunk in found.items()}
+
+    def get_ids(self):
+        """Все id пула"""
+        meta = self.cache.get(self.cache_key)
+        if meta is not None:
+            build, count = meta
+            numbers = range((count + CHUNK_SIZE - 1) // CHUNK_SIZE)
+            chunks = self._get_chunks(build, numbers)
+            if chunks is not None:
+                ids = array("q")
+                for number in numbers:
+                    ids.extend(chunks[number])
+                return ids
+        return self._build()
+
+    def invalidate(self):
+        self.cache.delete(self.cache_key)
+
+    def pick(self, recent=()):
+        """
+        Возвращает случайный id или None, если объектов нет. Пропускает
+        недавно показанные id из recent.
+        """
+        meta = self.cache.get(self.cache_key)
+        if meta is None:
+            return _choose(self._build(), recent)
+
+        build, count = meta
+        if not count:
+            return None
+
+        # Если объектов мало, недавние все равно придется повторять
+        skip = set(recent) if count > len(recent) else set()
+        positions = [_random.randrange(count) for _ in range(PICK_ATTEMPTS)]
+        chunks = self._get_chunks(
+            build, {position // CHUNK_SIZE for position in positions}
+        )
+        if chunks is None:
+            # Часть пула вытеснена из кеша: строим пул заново
+            return _choose(self._build(), recent)
+
+        for position in positions:
+            pk = chunks[position // CHUNK_SIZE][position % CHUNK_SIZE]
+            if pk not in skip:
+                return pk
+        # Попытки исчерпаны только на маленьком пуле: выбираем из
+        # оставшихся id перебором
+        return _choose(self.get_ids(), recent)
+
+    def get_recent(self, request):
+        """Недавно показанные посетителю id из подписанной куки"""
+        value = request.get_signed_cookie(
+            self.cookie_name, default="", salt=self.cookie_name
+        )
+        try:
+            return [int(pk) for pk in value.split(",") if pk]
+        except ValueError:
+            return []
+
+    def remember(self, request, response, recent, pk):
+        """Добавляет выбранный id в куку недавно показанных"""
+        recent = [*recent, pk][-RECENT_SIZE:]
+        response.set_signed_cookie(
+            self.cookie_name,
+            ",".join(map(str, recent)),
+            salt=self.cookie_name,
+            max_age=RECENT_COOKIE_MAX_AGE,
+            secure=request.is_secure(),
+            httponly=True,
+            samesite="Lax",
+        )
+
+
+def _choose(ids, recent):
+    """Случайный id из списка, по возможности не из недавних"""
+    if not ids:
+        return None
+    skip = set(recent) if len(ids) > len(recent) else set()
+    return _random.choice([pk for pk in ids if pk not in skip])
+
+
+random_memes = RandomPool("memes", "gallery.Meme", gallery_cache)
+random_quotes = RandomPool("quotes", "main.Quote", main_cache)
+
+
+def should_invalidate(created, update_fields):
+    """Изменение объекта затрагивает набор одобренных id"""
+    return created or update_fields is None or "is_approved" in update_fields
@@ -0,0 +1,50 @@
+"""
+Переключение реакций (лайков и дизлайков) с денормализованными счетчиками.
+
+В начале транзакции строка объекта блокируется (SELECT ... FOR UPDATE),
+поэтому одновременные клики по одному объекту выполняются по очереди,
+а счетчики меняются ровно на число фактически вставленных и удаленных
+реакций. Новые значения считаются от заблокированной строки, без COUNT
+по таблицам реакций.
+"""
+
+
+def lock_for_update(model, pk, fields):
+    """Блокирует строку объекта и читает только нужные поля"""
+    return model._default_manager.select_for_update().only(*fields).get(pk=pk)
+
+
+def _reaction_lookup(reaction_model, user, target):
+    for field in reaction_model._meta.concrete_fields:
+        if field.is_relation and field.related_model is type(target):
+            return {"user": user, field.name: target}
+    raise ValueError(
+        f"{reaction_model.__name__} не ссылается на {type(target).__name__}"
+    )
+
+
+def toggle_reaction(user, target, reaction_model, opposite_model=None):
+    """
+    Переключает реакцию пользователя на заблокированный объект target
+    и при постановке снимает противоположную реакцию. Вызывается внутри
+    транзакции. Возвращает (added, removed_opposite).
+    """
+    lookup = _reaction_lookup(reaction_model, user, target)
+
+    # Повторный клик снимает реакцию - противоположной в этом случае нет
+    removed, _ = reaction_model._default_manager.filter(**lookup).delete()
+    if removed:
+        return False, 0
+
+    removed_opposite = 0
+    if opposite_model is not None:
+        removed_opposite, _ = opposite_model._default_manager.filter(
+            **_reaction_lookup(opposite_model, user, target)
+        ).delete()
+
+    # Строка объекта заблокирована, ON CONFLICT DO NOTHING лишь страхует
+    # от дубля при вставке в обход сервиса
+    reaction_model._default_manager.bulk_create(
+        [reaction_model(**lookup)], ignore_conflicts=True
+    )
+    return True, removed_opposite
@@ -0,0 +1,61 @@
+"""
+Полнотекстовый поиск по мемам и цитатам (PostgreSQL).
+
+Поле search_vector (tsvector) заполняет триггер БД при вставке и
+изменении текста, поэтому оно актуально и после update()/bulk_create().
+Поиск идет по GIN индексу с русской морфологией, результаты
+ранжируются. Имена авторов ищутся по сходству триграмм (pg_trgm), что
+прощает опечатки. На других БД поиск сводится к icontains.
+"""
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connection
+from django.db.models import F, Q, Value
+
+# Конфигурация текстового поиска PostgreSQL (LANGUAGE_CODE = ru-ru)
+SEARCH_CONFIG = "russian"
+
+
+def is_supported():
+    """Проверяет, поддерживает ли база данных полнотекстовый поиск"""
+    return connection.vendor == "postgresql"
+
+
+def _icontains(fields, value):
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{f"{field}__icontains": value})
+    return condition
+
+
+def full_text_search(queryset, query, fields, trigram_field=None):
+    """
+    Фильтрует queryset по поисковому запросу и добавляет аннотацию
+    search_rank (чем больше, тем релевантнее).
+
+    fields - текстовые поля для icontains, если поиск не поддерживается;
+    trigram_field - поле с именем автора, которое дополнительно ищется
+    по сходству триграмм.
+    """
+    if not is_supported():
+        return queryset.filter(_icontains(fields, query)).annotate(
+            search_rank=Value(0.0)
+        )
+
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type="websearch")
+    condition = Q(search_vector=search_query)
+    rank = SearchRank(F("search_vector"), search_query)
+    if trigram_field:
+        condition |= Q(**{f"{trigram_field}__trigram_similar": query})
+        rank += TrigramSimilarity(trigram_field, query)
+    return queryset.filter(condition).annotate(search_rank=rank)
+
+
+def filter_by_name(queryset, field, value):
+    """Фильтр по имени: вхождение подстроки или похожее написание"""
+    condition = _icontains([field], value)
+    if is_supported():
+        # Оба условия обслуживают GIN индексы по триграммам: icontains
+        # сравнивает UPPER(поле), поэтому для него отдельный индекс
+        condition |= Q(**{f"{field}__trigram_similar": value})
+    return queryset.filter(condition)
@@ -0,0 +1,45 @@
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Quote, QuoteLike
+from .page_cache import quote_pages
+from .reactions import lock_for_update, toggle_reaction
+
+
+class QuoteLikeService:
+    """Сервис для лайков цитат"""
+
+    @staticmethod
+    @transaction.atomic
+    def toggle_like(user, quote_id):
+        """
+        Переключает лайк пользователя и обновляет счетчик цитаты.
+        Возвращает цитату с новым счетчиком и True, если лайк поставлен.
+        Если цитаты нет, выбрасывает Quote.DoesNotExist.
+        """
+        quote = lock_for_update(Quote, quote_id, ["likes_count"])
+        liked, _ = toggle_reaction(user, quote, QuoteLike)
+
+        quote.likes_count += 1 if liked else -1
+        Quote.objects.filter(pk=quote.pk).update(likes_count=quote.likes_count)
+        # UPDATE не вызывает сигналов: страницы со счетчиком сбрасываем сами
+        transaction.on_commit(quote_pages.invalidate)
+        return quote, liked
+
+    @staticmethod
+    def recount_likes(quote_ids=None):
+        """Пересчитывает счетчики лайков цитат по таблице QuoteLike"""
+        quotes = Quote.objects.all()
+        if quote_ids is not None:
+            quotes = quotes.filter(id__in=quote_ids)
+
+        quote_likes = (
+            QuoteLike.objects.filter(quote=OuterRef("pk"))
+            .values("quote")
+            .annotate(total=Count("pk"))
+            .values("total")
+        )
+        updated = quotes.update(likes_count=Coalesce(Subquery(quote_likes), 0))
+        transaction.on_commit(quote_pages.invalidate)
+        return updated
@@ -60,3 +60,62 @@
 #
 # # Импортируем user_logins из metrics
 # from .metrics import user_logins
+
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from .cache import ensure_singletons, main_cache
+from .context_processors import SOCIAL_LINKS_CACHE_KEY
+from .models import Quote, SiteSettings, SocialLink
+from .page_cache import home_pages, quote_pages, site_pages
+from .random_pool import random_quotes, should_invalidate
+
+
+@receiver(post_save, sender=SocialLink)
+@receiver(post_delete, sender=SocialLink)
+def invalidate_social_links(sender, **kwargs):
+    """Сбрасывает снимок социальных ссылок во всех воркерах"""
+    # После коммита: запрос во время транзакции админки не закеширует
+    # старые строки заново
+    transaction.on_commit(lambda: main_cache.delete(SOCIAL_LINKS_CACHE_KEY))
+
+
+@receiver(post_save, sender=Quote)
+def invalidate_random_quotes_on_save(sender, created, update_fields, **kwargs):
+    """Сбрасывает пул случайных цитат при изменении набора одобренных"""
+    if should_invalidate(created, update_fields):
+        transaction.on_commit(random_quotes.invalidate)
+
+
+@receiver(post_delete, sender=Quote)
+def invalidate_random_quotes_on_delete(sender, **kwargs):
+    transaction.on_commit(random_quotes.invalidate)
+
+
+@receiver(post_save, sender=Quote)
+@receiver(post_delete, sender=Quote)
+def invalidate_quote_pages(sender, **kwargs):
+    """Сбрасывает закешированные для анонимов страницы цитат"""
+    transaction.on_commit(quote_pages.invalidate)
+
+
+@receiver(post_save, sender=SiteSettings)
+def invalidate_site_pages(sender, **kwargs):
+    """Настройки сайта выводятся на главной и на странице «О проекте»"""
+    transaction.on_commit(site_pages.invalidate)
+    transaction.on_commit(home_pages.invalidate)
+
+
+@receiver(post_save, sender="chat.Message")
+@receiver(post_delete, sender="chat.Message")
+def invalidate_home_pages(sender, **kwargs):
+    """Из кешируемых страниц сообщения чата показывает только главная"""
+    transaction.on_commit(home_pages.invalidate)
+
+
+@receiver(post_migrate)
+def create_singletons(sender, app_config, using, **kwargs):
+    """Создает записи настроек, чтобы get_settings() не делал INSERT"""
+    ensure_singletons(app_config, using)
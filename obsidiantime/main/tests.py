@@ -1 +1,552 @@
-# Create your tests here.
+import shutil
+import tempfile
+import time
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import InMemoryStorage
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from obsidiantime.chat.models import Message
+from obsidiantime.config.db_pool import DatabasePoolCollector
+from obsidiantime.config.db_router import (
+    STICKY_COOKIE,
+    PrimaryStickinessMiddleware,
+    ReplicaRouter,
+    replica_reads,
+    use_replica,
+)
+from obsidiantime.config.lifespan import LifespanMiddleware
+from obsidiantime.gallery.models import Meme
+from obsidiantime.seo.models import SitemapShard
+
+from . import search
+from .cache import SINGLETON_TIMEOUT, AppCache
+from .context_processors import get_social_links
+from .models import Quote, QuoteLike, SiteSettings, SocialLink
+from .random_pool import random_quotes
+from .services import QuoteLikeService
+from .view_counts import ViewCounter, view_counter
+
+
+class ViewCountsTests(TestCase):
+    """Просмотры копятся в буфере и записываются в БД пачкой"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="reader", password="password")
+        cls.quote = Quote.objects.create(
+            text="Цитата", author="Автор", added_by=cls.user
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        # Сбрасываем буфер процесса внутри откатываемой транзакции теста
+        view_counter.flush()
+
+    def test_detail_does_not_write_views(self):
+        url = reverse("main:quote_detail", args=[self.quote.pk])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(
+            [q for q in queries if q["sql"].lstrip().upper().startswith("UPDATE")]
+        )
+        self.quote.refresh_from_db()
+        self.assertEqual(self.quote.views, 0)
+
+    def test_flush_applies_all_views(self):
+        url = reverse("main:quote_detail", args=[self.quote.pk])
+        for _ in range(5):
+            self.client.get(url)
+
+        self.assertEqual(view_counter.flush(), 5)
+
+        self.quote.refresh_from_db()
+        self.assertEqual(self.quote.views, 5)
+
+    def test_workers_flush_independently(self):
+        # Каждый воркер прибавляет свои просмотры в БД, ничего не перезаписывая
+        workers = [ViewCounter() for _ in range(3)]
+        for views, worker in zip((3, 2, 1), workers, strict=True):
+            for _ in range(views):
+                worker.record(self.quote)
+        for worker in workers:
+            worker.flush()
+
+        self.quote.refresh_from_db()
+        self.assertEqual(self.quote.views, 6)
+
+    async def test_lifespan_shutdown_drains_views(self):
+        worker = ViewCounter()
+        worker.record(self.quote)
+        worker.record(self.quote)
+        application = LifespanMiddleware(
+            mock.AsyncMock(), on_shutdown=[worker.drain_on_exit]
+        )
+        messages = iter([{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}])
+        sent = []
+
+        async def receive():
+            return next(messages)
+
+        async def send(message):
+            sent.append(message["type"])
+
+        await application({"type": "lifespan"}, receive, send)
+
+        self.assertEqual(
+            sent, ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+        )
+        await self.quote.arefresh_from_db()
+        self.assertEqual(self.quote.views, 2)
+
+
+class QuoteSearchTests(TestCase):
+    """Поиск цитат по тексту и автору"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username="reader", password="password")
+        cls.cats, cls.poem = Quote.objects.bulk_create(
+            [
+                Quote(
+                    text="Коты правят интернетом", author="Неизвестный", added_by=user
+                ),
+                Quote(text="Я помню чудное мгновенье", author="Пушкин", added_by=user),
+            ]
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def _search(self, **params):
+        response = self.client.get(reverse("main:quotes_list"), params)
+        return [quote.pk for quote in response.context["quotes"]]
+
+    def test_search_by_text_and_author(self):
+        self.assertEqual(self._search(search="интернетом"), [self.cats.pk])
+        self.assertEqual(self._search(search="Пушкин"), [self.poem.pk])
+        self.assertEqual(self._search(author="Пушк"), [self.poem.pk])
+
+    @skipUnless(search.is_supported(), "Нужен PostgreSQL")
+    def test_russian_stemming_and_author_typos(self):
+        # Другая словоформа и опечатка в имени автора
+        self.assertEqual(self._search(search="кот"), [self.cats.pk])
+        self.assertEqual(self._search(author="Пушкен"), [self.poem.pk])
+
+
+class RandomQuoteTests(TestCase):
+    """Случайная цитата выбирается из кешированного пула id"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username="reader", password="password")
+        cls.quotes = Quote.objects.bulk_create(
+            [Quote(text=f"Цитата {i}", author="Автор", added_by=user) for i in range(5)]
+        )
+        cls.hidden = Quote.objects.create(
+            text="Скрытая", author="Автор", added_by=user, is_approved=False
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def _pick(self):
+        response = self.client.get(reverse("main:random_quote"))
+        return int(response.url.rstrip("/").rsplit("/", 1)[-1])
+
+    def test_cookie_does_not_repeat_recent_quotes(self):
+        picked = [self._pick() for _ in self.quotes]
+
+        self.assertCountEqual(picked, [quote.pk for quote in self.quotes])
+        self.assertNotIn(self.hidden.pk, picked)
+        # Анонимный посетитель не получает сессию
+        self.assertIn(random_quotes.cookie_name, self.client.cookies)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+
+    @mock.patch("obsidiantime.main.random_pool.CHUNK_SIZE", 2)
+    def test_pool_is_cached_and_reset_on_approval(self):
+        random_quotes.get_ids()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertIn(random_quotes.pick(), [quote.pk for quote in self.quotes])
+        self.assertEqual(len(queries), 0)
+        self.assertCountEqual(
+            random_quotes.get_ids(), [quote.pk for quote in self.quotes]
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hidden.is_approved = True
+            self.hidden.save(update_fields=["is_approved"])
+        self.assertIn(self.hidden.pk, random_quotes.get_ids())
+
+
+class QuoteLikeTests(TestCase):
+    """Лайк цитаты переключается с обновлением денормализованного счетчика"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="reader", password="password")
+        cls.quote = Quote.objects.create(
+            text="Цитата", author="Автор", added_by=cls.user
+        )
+
+    def test_toggle_updates_counter(self):
+        self.client.login(username="reader", password="password")
+        url = reverse("main:toggle_quote_like", args=[self.quote.pk])
+
+        self.assertEqual(
+            self.client.post(url).json(), {"liked": True, "likes_count": 1}
+        )
+        self.assertEqual(
+            self.client.post(url).json(), {"liked": False, "likes_count": 0}
+        )
+        missing = reverse("main:toggle_quote_like", args=[self.quote.pk + 1])
+        self.assertEqual(self.client.post(missing).status_code, 404)
+
+    def test_recount_command(self):
+        QuoteLike.objects.create(user=self.user, quote=self.quote)
+
+        call_command("recount_quote_likes", stdout=StringIO())
+
+        self.quote.refresh_from_db()
+        self.assertEqual(self.quote.likes_count, 1)
+
+
+class PageCacheTests(TestCase):
+    """Страницы для анонимных посетителей отдаются из кеша"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="reader", password="password")
+        cls.quote = Quote.objects.create(
+            text="Цитата", author="Автор", added_by=cls.user
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def _get(self, **params):
+        url = reverse("main:quotes_list")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_anonymous_page_is_cached_by_normalized_params(self):
+        response, _ = self._get(page="1")
+        self.assertIn("s-maxage", response["Cache-Control"])
+        self.assertIn("Cookie", response["Vary"])
+        self.assertNotIn("csrftoken", response.cookies)
+
+        cached, queries = self._get()
+        self.assertEqual(queries, 0)
+        self.assertEqual(cached.content, response.content)
+
+        # Посторонние параметры в ключ не попадают - такие запросы не кешируются
+        _, queries = self._get(utm_source="mail")
+        self.assertGreater(queries, 0)
+
+    def test_cache_is_reset_on_content_change(self):
+        self._get()
+        with self.captureOnCommitCallbacks(execute=True):
+            Quote.objects.create(
+                text="Новая цитата", author="Автор", added_by=self.user
+            )
+
+        response, queries = self._get()
+        self.assertGreater(queries, 0)
+        self.assertContains(response, "Новая цитата")
+
+    def test_cache_is_reset_on_like(self):
+        self._get()
+        with self.captureOnCommitCallbacks(execute=True):
+            QuoteLikeService.toggle_like(self.user, self.quote.pk)
+
+        _, queries = self._get()
+        self.assertGreater(queries, 0)
+
+    def test_chat_message_resets_only_home(self):
+        home, about = reverse("main:home"), reverse("main:about")
+        self.client.get(home)
+        self.client.get(about)
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.create(author=self.user, content="Новое сообщение")
+
+        self.assertContains(self.client.get(home), "Новое сообщение")
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(about)
+        self.assertEqual(len(queries), 0)
+
+    def test_authenticated_user_bypasses_cache(self):
+        self._get()
+        self.client.force_login(self.user)
+
+        response, queries = self._get()
+        self.assertGreater(queries, 0)
+        self.assertIn("private", response["Cache-Control"])
+
+    def test_pending_messages_are_not_cached(self):
+        # Пустой пул - редирект на список с сообщением
+        Quote.objects.all().delete()
+        response = self.client.get(reverse("main:random_quote"), follow=True)
+
+        self.assertContains(response, "Цитаты не найдены.")
+        # Страница с сообщением не попала в кеш
+        _, queries = self._get()
+        self.assertGreater(queries, 0)
+
+
+class DatabasePoolMetricsTests(TestCase):
+    """Метрики пула соединений строятся из статистики psycopg_pool"""
+
+    @mock.patch("obsidiantime.config.db_pool.iter_pool_stats")
+    def test_saturation_and_wait_time(self, iter_pool_stats):
+        iter_pool_stats.return_value = [
+            (
+                "default",
+                {
+                    "pool_max": 10,
+                    "pool_size": 8,
+                    "pool_available": 3,
+                    "requests_num": 40,
+                    "requests_wait_ms": 1500,
+                },
+            )
+        ]
+
+        samples = {
+            sample.name: sample.value
+            for metric in DatabasePoolCollector().collect()
+            for sample in metric.samples
+        }
+
+        self.assertEqual(samples["obsidiantime_db_pool_saturation"], 0.5)
+        self.assertEqual(samples["obsidiantime_db_pool_wait_seconds_total"], 1.5)
+        self.assertEqual(samples["obsidiantime_db_pool_requests_total"], 40)
+        self.assertEqual(samples["obsidiantime_db_pool_requests_queued_total"], 0)
+
+
+@override_settings(DATABASE_REPLICAS=["replica_1"], DB_REPLICA_MAX_LAG=5)
+@mock.patch("obsidiantime.config.db_router.get_replica_lag", return_value=1)
+class ReplicaRouterTests(SimpleTestCase):
+    """Чтения в блоках replica_reads() идут на реплику с допустимым отставанием"""
+
+    router = ReplicaRouter()
+
+    def test_reads_in_block_go_to_replica(self, get_replica_lag):
+        self.assertIsNone(self.router.db_for_read(Quote))
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Quote), "replica_1")
+            self.assertIsNone(self.router.db_for_read(Session))
+            self.assertEqual(self.router.db_for_write(Quote), "default")
+
+    def test_lagging_replica_falls_back_to_primary(self, get_replica_lag):
+        get_replica_lag.return_value = 60
+        with replica_reads():
+            self.assertIsNone(self.router.db_for_read(Quote))
+
+    def test_reads_stick_to_primary_after_post(self, get_replica_lag):
+        factory = RequestFactory()
+        middleware = PrimaryStickinessMiddleware(lambda request: HttpResponse())
+        response = middleware(factory.post("/quotes/1/like/"))
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+        @use_replica
+        def view(request):
+            return HttpResponse(str(self.router.db_for_read(Quote)))
+
+        self.assertEqual(view(factory.get("/quotes/")).content, b"replica_1")
+        request = factory.get("/quotes/")
+        request.COOKIES[STICKY_COOKIE] = "1"
+        self.assertEqual(view(request).content, b"None")
+
+
+LOCMEM_BACKEND = "django.core.cache.backends.locmem.LocMemCache"
+TWO_TIER_BACKEND = "obsidiantime.config.cache_backends.TwoTierCache"
+
+# Два воркера с L1 кешем процесса перед общим L2
+TWO_WORKER_CACHES = {
+    "default": {"BACKEND": LOCMEM_BACKEND},
+    "shared": {"BACKEND": LOCMEM_BACKEND, "LOCATION": "shared-tier"},
+    "worker_a": {
+        "BACKEND": TWO_TIER_BACKEND,
+        "LOCATION": "worker-a",
+        "OPTIONS": {"L2_ALIAS": "shared", "L1_TIMEOUT": 5},
+    },
+    "worker_b": {
+        "BACKEND": TWO_TIER_BACKEND,
+        "LOCATION": "worker-b",
+        "OPTIONS": {"L2_ALIAS": "shared", "L1_TIMEOUT": 5},
+    },
+}
+
+
+@override_settings(CACHES=TWO_WORKER_CACHES)
+class TwoTierCacheTests(SimpleTestCase):
+    """Изменения одного воркера видны другому не позже чем через L1_TIMEOUT"""
+
+    def setUp(self):
+        for alias in TWO_WORKER_CACHES:
+            caches[alias].clear()
+        self.now = time.time()
+
+    def at(self, seconds):
+        return mock.patch("time.time", return_value=self.now + seconds)
+
+    def test_l1_copy_expires(self):
+        worker_a, worker_b = caches["worker_a"], caches["worker_b"]
+        with self.at(0):
+            worker_a.set("key", "old", 60)
+            self.assertEqual(worker_b.get("key"), "old")
+            worker_a.set("key", "new", 60)
+            # Второй воркер пока отвечает из своего L1
+            self.assertEqual(worker_b.get("key"), "old")
+            self.assertEqual(worker_a.get("key"), "new")
+
+        with self.at(6):
+            self.assertEqual(worker_b.get("key"), "new")
+
+    def test_app_cache_invalidation_reaches_other_worker(self):
+        cache_a = AppCache("main", alias="worker_a")
+        cache_b = AppCache("main", alias="worker_b")
+        with self.at(0):
+            cache_a.set("card", "html", 60)
+            self.assertEqual(cache_b.get("card"), "html")
+
+            cache_a.invalidate()
+            self.assertIsNone(cache_a.get("card"))
+
+        with self.at(6):
+            self.assertIsNone(cache_b.get("card"))
+            # Новая версия ключей общая для воркеров
+            cache_b.set("card", "fresh", 60)
+            self.assertEqual(cache_a.get("card"), "fresh")
+
+
+class CachedSingletonTests(TestCase):
+    """Настройки сайта читаются из кеша и сбрасываются после сохранения"""
+
+    def setUp(self):
+        cache.clear()
+        SiteSettings.objects.get_or_create(pk=SiteSettings.SINGLETON_PK)
+
+    def test_save_invalidates_cached_settings(self):
+        site_settings = SiteSettings.get_settings()
+        with self.assertNumQueries(0):
+            SiteSettings.get_settings()
+
+        site_settings.site_title = "Новое название"
+        with self.captureOnCommitCallbacks(execute=True):
+            site_settings.save()
+
+        self.assertEqual(SiteSettings.get_settings().site_title, "Новое название")
+
+    def test_cached_settings_expire(self):
+        now = time.time()
+        with mock.patch("time.time", return_value=now):
+            SiteSettings.get_settings()
+            # Изменение без сигналов, как в другом воркере без общего кеша
+            SiteSettings.objects.update(site_title="Из другого воркера")
+            self.assertNotEqual(
+                SiteSettings.get_settings().site_title, "Из другого воркера"
+            )
+
+        with mock.patch("time.time", return_value=now + SINGLETON_TIMEOUT + 1):
+            self.assertEqual(
+                SiteSettings.get_settings().site_title, "Из другого воркера"
+            )
+
+
+class SocialLinksCacheTests(TestCase):
+    """Снимок социальных ссылок сбрасывается только после коммита"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_snapshot_reset_after_commit(self):
+        self.assertEqual(get_social_links(), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SocialLink.objects.create(
+                platform="telegram", url="https://t.me/obsidiantime", title="Канал"
+            )
+            # Запрос до коммита не сбрасывает и не заменяет снимок
+            self.assertEqual(get_social_links(), [])
+
+        self.assertEqual([link["title"] for link in get_social_links()], ["Канал"])
+
+
+class MigrateMediaToS3Tests(TestCase):
+    """Перенос локальных файлов медиа в хранилище S3"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.storage = InMemoryStorage()
+        patcher = mock.patch(
+            "obsidiantime.main.management.commands.migrate_media_to_s3.default_storage",
+            self.storage,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write_local(self, name):
+        path = Path(self.media_root) / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(name.encode())
+
+    def test_migrates_file_fields_renditions_and_sitemap_shards(self):
+        names = [
+            "memes/2026/10/17/cat.jpg",
+            "memes/2026/10/17/cat.grid-400.webp",
+            "memes/2026/10/17/cat.og-1200.jpeg",
+            "sitemaps/memes-1.xml.gz",
+        ]
+        for name in names:
+            self.write_local(name)
+        user = User.objects.create_user(username="author", password="password")
+        Meme.objects.create(
+            title="Кот",
+            image=names[0],
+            author=user,
+            processing_status=Meme.PROCESSING_READY,
+            renditions={
+                "grid": {"webp": [[400, names[1]]]},
+                "og": {"jpeg": [[1200, names[2]]]},
+            },
+        )
+        SitemapShard.objects.create(
+            section="memes", number=1, fingerprint="-", file=names[3]
+        )
+        # Уже перенесенный файл не загружается повторно
+        self.storage.save(names[1], ContentFile(b"uploaded"))
+
+        output = StringIO()
+        with override_settings(USE_S3=True, MEDIA_ROOT=self.media_root):
+            call_command("migrate_media_to_s3", stdout=output)
+
+        self.assertIn("Migrated 3 files", output.getvalue())
+        for name in (names[0], names[2], names[3]):
+            with self.storage.open(name) as stored:
+                self.assertEqual(stored.read(), name.encode())
+        with self.storage.open(names[1]) as stored:
+            self.assertEqual(stored.read(), b"uploaded")
+        # После переноса без ошибок контрольная точка удаляется
+        self.assertEqual(
+            list(Path(self.media_root).glob(".s3_migration_checkpoint")), []
+        )
@@ -8,6 +8,7 @@ urlpatterns = [
     path("", views.home, name="home"),
     path("quotes/", views.quotes_list, name="quotes_list"),
     path("quotes/add/", views.add_quote, name="add_quote"),
+    path("quotes/random/", views.random_quote, name="random_quote"),
     path("quotes/<int:pk>/", views.quote_detail, name="quote_detail"),
     path("quotes/<int:pk>/like/", views.toggle_quote_like, name="toggle_quote_like"),
     path("register/", views.register, name="register"),
@@ -0,0 +1,125 @@
+"""
+Отложенная запись счетчиков просмотров мемов и цитат.
+
+Просмотр увеличивает счетчик в памяти процесса. Раз в FLUSH_INTERVAL секунд
+фоновый поток процесса записывает накопленное в БД пачкой
+UPDATE ... SET views = views + N: прибавление атомарно в БД, поэтому
+процессы не мешают друг другу и общий кеш для счетчиков не нужен.
+Поток запускают точки входа сервера (config/wsgi.py, config/asgi.py).
+Остаток записывается при штатной остановке: под ASGI - по событию lifespan
+shutdown (config/lifespan.py), в том числе при перезапуске воркера, иначе -
+при выходе интерпретатора (atexit). Если процесс убит (SIGKILL, OOM, воркер
+не уложился в graceful timeout gunicorn), обработчики не выполняются и
+теряются просмотры не больше чем за FLUSH_INTERVAL.
+"""
+
+import atexit
+import logging
+import os
+import threading
+from collections import Counter, defaultdict
+
+from django.apps import apps
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+# Как часто процесс записывает накопленные просмотры в БД, в секундах
+FLUSH_INTERVAL = 5
+
+
+def apply_view_counts(counts):
+    """
+    Записывает просмотры в БД: counts - словарь {(label модели, pk): число}.
+    Объекты с одинаковым приростом обновляются одним запросом.
+    """
+    grouped = defaultdict(lambda: defaultdict(list))
+    for (label, pk), count in counts.items():
+        grouped[label][count].append(pk)
+
+    with transaction.atomic():
+        for label, by_count in grouped.items():
+            model = apps.get_model(label)
+            for count, pks in by_count.items():
+                model.objects.filter(pk__in=pks).update(views=F("views") + count)
+
+
+class ViewCounter:
+    """Буфер просмотров текущего процесса"""
+
+    def __init__(self):
+        self._buffer = Counter()
+        self._lock = threading.Lock()
+        self._flusher_enabled = False
+        self._flusher_pid = None
+
+    def record(self, obj):
+        """Учитывает просмотр объекта с полем views"""
+        with self._lock:
+            self._buffer[(obj._meta.label_lower, obj.pk)] += 1
+        if self._flusher_enabled and self._flusher_pid != os.getpid():
+            self._start_flusher()
+
+    def start_flusher(self):
+        """
+        Включает периодическую запись просмотров в фоновом потоке и
+        запись остатка при выходе процесса
+        """
+        if not self._flusher_enabled:
+            atexit.register(self.drain_on_exit)
+        self._flusher_enabled = True
+        self._start_flusher()
+
+    def _start_flusher(self):
+        with self._lock:
+            # После fork (gunicorn --preload) поток родителя в процессе не живет
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(
+            target=self._run_flusher, name="view-counts-flusher", daemon=True
+        ).start()
+
+    def _run_flusher(self):
+        stopped = threading.Event()
+        while not stopped.wait(FLUSH_INTERVAL):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Не удалось записать просмотры в БД")
+            finally:
+                # Поток держит свое соединение с БД
+                close_old_connections()
+
+    def flush(self):
+        """Записывает накопленные просмотры процесса в БД"""
+        with self._lock:
+            buffer, self._buffer = self._buffer, Counter()
+        if not buffer:
+            return 0
+
+        try:
+            apply_view_counts(buffer)
+        except DatabaseError:
+            # Вернем просмотры в буфер до следующей записи
+            with self._lock:
+                self._buffer.update(buffer)
+            raise
+        return sum(buffer.values())
+
+    def drain_on_exit(self):
+        if not self._buffer:
+            return
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Не удалось записать просмотры при остановке")
+
+
+view_counter = ViewCounter()
+
+
+def record_view(obj):
+    """Учитывает просмотр мема или цитаты без записи в БД"""
+    view_counter.record(obj)
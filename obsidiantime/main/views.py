@@ -8,21 +8,35 @@ from django.contrib.auth.models import User
 from django.contrib.auth.views import LoginView
 from django.core.paginator import Paginator
 from django.db.models import Count, Q
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods, require_POST
 
 from obsidiantime.chat.forms import CustomUserCreationForm
 from obsidiantime.chat.models import Message
+from obsidiantime.config.db_router import use_replica
 from obsidiantime.gallery.models import Meme
 
+from .cache import main_cache
 from .forms import FeedbackCommentForm, FeedbackForm, QuoteFilterForm, QuoteForm
+from .fragments import FragmentCache
 from .models import Feedback, FeedbackComment, Quote, QuoteLike, SiteSettings
+from .page_cache import FILTER_PAGE_PARAMS, home_pages, quote_pages, site_pages
+from .random_pool import random_quotes
+from .search import filter_by_name, full_text_search
+from .services import QuoteLikeService
+from .view_counts import record_view
 
 logger = logging.getLogger(__name__)
 
+# Кешированная общая часть карточки цитаты (см. fragments.py)
+QUOTE_CARD = FragmentCache(
+    "quote_card", "main/includes/quote_card.html", main_cache, "quote"
+)
 
+
+@home_pages.cache_anonymous()
 def home(request):
     """Главная страница с рикроллом и чатом"""
     settings = SiteSettings.get_settings()
@@ -39,6 +53,8 @@ def home(request):
     return render(request, "main/home.html", context)
 
 
+@quote_pages.cache_anonymous(params=FILTER_PAGE_PARAMS)
+@use_replica
 def quotes_list(request):
     """Список цитат с фильтрацией"""
     form = QuoteFilterForm(request.GET)
@@ -50,15 +66,16 @@ def quotes_list(request):
         author = form.cleaned_data.get("author")
 
         if search:
-            quotes = quotes.filter(
-                Q(text__icontains=search) | Q(author__icontains=search)
-            )
+            quotes = full_text_search(quotes, search, ["text", "author"], "author")
 
         if author:
-            quotes = quotes.filter(author__icontains=author)
+            quotes = filter_by_name(quotes, "author", author)
 
         if sort:
             quotes = quotes.order_by(sort)
+        elif search:
+            # Без явной сортировки результаты поиска идут по релевантности
+            quotes = quotes.order_by("-search_rank", "-created_at")
         else:
             # Сортировка по умолчанию - сначала новые
             quotes = quotes.order_by("-created_at")
@@ -70,20 +87,21 @@ def quotes_list(request):
     paginator = Paginator(quotes, 20)
     page_number = request.GET.get("page")
     page_obj = paginator.get_page(page_number)
+    page_quotes = QUOTE_CARD.attach(page_obj.object_list)
 
     # Получаем информацию о лайках пользователя
     user_likes = set()
     if request.user.is_authenticated:
         user_likes = set(
             QuoteLike.objects.filter(
-                user=request.user, quote__in=page_obj.object_list
+                user=request.user, quote__in=page_quotes
             ).values_list("quote_id", flat=True)
         )
 
     context = {
         "form": form,
         "page_obj": page_obj,
-        "quotes": page_obj.object_list,
+        "quotes": page_quotes,
         "user_likes": user_likes,
     }
     return render(request, "main/quotes_list.html", context)
@@ -110,9 +128,10 @@ def quote_detail(request, pk):
     """Детальный просмотр цитаты"""
     quote = get_object_or_404(Quote, pk=pk, is_approved=True)
 
-    # Увеличиваем счетчик просмотров
+    # Просмотр записывается в БД пачкой (см. main/view_counts.py),
+    # на странице сразу показываем счетчик с учетом текущего просмотра
+    record_view(quote)
     quote.views += 1
-    quote.save(update_fields=["views"])
 
     # Проверяем, лайкнул ли пользователь эту цитату
     user_liked = False
@@ -126,18 +145,29 @@ def quote_detail(request, pk):
     return render(request, "main/quote_detail.html", context)
 
 
+def random_quote(request):
+    """Случайная цитата"""
+    recent = random_quotes.get_recent(request)
+    quote_id = random_quotes.pick(recent)
+
+    if quote_id:
+        response = redirect("main:quote_detail", pk=quote_id)
+        random_quotes.remember(request, response, recent, quote_id)
+        return response
+    else:
+        messages.info(request, "Цитаты не найдены.")
+        return redirect("main:quotes_list")
+
+
 @login_required
 @require_POST
 def toggle_quote_like(request, pk):
     """AJAX переключение лайка цитаты"""
-    quote = get_object_or_404(Quote, pk=pk)
-    like, created = QuoteLike.objects.get_or_create(user=request.user, quote=quote)
-
-    if not created:
-        like.delete()
-        liked = False
-    else:
-        liked = True
+    # Переключаем лайк и обновляем счетчик цитаты
+    try:
+        quote, liked = QuoteLikeService.toggle_like(request.user, pk)
+    except Quote.DoesNotExist:
+        raise Http404 from None
 
     return JsonResponse({"liked": liked, "likes_count": quote.likes_count})
 
@@ -170,6 +200,8 @@ def register(request):
     return render(request, "registration/register.html", {"form": form})
 
 
+@site_pages.cache_anonymous()
+@use_replica
 def about(request):
     """Страница о проекте"""
 
@@ -1,8 +1,14 @@
 from django.contrib import admin
-from django.core.cache import cache
 from django.utils.translation import gettext_lazy as _
 
-from .models import Analytics, RobotsRule, SEOGenericModel, SitemapURL
+from .models import (
+    Analytics,
+    RobotsRule,
+    SEOGenericModel,
+    SitemapShard,
+    SitemapURL,
+)
+from .services import RobotsService, SitemapService
 
 
 @admin.register(SEOGenericModel)
@@ -90,6 +96,25 @@ class SitemapURLAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(SitemapShard)
+class SitemapShardAdmin(admin.ModelAdmin):
+    list_display = ["__str__", "url_count", "lastmod", "generated_at"]
+    list_filter = ["section"]
+    readonly_fields = [
+        "section",
+        "number",
+        "fingerprint",
+        "file",
+        "url_count",
+        "lastmod",
+        "generated_at",
+    ]
+
+    def has_add_permission(self, request):
+        # Шарды создаются только генерацией sitemap
+        return False
+
+
 @admin.register(RobotsRule)
 class RobotsRuleAdmin(admin.ModelAdmin):
     list_display = ["user_agent", "rule_type", "path", "is_active", "order"]
@@ -151,12 +176,12 @@ class SEOAdminActions:
 
     @admin.action(description=_("Обновить sitemap"))
     def update_sitemap(self, request, queryset):
-        cache.delete("sitemap_cache")
+        SitemapService.refresh()
         self.message_user(request, _("Sitemap обновлен"))
 
     @admin.action(description=_("Обновить robots.txt"))
     def update_robots(self, request, queryset):
-        cache.delete("robots_cache")
+        RobotsService.compile()
         self.message_user(request, _("Robots.txt обновлен"))
 
     @admin.action(description=_("Проверить SEO"))
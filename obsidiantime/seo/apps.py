@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class SeoConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "obsidiantime.seo"
+
+    def ready(self):
+        """Импортируем сигналы при запуске приложения"""
+        import obsidiantime.seo.signals  # noqa
@@ -87,9 +87,19 @@ USER_AGENT_DISPLAY_MAP = {
     "DuckDuckBot": "DuckDuckGo",
 }
 
+# Имя собранного robots.txt в SEO_FILES_ROOT
+ROBOTS_TXT_FILE = "robots.txt"
+
 # Кеширование
 SEO_CACHE_TIMEOUT = 86400  # 24 часа в секундах
+# Время жизни SEO контекста страниц: без общего кеша другие воркеры видят
+# изменения сайта не позже этого срока
+SEO_CONTEXT_TIMEOUT = 5 * 60
 
 # Лимиты для админки
 ADMIN_LIST_LIMIT = 10
-SITEMAP_DYNAMIC_LIMIT = 100  # Максимум динамических URL в sitemap
+
+# Sitemap: индекс и файлы-шарды (не больше 50 000 URL в файле по протоколу)
+SITEMAP_SHARD_SIZE = 50000  # Диапазон id объектов в одном шарде
+SITEMAP_STORAGE_DIR = "sitemaps"  # Каталог gzip файлов шардов в хранилище
+SITEMAP_REFRESH_INTERVAL = 60 * 60  # Пауза generate_sitemaps --loop, в секундах
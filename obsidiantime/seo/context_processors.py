@@ -1,33 +1,31 @@
 from django.contrib.contenttypes.models import ContentType
-from django.contrib.sites.models import Site
 
 from .models import Analytics, SEOGenericModel
-from .utils import get_seo_settings, get_structured_data
+from .utils import get_path_class, get_seo_cache_data, get_seo_settings
 
 
 def seo_context(request):
     """Контекстный процессор для SEO мета-тегов"""
     context = {}
 
-    # Получаем настройки сайта
-    site = Site.objects.get_current()
+    # Сайт, аналитика и структурированные данные берутся из кеша,
+    # поэтому обычный рендер страницы не делает SEO запросов к БД
+    seo_data = get_seo_cache_data()
 
     # Базовые SEO настройки
     context.update(get_seo_settings())
 
     # Настройки аналитики
-    try:
-        analytics = Analytics.get_settings()
-        context["analytics"] = analytics
-    except Analytics.DoesNotExist:
-        context["analytics"] = None
+    context["analytics"] = Analytics.get_settings()
 
     # Canonical URL
     if request.path:
-        context["canonical_url"] = f"https://{site.domain}{request.path}"
+        context["canonical_url"] = f"https://{seo_data['domain']}{request.path}"
 
     # Структурированные данные
-    context["structured_data"] = get_structured_data(request)
+    context["structured_data"] = seo_data["structured_data"][
+        get_path_class(request.path)
+    ]
 
     return context
 
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from obsidiantime.seo.constants import SITEMAP_REFRESH_INTERVAL
+from obsidiantime.seo.services import SitemapService
+
+
+class Command(BaseCommand):
+    help = "Пересобирает изменившиеся шарды sitemap"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Пересобрать все шарды, даже неизменившиеся",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Работать постоянно, проверяя шарды каждые --interval секунд",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=SITEMAP_REFRESH_INTERVAL,
+            help="Пауза между проверками в режиме --loop, в секундах",
+        )
+
+    def handle(self, *args, **options):
+        rebuild = options["rebuild"]
+        while True:
+            self.stdout.write("Проверка шардов sitemap...")
+            shards_written = SitemapService.refresh(rebuild=rebuild)
+            self.stdout.write(
+                self.style.SUCCESS(f"Готово: пересобрано шардов - {shards_written}.")
+            )
+            if not options["loop"]:
+                return
+            # Полная пересборка нужна только на первом проходе
+            rebuild = False
+            time.sleep(options["interval"])
@@ -1,14 +1,7 @@
-from django.contrib.contenttypes.models import ContentType
 from django.contrib.sites.models import Site
 from django.core.management.base import BaseCommand
 
-from obsidiantime.gallery.models import Meme
-from obsidiantime.main.models import Quote
-from obsidiantime.seo.constants import (
-    ANALYTICS_DEFAULT_SETTINGS,
-    ROBOTS_DEFAULT_RULES,
-    SITEMAP_DYNAMIC_LIMIT,
-)
+from obsidiantime.seo.constants import ANALYTICS_DEFAULT_SETTINGS, ROBOTS_DEFAULT_RULES
 from obsidiantime.seo.models import Analytics, RobotsRule, SitemapURL
 from obsidiantime.seo.services import SitemapService
 
@@ -83,30 +76,8 @@ class Command(BaseCommand):
             if created:
                 self.stdout.write(f"Добавлен URL в sitemap: {url.url}")
 
-        # Добавляем динамические URL для мемов
-        ContentType.objects.get_for_model(Meme)
-        memes = Meme.objects.filter(is_approved=True)[
-            :SITEMAP_DYNAMIC_LIMIT
-        ]  # Ограничиваем лимитом
-        for meme in memes:
-            url, created = SitemapURL.objects.get_or_create(
-                url=f"/gallery/meme/{meme.id}/",
-                defaults={"priority": 0.7, "changefreq": "weekly", "is_active": True},
-            )
-            if created:
-                self.stdout.write(f"Добавлен мем в sitemap: {meme.title}")
-
-        # Добавляем динамические URL для цитат
-        ContentType.objects.get_for_model(Quote)
-        quotes = Quote.objects.all()[:SITEMAP_DYNAMIC_LIMIT]  # Ограничиваем лимитом
-        for quote in quotes:
-            url, created = SitemapURL.objects.get_or_create(
-                url=f"/quotes/{quote.id}/",
-                defaults={"priority": 0.7, "changefreq": "weekly", "is_active": True},
-            )
-            if created:
-                self.stdout.write(f"Добавлена цитата в sitemap: {quote.text[:50]}...")
-
+        # Мемы и цитаты попадают в sitemap автоматически (см. seo/sitemaps.py)
+        SitemapService.refresh()
         self.stdout.write(f"Создано {SitemapURL.objects.count()} URL в sitemap")
 
     def setup_analytics(self):
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seo', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SitemapShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('section', models.CharField(max_length=20, verbose_name='Section')),
+                ('number', models.PositiveIntegerField(verbose_name='Number')),
+                ('fingerprint', models.CharField(help_text='Хеш состояния объектов шарда на момент генерации', max_length=64, verbose_name='Fingerprint')),
+                ('file', models.CharField(max_length=255, verbose_name='File')),
+                ('url_count', models.PositiveIntegerField(default=0, verbose_name='URL Count')),
+                ('lastmod', models.DateTimeField(blank=True, null=True, verbose_name='Last Modified')),
+                ('generated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Sitemap Shard',
+                'verbose_name_plural': 'Sitemap Shards',
+                'ordering': ['section', 'number'],
+                'unique_together': {('section', 'number')},
+            },
+        ),
+    ]
@@ -2,8 +2,11 @@ from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.sites.models import Site
 from django.db import models
+from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
+from obsidiantime.main.cache import CachedSingletonMixin, seo_cache
+
 from .constants import (
     CHANGEFREQ_CHOICES,
     CHANGEFREQ_DISPLAY_MAP,
@@ -253,7 +256,7 @@ class RobotsRule(models.Model):
         return USER_AGENT_DISPLAY_MAP.get(self.user_agent, self.user_agent)
 
 
-class Analytics(models.Model):
+class Analytics(CachedSingletonMixin, models.Model):
     """Модель для хранения настроек аналитики"""
 
     google_analytics_id = models.CharField(
@@ -303,11 +306,7 @@ class Analytics(models.Model):
     def __str__(self):
         return "Analytics Settings"
 
-    @classmethod
-    def get_settings(cls):
-        """Возвращает настройки аналитики"""
-        settings, created = cls.objects.get_or_create(pk=1)
-        return settings
+    singleton_cache = seo_cache
 
     def has_google_analytics(self):
         """Проверяет, настроен ли Google Analytics"""
@@ -337,3 +336,35 @@ class Analytics(models.Model):
         if self.has_vk_pixel():
             analytics.append("VK Pixel")
         return analytics
+
+
+class SitemapShard(models.Model):
+    """Сгенерированный gzip файл sitemap (шард) с URL одного раздела"""
+
+    section = models.CharField(max_length=20, verbose_name=_("Section"))
+    number = models.PositiveIntegerField(verbose_name=_("Number"))
+    fingerprint = models.CharField(
+        max_length=64,
+        verbose_name=_("Fingerprint"),
+        help_text=_("Хеш состояния объектов шарда на момент генерации"),
+    )
+    file = models.CharField(max_length=255, verbose_name=_("File"))
+    url_count = models.PositiveIntegerField(default=0, verbose_name=_("URL Count"))
+    lastmod = models.DateTimeField(
+        null=True, blank=True, verbose_name=_("Last Modified")
+    )
+    generated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("Sitemap Shard")
+        verbose_name_plural = _("Sitemap Shards")
+        unique_together = ("section", "number")
+        ordering = ["section", "number"]
+
+    def __str__(self):
+        return f"{self.section}-{self.number}"
+
+    def get_absolute_url(self):
+        return reverse(
+            "sitemap_shard", kwargs={"section": self.section, "number": self.number}
+        )
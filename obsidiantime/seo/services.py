@@ -1,11 +1,24 @@
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.sites.models import Site
-from django.utils import timezone
+from django.template.loader import render_to_string
 
+from . import sitemaps
 from .constants import (
+    ROBOTS_TXT_FILE,
     SITEMAP_STATIC_URLS,
 )
-from .models import Analytics, RobotsRule, SEOGenericModel, SitemapURL
+from .models import (
+    Analytics,
+    RobotsRule,
+    SEOGenericModel,
+    SitemapShard,
+    SitemapURL,
+)
 
 
 class SEOService:
@@ -61,81 +74,63 @@ class SitemapService:
         return SITEMAP_STATIC_URLS
 
     @staticmethod
-    def generate_sitemap_urls():
-        """Генерирует все URL для sitemap"""
-        urls = []
-        site = Site.objects.get_current()
+    def refresh(rebuild=False):
+        """Пересобирает изменившиеся шарды sitemap (см. seo/sitemaps.py)"""
+        return sitemaps.refresh(rebuild=rebuild)
 
-        # Добавляем статические URL
-        static_urls = SitemapService.get_static_urls()
-        for url_data in static_urls:
-            urls.append(
-                {
-                    "loc": f"https://{site.domain}{url_data['url']}",
-                    "priority": url_data["priority"],
-                    "changefreq": url_data["changefreq"],
-                    "lastmod": timezone.now(),
-                }
-            )
+    @staticmethod
+    def get_shards():
+        """Шарды для индекса sitemap"""
+        return SitemapShard.objects.all()
 
-        # Добавляем динамические URL
-        sitemap_urls = SitemapURL.objects.filter(is_active=True)
-        for sitemap_url in sitemap_urls:
-            urls.append(
-                {
-                    "loc": f"https://{site.domain}{sitemap_url.url}",
-                    "priority": sitemap_url.priority,
-                    "changefreq": sitemap_url.changefreq,
-                    "lastmod": sitemap_url.lastmod,
-                }
-            )
 
-        return urls
+class RobotsService:
+    """
+    Сервис для работы с robots.txt.
 
+    Файл собирается из шаблона один раз при изменении правил или сайта
+    (см. seo/signals.py) и лежит в SEO_FILES_ROOT: его отдает nginx, а
+    без nginx - RobotsTxtView, без запросов к БД.
+    """
 
-class RobotsService:
-    """Сервис для работы с robots.txt"""
+    @staticmethod
+    def get_robots_path():
+        return Path(settings.SEO_FILES_ROOT) / ROBOTS_TXT_FILE
 
     @staticmethod
     def get_robots_content():
         """Генерирует содержимое robots.txt"""
         site = Site.objects.get_current()
-        rules = RobotsRule.objects.filter(is_active=True).order_by("order")
-
-        content = f"User-agent: {site.domain}\n"
-
-        for rule in rules:
-            if rule.is_global_rule():
-                content += f"{rule.get_rule_text()}\n"
-            else:
-                content += f"User-agent: {rule.user_agent}\n{rule.get_rule_text()}\n"
-
-        # Добавляем стандартные правила
-        content += "\n# Разрешаем индексацию основных разделов\n"
-        content += (
-            "Allow: /\nAllow: /gallery/\nAllow: /quotes/\n"
-            "Allow: /chat/\nAllow: /about/\n"
-        )
-        content += "Allow: /static/\nAllow: /media/\n\n"
-
-        content += "# Запрещаем индексацию служебных разделов\n"
-        content += "Disallow: /admin/\nDisallow: /auth/\nDisallow: /api/\n"
-        content += (
-            "Disallow: /private/\nDisallow: /temp/\n"
-            "Disallow: /cache/\nDisallow: /logs/\n\n"
+        return render_to_string(
+            "seo/robots.txt",
+            {
+                "site": site,
+                "sitemap_url": f"https://{site.domain}/sitemap.xml",
+                "robots_rules": SEOService.get_active_robots_rules(),
+            },
         )
 
-        content += "# Настройки для поисковых роботов\n"
-        content += "Crawl-delay: 1\n\n"
-
-        content += f"# Sitemap\nSitemap: https://{site.domain}/sitemap.xml\n\n"
-
-        # Дополнительные настройки для разных роботов
-        content += "# Googlebot\nUser-agent: Googlebot\nCrawl-delay: 1\n\n"
-        content += "# Yandex\nUser-agent: Yandex\nCrawl-delay: 1\n\n"
-        content += "# Bingbot\nUser-agent: Bingbot\nCrawl-delay: 1\n"
+    @staticmethod
+    def compile():
+        """Собирает robots.txt в файл и возвращает путь к нему"""
+        path = RobotsService.get_robots_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        content = RobotsService.get_robots_content().encode()
+
+        # Запись через временный файл: читатели видят старый или новый файл
+        with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as tmp:
+            tmp.write(content)
+        Path(tmp.name).chmod(0o644)
+        os.replace(tmp.name, path)
+        return path
 
-        return content
+    @staticmethod
+    def get_robots_file():
+        """Путь к собранному robots.txt; собирает файл, если его еще нет"""
+        path = RobotsService.get_robots_path()
+        if not path.exists():
+            path = RobotsService.compile()
+        return path
 
 
 class AnalyticsService:
@@ -0,0 +1,51 @@
+"""
+Сигналы для сброса SEO кеша и пересборки robots.txt
+"""
+
+import logging
+
+from django.contrib.sites.models import Site
+from django.core.signals import setting_changed
+from django.db import DatabaseError, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from obsidiantime.main.cache import seo_cache
+
+from .models import RobotsRule
+from .services import RobotsService
+from .utils import get_seo_settings
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Site)
+@receiver(post_delete, sender=Site)
+def invalidate_seo_cache(sender, **kwargs):
+    """Сбрасывает закешированные данные сайта после коммита"""
+    transaction.on_commit(seo_cache.invalidate)
+
+
+@receiver(post_save, sender=RobotsRule)
+@receiver(post_delete, sender=RobotsRule)
+@receiver(post_save, sender=Site)
+@receiver(post_delete, sender=Site)
+def compile_robots_txt(sender, **kwargs):
+    """Пересобирает robots.txt после изменения правил или домена сайта"""
+    transaction.on_commit(_compile_robots_txt)
+
+
+def _compile_robots_txt():
+    try:
+        RobotsService.compile()
+    except (DatabaseError, OSError):
+        # Например, при migrate до создания таблиц SEO: файл соберется
+        # при первом запросе robots.txt
+        logger.warning("Не удалось собрать robots.txt", exc_info=True)
+
+
+@receiver(setting_changed)
+def reset_seo_settings(setting, **kwargs):
+    """Сбрасывает SEO настройки при изменении settings в тестах"""
+    if setting.endswith("_SETTINGS") or setting == "DEFAULT_META_TAGS":
+        get_seo_settings.cache_clear()
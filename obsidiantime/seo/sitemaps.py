@@ -0,0 +1,245 @@
+"""
+Sitemap сайта: индекс и gzip файлы-шарды в хранилище.
+
+URL разбиты на разделы: статические страницы (SITEMAP_STATIC_URLS и
+активные SitemapURL), одобренные мемы и одобренные цитаты. Объекты раздела
+попадают в шард по диапазону id (SITEMAP_SHARD_SIZE id на шард), поэтому
+новый мем меняет только последний шард, а правка старой цитаты - только
+шард с ее id.
+
+Для каждого шарда одним GROUP BY запросом считается отпечаток: число
+объектов, сумма id и последняя дата изменения содержимого (у мемов -
+content_updated_at: лайки и комментарии ее не меняют). Файл
+пересобирается, только если отпечаток изменился: объекты читаются из БД
+итератором и сразу пишутся в gzip, без шаблонов и списка URL в памяти.
+
+Проверку выполняет команда generate_sitemaps (в docker-compose - сервис
+sitemaps с --loop), а не запрос индекса. Блокировка берется в общем кеше
+воркеров, поэтому шарды одновременно пересобирает только один процесс.
+"""
+
+import gzip
+import hashlib
+import logging
+import tempfile
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core.cache import caches
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db.models import Count, F, Max, Sum
+from django.urls import reverse
+
+from obsidiantime.gallery.models import Meme
+from obsidiantime.main.models import Quote
+
+from .constants import (
+    SITEMAP_SHARD_SIZE,
+    SITEMAP_STATIC_URLS,
+    SITEMAP_STORAGE_DIR,
+)
+from .models import SitemapShard, SitemapURL
+
+logger = logging.getLogger(__name__)
+
+# Блокировка, чтобы шарды пересобирал один процесс
+LOCK_KEY = "sitemap_refresh_lock"
+LOCK_TIMEOUT = 10 * 60
+
+# Размер пачки строк при чтении объектов шарда
+ITERATOR_CHUNK_SIZE = 2000
+
+# Шард собирается в памяти, пока сжатый файл не больше этого размера
+SPOOL_MAX_SIZE = 4 * 1024 * 1024
+
+# Подставляется вместо id в шаблон URL объекта (reverse один раз на шард)
+PK_PLACEHOLDER = 9876543210
+
+URLSET_HEADER = (
+    b'<?xml version="1.0" encoding="UTF-8"?>\n'
+    b'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+)
+URLSET_FOOTER = b"</urlset>\n"
+
+
+def format_url(loc, lastmod, changefreq, priority):
+    parts = [f"<url><loc>{escape(loc)}</loc>"]
+    if lastmod is not None:
+        parts.append(f"<lastmod>{lastmod.isoformat(timespec='seconds')}</lastmod>")
+    parts.append(f"<changefreq>{changefreq}</changefreq>")
+    parts.append(f"<priority>{priority:.1f}</priority></url>\n")
+    return "".join(parts).encode()
+
+
+class StaticSection:
+    """Статические страницы и URL, добавленные в админке (один шард)"""
+
+    name = "static"
+
+    def get_entries(self):
+        entries = {
+            item["url"]: (None, item["changefreq"], item["priority"])
+            for item in SITEMAP_STATIC_URLS
+        }
+        for url in SitemapURL.objects.filter(is_active=True).order_by("url"):
+            entries[url.url] = (url.lastmod, url.changefreq, url.priority)
+        return entries
+
+    def get_states(self):
+        """Состояние шардов: {номер: (строка для отпечатка, lastmod)}"""
+        entries = self.get_entries()
+        dates = [lastmod for lastmod, _, _ in entries.values() if lastmod]
+        return {0: (repr(sorted(entries.items())), max(dates, default=None))}
+
+    def iter_urls(self, number):
+        for path, (lastmod, changefreq, priority) in self.get_entries().items():
+            yield path, lastmod, changefreq, priority
+
+
+class ModelSection:
+    """Одобренные объекты модели со страницей по id"""
+
+    # Дата изменения содержимого для lastmod и отпечатка шарда
+    lastmod_field = "updated_at"
+
+    def __init__(self, name, model, url_name, changefreq, priority):
+        self.name = name
+        self.model = model
+        self.url_name = url_name
+        self.changefreq = changefreq
+        self.priority = priority
+
+    def get_queryset(self):
+        return self.model._default_manager.filter(is_approved=True).order_by()
+
+    def get_states(self):
+        rows = (
+            self.get_queryset()
+            .annotate(shard=F("pk") / SITEMAP_SHARD_SIZE)
+            .values("shard")
+            .annotate(
+                count=Count("pk"), pk_sum=Sum("pk"), lastmod=Max(self.lastmod_field)
+            )
+        )
+        return {
+            row["shard"]: (
+                f"{row['count']}:{row['pk_sum']}:{row['lastmod'].isoformat()}",
+                row["lastmod"],
+            )
+            for row in rows
+        }
+
+    def iter_urls(self, number):
+        start = number * SITEMAP_SHARD_SIZE
+        rows = (
+            self.get_queryset()
+            .filter(pk__gte=start, pk__lt=start + SITEMAP_SHARD_SIZE)
+            .order_by("pk")
+            .values_list("pk", self.lastmod_field)
+        )
+        template = reverse(self.url_name, args=[PK_PLACEHOLDER])
+        placeholder = str(PK_PLACEHOLDER)
+        for pk, lastmod in rows.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+            path = template.replace(placeholder, str(pk))
+            yield path, lastmod, self.changefreq, self.priority
+
+
+class MemeSection(ModelSection):
+    """Одобренные мемы: updated_at мема меняют лайки и комментарии"""
+
+    lastmod_field = "content_updated_at"
+
+
+SECTIONS = (
+    StaticSection(),
+    MemeSection("memes", Meme, "gallery:meme_detail", "weekly", 0.7),
+    ModelSection("quotes", Quote, "main:quote_detail", "monthly", 0.6),
+)
+
+
+def write_shard(section, number, fingerprint, domain):
+    """Пишет gzip файл шарда в хранилище: (имя файла, число URL)"""
+    url_count = 0
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as buffer:
+        # mtime=0: одинаковое содержимое дает одинаковый файл
+        with gzip.GzipFile(fileobj=buffer, mode="wb", mtime=0) as archive:
+            archive.write(URLSET_HEADER)
+            for path, lastmod, changefreq, priority in section.iter_urls(number):
+                loc = f"https://{domain}{path}"
+                archive.write(format_url(loc, lastmod, changefreq, priority))
+                url_count += 1
+            archive.write(URLSET_FOOTER)
+
+        buffer.seek(0)
+        name = (
+            f"{SITEMAP_STORAGE_DIR}/{section.name}-{number}-{fingerprint[:12]}.xml.gz"
+        )
+        name = default_storage.save(name, File(buffer, name=name))
+    return name, url_count
+
+
+def refresh_section(section, domain, rebuild=False):
+    """Пересобирает изменившиеся шарды раздела; возвращает их число"""
+    existing = {
+        shard.number: shard
+        for shard in SitemapShard.objects.filter(section=section.name)
+    }
+    written = 0
+
+    for number, (state, lastmod) in sorted(section.get_states().items()):
+        fingerprint = hashlib.sha256(
+            f"{domain}\n{section.name}\n{state}".encode()
+        ).hexdigest()
+        shard = existing.pop(number, None)
+        if shard is not None and shard.fingerprint == fingerprint and not rebuild:
+            continue
+
+        name, url_count = write_shard(section, number, fingerprint, domain)
+        SitemapShard.objects.update_or_create(
+            section=section.name,
+            number=number,
+            defaults={
+                "fingerprint": fingerprint,
+                "file": name,
+                "url_count": url_count,
+                "lastmod": lastmod,
+            },
+        )
+        if shard is not None and shard.file != name:
+            default_storage.delete(shard.file)
+        written += 1
+
+    # Шарды, в которых не осталось объектов
+    for shard in existing.values():
+        default_storage.delete(shard.file)
+        shard.delete()
+
+    return written
+
+
+def get_lock_cache():
+    """Общий кеш воркеров, а без него (CACHE_BACKEND=locmem) - кеш процесса"""
+    return caches["shared" if "shared" in settings.CACHES else "default"]
+
+
+def refresh(rebuild=False):
+    """
+    Пересобирает изменившиеся шарды всех разделов (rebuild - все шарды).
+    Возвращает число пересобранных шардов.
+    """
+    lock_cache = get_lock_cache()
+    if not lock_cache.add(LOCK_KEY, 1, LOCK_TIMEOUT):
+        # Шарды уже пересобирает другой процесс
+        return 0
+
+    try:
+        domain = Site.objects.get_current().domain
+        written = sum(refresh_section(section, domain, rebuild) for section in SECTIONS)
+    finally:
+        lock_cache.delete(LOCK_KEY)
+
+    if written:
+        logger.info("Пересобрано шардов sitemap: %s", written)
+    return written
@@ -0,0 +1,179 @@
+import gzip
+import shutil
+import tempfile
+from http import HTTPStatus
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from obsidiantime.gallery.models import Comment, Meme
+from obsidiantime.gallery.services import MemeRatingService
+from obsidiantime.main.models import Quote
+
+from .models import RobotsRule, SitemapShard
+from .services import RobotsService, SitemapService
+from .utils import get_seo_cache_data
+
+
+class SitemapShardsTests(TestCase):
+    """Sitemap собирается в gzip шарды, пересобираются только изменившиеся"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="author", password="password")
+        cls.quotes = [
+            Quote.objects.create(text=f"Цитата {i}", author="Автор", added_by=cls.user)
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def read_shard(self, section, number):
+        shard = SitemapShard.objects.get(section=section, number=number)
+        with default_storage.open(shard.file) as sitemap_file:
+            return gzip.decompress(sitemap_file.read()).decode()
+
+    @mock.patch("obsidiantime.seo.sitemaps.SITEMAP_SHARD_SIZE", 2)
+    def test_only_changed_shards_are_rebuilt(self):
+        self.assertEqual(SitemapService.refresh(), 3)
+        shards = SitemapShard.objects.filter(section="quotes")
+        self.assertEqual(sum(shard.url_count for shard in shards), 3)
+        self.assertEqual(SitemapService.refresh(), 0)
+
+        last = self.quotes[-1]
+        last.text = "Новый текст"
+        last.save()
+        self.assertEqual(SitemapService.refresh(), 1)
+
+        url = reverse("main:quote_detail", args=[last.pk])
+        content = self.read_shard("quotes", last.pk // 2)
+        self.assertIn(f"{url}</loc>", content)
+        self.assertIn("<lastmod>", content)
+
+    def test_unapproved_objects_are_removed(self):
+        SitemapService.refresh()
+        Quote.objects.update(is_approved=False)
+        SitemapService.refresh()
+
+        self.assertFalse(SitemapShard.objects.filter(section="quotes").exists())
+
+    def test_meme_lastmod_ignores_reactions(self):
+        meme = Meme.objects.create(
+            title="Мем", image="memes/meme.jpg", author=self.user
+        )
+        SitemapService.refresh()
+
+        # Лайк и комментарий меняют updated_at, но не содержимое мема
+        MemeRatingService.toggle_like(self.user, meme.pk)
+        MemeRatingService.add_comment(meme, Comment(author=self.user, content="Ок"))
+        self.assertEqual(SitemapService.refresh(), 0)
+
+        meme.title = "Новое название"
+        meme.save(update_fields=["title"])
+        self.assertEqual(SitemapService.refresh(), 1)
+
+    def test_index_does_not_rebuild_shards(self):
+        response = self.client.get(reverse("sitemap_xml"))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertFalse(SitemapShard.objects.exists())
+
+    def test_index_links_to_gzip_shards(self):
+        call_command("generate_sitemaps", stdout=StringIO())
+        response = self.client.get(reverse("sitemap_xml"))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        shard = SitemapShard.objects.get(section="quotes")
+        self.assertContains(response, shard.get_absolute_url())
+
+        response = self.client.get(shard.get_absolute_url())
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        content = gzip.decompress(b"".join(response.streaming_content)).decode()
+        self.assertEqual(content.count("<url>"), 3)
+
+        response = self.client.get(
+            shard.get_absolute_url(), HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+
+class RobotsTxtTests(TestCase):
+    """robots.txt собирается в файл при изменении правил и отдается с ETag"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.files_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(SEO_FILES_ROOT=cls.files_root)
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.files_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_rule_change_recompiles_file(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            RobotsRule.objects.create(rule_type="disallow", path="/secret/")
+
+        content = RobotsService.get_robots_path().read_text()
+        self.assertIn("Disallow: /secret/", content)
+        self.assertIn("Sitemap: https://", content)
+
+    def test_served_without_queries_and_revalidated(self):
+        RobotsService.compile()
+        url = reverse("robots_txt")
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response["Content-Type"], "text/plain; charset=utf-8")
+        self.assertTrue(response["ETag"].startswith('"'))
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+
+
+class SEOContextCacheTests(TestCase):
+    """SEO контекст сбрасывается только после коммита изменений сайта"""
+
+    def setUp(self):
+        cache.clear()
+        # Изменение сайта пересобирает robots.txt
+        files_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, files_root, ignore_errors=True)
+        settings_override = override_settings(SEO_FILES_ROOT=files_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_site_change_resets_context_after_commit(self):
+        site = Site.objects.get_current()
+        self.assertEqual(get_seo_cache_data()["domain"], site.domain)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            site.domain = "obsidiantime.test"
+            site.save()
+            # До коммита в кеше остается прежний снимок
+            self.assertNotEqual(get_seo_cache_data()["domain"], "obsidiantime.test")
+
+        self.assertEqual(get_seo_cache_data()["domain"], "obsidiantime.test")
@@ -1,23 +1,49 @@
+import functools
+
 from django.conf import settings
 from django.contrib.sites.models import Site
 
+from obsidiantime.main.cache import seo_cache
+
+from .constants import SEO_CONTEXT_TIMEOUT
+
+# Классы страниц со своим блоком структурированных данных
+PATH_CLASS_HOME = "home"
+PATH_CLASS_GALLERY = "gallery"
+PATH_CLASS_QUOTES = "quotes"
+STRUCTURED_DATA_PATH_CLASSES = (
+    None,
+    PATH_CLASS_HOME,
+    PATH_CLASS_GALLERY,
+    PATH_CLASS_QUOTES,
+)
 
-def get_structured_data(request=None):
-    """Генерирует структурированные данные для текущей страницы"""
-    site = Site.objects.get_current()
 
+def get_path_class(path):
+    """Определяет класс страницы по пути запроса"""
+    if path == "/":
+        return PATH_CLASS_HOME
+    if path.startswith("/gallery/"):
+        return PATH_CLASS_GALLERY
+    if path.startswith("/quotes/"):
+        return PATH_CLASS_QUOTES
+    return None
+
+
+def build_structured_data(domain, path_class=None):
+    """Собирает структурированные данные для домена и класса страницы"""
     # Базовые данные сайта
     structured_data = [
         {
             "@context": "https://schema.org",
             "@type": "WebSite",
             "name": "ObsidianTime",
-            "url": f"https://{site.domain}",
+            "url": f"https://{domain}",
             "description": "Место для мемов, общения и веселья!",
             "inLanguage": "ru-RU",
             "potentialAction": {
                 "@type": "SearchAction",
-                "target": f"https://{site.domain}/search?q={{search_term_string}}",
+                "target": f"https://{domain}/search?q={{search_term_string}}",
                 "query-input": "required name=search_term_string",
             },
         },
@@ -25,8 +51,8 @@ def get_structured_data(request=None):
             "@context": "https://schema.org",
             "@type": "Organization",
             "name": "ObsidianTime",
-            "url": f"https://{site.domain}",
-            "logo": f"https://{site.domain}/static/images/obsidian-logo.svg",
+            "url": f"https://{domain}",
+            "logo": f"https://{domain}/static/images/obsidian-logo.svg",
             "description": "Место для мемов, общения и веселья!",
             "sameAs": [
                 "https://vk.com/obsidiantime",
@@ -35,47 +61,55 @@ def get_structured_data(request=None):
         },
     ]
 
-    # Добавляем данные для конкретных страниц только если передан request
-    if request:
-        if request.path == "/":
-            structured_data.append(
-                {
-                    "@context": "https://schema.org",
-                    "@type": "WebPage",
-                    "name": "Главная страница - ObsidianTime",
-                    "description": "Место для мемов, общения и веселья!",
-                    "url": f"https://{site.domain}",
-                    "mainEntity": {
-                        "@type": "VideoObject",
-                        "name": "ObsidianTime - Главная страница",
-                        "description": "Добро пожаловать на ObsidianTime!",
-                    },
-                }
-            )
-        elif request.path.startswith("/gallery/"):
-            structured_data.append(
-                {
-                    "@context": "https://schema.org",
-                    "@type": "ImageGallery",
-                    "name": "Галерея мемов - ObsidianTime",
-                    "description": "Коллекция лучших мемов",
-                    "url": f"https://{site.domain}/gallery/",
-                }
-            )
-        elif request.path.startswith("/quotes/"):
-            structured_data.append(
-                {
-                    "@context": "https://schema.org",
-                    "@type": "CreativeWork",
-                    "name": "Коллекция цитат - ObsidianTime",
-                    "description": "Лучшие цитаты и афоризмы",
-                    "url": f"https://{site.domain}/quotes/",
-                }
-            )
+    # Данные для конкретных страниц
+    if path_class == PATH_CLASS_HOME:
+        structured_data.append(
+            {
+                "@context": "https://schema.org",
+                "@type": "WebPage",
+                "name": "Главная страница - ObsidianTime",
+                "description": "Место для мемов, общения и веселья!",
+                "url": f"https://{domain}",
+                "mainEntity": {
+                    "@type": "VideoObject",
+                    "name": "ObsidianTime - Главная страница",
+                    "description": "Добро пожаловать на ObsidianTime!",
+                },
+            }
+        )
+    elif path_class == PATH_CLASS_GALLERY:
+        structured_data.append(
+            {
+                "@context": "https://schema.org",
+                "@type": "ImageGallery",
+                "name": "Галерея мемов - ObsidianTime",
+                "description": "Коллекция лучших мемов",
+                "url": f"https://{domain}/gallery/",
+            }
+        )
+    elif path_class == PATH_CLASS_QUOTES:
+        structured_data.append(
+            {
+                "@context": "https://schema.org",
+                "@type": "CreativeWork",
+                "name": "Коллекция цитат - ObsidianTime",
+                "description": "Лучшие цитаты и афоризмы",
+                "url": f"https://{domain}/quotes/",
+            }
+        )
 
     return structured_data
 
 
+def get_structured_data(request=None):
+    """Генерирует структурированные данные для текущей страницы"""
+    site = Site.objects.get_current()
+    # Данные для конкретных страниц добавляем только если передан request
+    path_class = get_path_class(request.path) if request else None
+    return build_structured_data(site.domain, path_class)
+
+
+@functools.cache
 def get_seo_settings():
     """Возвращает настройки SEO из settings"""
     return {
@@ -87,3 +121,27 @@ def get_seo_settings():
         "social_settings": getattr(settings, "SOCIAL_MEDIA_SETTINGS", {}),
         "default_meta": getattr(settings, "DEFAULT_META_TAGS", {}),
     }
+
+
+def _build_seo_cache_data():
+    site = Site.objects.get_current()
+    return {
+        "domain": site.domain,
+        "structured_data": {
+            path_class: build_structured_data(site.domain, path_class)
+            for path_class in STRUCTURED_DATA_PATH_CLASSES
+        },
+    }
+
+
+def get_seo_cache_data():
+    """
+    Возвращает домен сайта и структурированные данные для всех классов
+    страниц из кеша. Кеш сбрасывается сигналами после коммита изменений
+    Site (см. signals.py) и устаревает через SEO_CONTEXT_TIMEOUT.
+    """
+    return seo_cache.get_or_set(
+        f"context:{settings.SITE_ID}",
+        _build_seo_cache_data,
+        timeout=SEO_CONTEXT_TIMEOUT,
+    )
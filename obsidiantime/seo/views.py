@@ -1,17 +1,22 @@
+import hashlib
 import json
 
 from django.contrib.contenttypes.models import ContentType
-from django.http import Http404, HttpResponse
-from django.utils import timezone
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
+from django.utils.http import http_date
 from django.views.decorators.http import require_http_methods
-from django.views.generic import TemplateView
+from django.views.generic import TemplateView, View
+
+from obsidiantime.config.db_router import use_replica
 
 from .constants import ADMIN_LIST_LIMIT, SEO_CACHE_TIMEOUT
 from .decorators import seo_admin_required, seo_analytics_required
-from .models import SEOGenericModel
-from .services import SEOService, SitemapService
+from .models import SEOGenericModel, SitemapShard
+from .services import RobotsService, SEOService, SitemapService
 from .utils import get_structured_data
 
 
@@ -27,35 +32,36 @@ class BaseSEOView(TemplateView):
         return SEO_CACHE_TIMEOUT
 
 
-class RobotsTxtView(BaseSEOView):
-    """Представление для robots.txt"""
-
-    template_name = "seo/robots.txt"
-    content_type = "text/plain"
+class RobotsTxtView(View):
+    """Представление для robots.txt - собранного файла из SEO_FILES_ROOT"""
 
-    @method_decorator(cache_page(SEO_CACHE_TIMEOUT))  # Кешируем на 24 часа
     def get(self, request, *args, **kwargs):
-        context = self.get_context_data(**kwargs)
-        response = self.render_to_response(context)
-        response["Content-Type"] = "text/plain; charset=utf-8"
-        return response
+        path = RobotsService.get_robots_file()
+        content = path.read_bytes()
+        etag = f'"{hashlib.md5(content, usedforsecurity=False).hexdigest()}"'
+        last_modified = int(path.stat().st_mtime)
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        site = self.get_site()
-        context["site"] = site
-        context["sitemap_url"] = f"https://{site.domain}/sitemap.xml"
-        context["robots_rules"] = SEOService.get_active_robots_rules()
-        return context
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = HttpResponse(content, content_type="text/plain; charset=utf-8")
+
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        # Клиенты и прокси переспрашивают файл, изменения правил видны сразу
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
 
 
 class SitemapView(BaseSEOView):
-    """Представление для sitemap.xml"""
+    """Представление для sitemap.xml - индекса файлов-шардов"""
 
-    template_name = "seo/sitemap.xml"
+    template_name = "seo/sitemap_index.xml"
     content_type = "application/xml"
 
-    @method_decorator(cache_page(SEO_CACHE_TIMEOUT))  # Кешируем на 24 часа
+    # Шарды пересобирает команда generate_sitemaps, индекс только читает их
+    @method_decorator(use_replica)
     def get(self, request, *args, **kwargs):
         context = self.get_context_data(**kwargs)
         response = self.render_to_response(context)
@@ -65,13 +71,30 @@ class SitemapView(BaseSEOView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["site"] = self.get_site()
-        context["urls"] = self.get_sitemap_urls()
-        context["lastmod"] = timezone.now()
+        context["shards"] = SitemapService.get_shards()
         return context
 
-    def get_sitemap_urls(self):
-        """Получает все URL для sitemap"""
-        return SitemapService.generate_sitemap_urls()
+
+@require_http_methods(["GET", "HEAD"])
+def sitemap_shard(request, section, number):
+    """Готовый gzip файл шарда sitemap из хранилища"""
+    shard = get_object_or_404(SitemapShard, section=section, number=number)
+    etag = f'"{shard.fingerprint}"'
+    last_modified = shard.generated_at.timestamp()
+
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(last_modified)
+    )
+    if response is None:
+        try:
+            sitemap_file = default_storage.open(shard.file)
+        except FileNotFoundError as err:
+            raise Http404("Sitemap shard not found") from err
+        response = FileResponse(sitemap_file, content_type="application/gzip")
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    return response
 
 
 class StructuredDataView(BaseSEOView):
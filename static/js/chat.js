@@ -14,6 +14,7 @@ const ObsidianChat = (() => {
         loadMoreBatchSize: 20,
         apiEndpoints: {
             messages: '/chat/api/messages/',
+            stream: '/chat/api/stream/',
             sendMessage: '/chat/send-message/',
             createPoll: '/chat/create-poll/'
         },
@@ -49,6 +50,7 @@ const ObsidianChat = (() => {
                 hasMoreMessages: true,
                 currentPage: 1,
                 refreshInterval: null,
+                eventSource: null,
                 chatMessages: null
             };
 
@@ -329,9 +331,45 @@ const ObsidianChat = (() => {
         }
 
         /**
-         * Начало автообновления
+         * Начало автообновления: поток событий, при недоступности - опрос API
          */
         startAutoRefresh() {
+            if (!window.EventSource) {
+                this.startPolling();
+                return;
+            }
+
+            const url = new URL(this.config.apiEndpoints.stream, window.location.origin);
+            url.searchParams.append('last_id', this.state.lastMessageId);
+
+            const eventSource = new EventSource(url);
+            this.state.eventSource = eventSource;
+
+            eventSource.addEventListener('messages', (e) => {
+                this.handleMessagesData(JSON.parse(e.data));
+            });
+
+            eventSource.addEventListener('poll', (e) => {
+                this.handlePollEvent(JSON.parse(e.data));
+            });
+
+            eventSource.onerror = () => {
+                // CLOSED - сервер отказался держать поток (например, 204 без ASGI),
+                // при CONNECTING браузер переподключится сам
+                if (eventSource.readyState === EventSource.CLOSED) {
+                    eventSource.close();
+                    this.state.eventSource = null;
+                    this.startPolling();
+                }
+            };
+        }
+
+        /**
+         * Периодический опрос API новых сообщений
+         */
+        startPolling() {
+            if (this.state.refreshInterval) return;
+
             this.state.refreshInterval = setInterval(() => {
                 this.refreshMessages();
             }, this.config.refreshInterval);
@@ -341,40 +379,69 @@ const ObsidianChat = (() => {
          * Остановка автообновления
          */
         stopAutoRefresh() {
+            if (this.state.eventSource) {
+                this.state.eventSource.close();
+                this.state.eventSource = null;
+            }
             if (this.state.refreshInterval) {
                 clearInterval(this.state.refreshInterval);
                 this.state.refreshInterval = null;
             }
         }
 
+        /**
+         * Обновление результатов голосования из потока событий
+         */
+        handlePollEvent(pollData) {
+            const pollOption = document.querySelector(
+                `.poll-option[data-poll-id="${pollData.poll_id}"]`
+            );
+            if (!pollOption) return;
+
+            // Отметки "voted" относятся к текущему пользователю и в событии
+            // не передаются, поэтому сохраняем их как есть
+            const options = pollData.options.map(opt => {
+                const element = document.querySelector(`.poll-option[data-option-id="${opt.id}"]`);
+                return {...opt, user_voted: element?.classList.contains('voted') || false};
+            });
+
+            this.updatePollUI(pollOption, {...pollData, options});
+        }
+
         /**
          * Обновление новых сообщений
          */
         async refreshMessages() {
             try {
                 const data = await this.apiClient.getMessages({last_id: this.state.lastMessageId});
+                this.handleMessagesData(data);
+            } catch (error) {
+                console.warn('Ошибка обновления чата:', error);
+            }
+        }
 
-                if (data.messages && data.messages.length > 0) {
-                    this.processIncomingMessages(data.messages);
-
-                    // Проверяем, что last_id корректен
-                    if (data.last_id !== undefined && data.last_id !== null) {
-                        this.state.lastMessageId = data.last_id;
-                    } else {
-                        console.warn('last_id is undefined in API response');
-                        // Получаем максимальный ID из сообщений как fallback
-                        const messageIds = data.messages
-                            .filter(item => item.type === 'message')
-                            .map(item => item.id);
-                        if (messageIds.length > 0) {
-                            this.state.lastMessageId = Math.max(...messageIds);
-                        }
+        /**
+         * Обработка новых сообщений из API или потока событий
+         */
+        handleMessagesData(data) {
+            if (data.messages && data.messages.length > 0) {
+                this.processIncomingMessages(data.messages);
+
+                // Проверяем, что last_id корректен
+                if (data.last_id !== undefined && data.last_id !== null) {
+                    this.state.lastMessageId = data.last_id;
+                } else {
+                    console.warn('last_id is undefined in API response');
+                    // Получаем максимальный ID из сообщений как fallback
+                    const messageIds = data.messages
+                        .filter(item => item.type === 'message')
+                        .map(item => item.id);
+                    if (messageIds.length > 0) {
+                        this.state.lastMessageId = Math.max(...messageIds);
                     }
-
-                    this.scrollToBottom();
                 }
-            } catch (error) {
-                console.warn('Ошибка обновления чата:', error);
+
+                this.scrollToBottom();
             }
         }
 